@@ -1 +1,38 @@
-MLFLOW_TRACKING_URI = "http://ec2-3-85-85-112.compute-1.amazonaws.com:5000/"
\ No newline at end of file
+MLFLOW_TRACKING_URI = "http://ec2-3-85-85-112.compute-1.amazonaws.com:5000/"
+
+# Local cache for S3 ingest (see steps/s3_cache.py)
+S3_CACHE_DIR = "~/.cache/house_prediction/s3"
+S3_CACHE_MAX_BYTES = 20 * 1024 ** 3
+# Serve cached objects without a HEAD request to S3. Repeated runs then do no network I/O at all,
+# but an object overwritten in S3 is only picked up once the cache is revalidated
+# (run_training_pipeline.py --revalidate-cache) or cleared.
+S3_CACHE_REVALIDATE = False
+
+# Persistent hyperparameter tuning trials (see src/trial_store.py)
+TRIAL_STORE_PATH = "~/.cache/house_prediction/trials.sqlite"
+
+# Compact model export logged with registered forests (see src/compact_forest.py)
+COMPACT_THRESHOLD_DTYPE = "float32"
+COMPACT_VALUE_DTYPE = "float32"
+COMPACT_PRUNE_TOLERANCE = None  # e.g. 0.01 allows pruning up to a 1% validation RMSE increase
+
+# Newest fraction of the appended rows held out to validate an incremental update (see
+# run_training_pipeline.py --incremental); they are trained on by the next update
+INCREMENTAL_HOLDOUT = 0.2
+
+# Model registry name of the trained pipeline (see run_training_pipeline.py)
+REGISTERED_MODEL_NAME = "Best_RF_House_Model"
+
+# In-house micro-batching prediction server (see run_prediction_server.py)
+PREDICTION_MAX_BATCH_SIZE = 64
+PREDICTION_MAX_WAIT_MS = 5.0
+PREDICTION_MAX_QUEUE = 1024
+PREDICTION_TIMEOUT_MS = 1000.0
+
+# In-process model cache of serving processes (see src/model_cache.py)
+MODEL_CACHE_MAX_BYTES = 2 * 1024 ** 3
+MODEL_ALIAS_POLL_S = 30.0
+
+# Per-row prediction cache of serving processes (see src/prediction_cache.py)
+PREDICTION_CACHE_MAX_ENTRIES = 100_000
+PREDICTION_CACHE_TTL_S = 3600.0
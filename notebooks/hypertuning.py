@@ -1,6 +1,8 @@
 from hyperopt import fmin, tpe, hp, STATUS_OK, Trials
 from sklearn.ensemble import RandomForestRegressor
 import mlflow
+from src.trial_store import TrialStore, dataset_fingerprint
+from config.config import TRIAL_STORE_PATH
 
 # Set tracking URI and initialize MLflow autologging
 mlflow.set_tracking_uri("http://127.0.0.1:8080")
@@ -16,6 +18,10 @@ space = {
 
 # Define objective function
 def objective(params):
+    # Configurations already evaluated on this data are served from the trial store
+    cached = trials.cached_result(params)
+    if cached is not None:
+        return cached
     with mlflow.start_run(nested=True):
         reg = RandomForestRegressor(
             n_estimators=params['n_estimators'],
@@ -30,8 +36,9 @@ def objective(params):
 
         return {'loss': -r2_score, 'status': STATUS_OK}
 
-# Run optimization
-trials = Trials()
+# Run optimization, resuming (or warm-starting from) trials stored for this data and space
+store = TrialStore(TRIAL_STORE_PATH)
+trials = store.trials(space, dataset_fingerprint(X_train, y_train, X_val, y_val))
 with mlflow.start_run(run_name='hyperopt_optimization_regressor'):
     best = fmin(
         fn=objective,
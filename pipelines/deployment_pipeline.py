@@ -3,11 +3,12 @@ import json
 # from .utils import get_data_for_test
 import os
 
+import mlflow.sklearn
 import numpy as np
 import pandas as pd
 # from materializer.custom_materializer import cs_materializer
-from steps.clean_data import clean_data
-from steps.evaluation import evaluate_model
+from steps.clean_data import fit_clean_data, split_data
+from steps.evaluation import evaluate_model_with_intervals
 from steps.ingest_data import ingest_data
 from steps.model_train_old import train_model
 from zenml import pipeline, step
@@ -22,8 +23,17 @@ from zenml.integrations.mlflow.steps import mlflow_model_deployer_step
 # from zenml.steps import BaseParameters, Output
 from pydantic import BaseModel
 from steps.config import ModelNameConfig
-
-from .utils import get_data_for_test
+from src.columnar_requests import decode_houses
+from src.model_cache import ModelCache
+from typing import Optional
+from sklearn.base import RegressorMixin
+from sklearn.pipeline import Pipeline
+from src.data_cleaning import HousePreProcessor
+from steps.incremental_training import training_tags
+from steps.model_registry import promote_version, register_version
+from config.config import REGISTERED_MODEL_NAME
+
+from .utils import get_columnar_data_for_test, get_data_for_test
 
 docker_settings = DockerSettings(required_integrations=[MLFLOW])
 import pandas as pd
@@ -49,8 +59,19 @@ def dynamic_importer() -> str:
     return data
 
 
+@step(enable_cache=False)
+def columnar_importer() -> bytes:
+    """Downloads the latest data from a mock API as an Arrow IPC request body."""
+    return get_columnar_data_for_test()
+
+
 class DeploymentTriggerConfig(BaseModel):
-    """Parameters that are used to trigger the deployment"""
+    """Parameters that are used to trigger the deployment
+
+    Attributes:
+        min_accuracy: minimum R2 the model must reach; compared with the lower
+            bound of its bootstrap confidence interval
+    """
 
     min_accuracy: float = 0.9
 
@@ -66,6 +87,33 @@ def deployment_trigger(
     return accuracy > config.min_accuracy
 
 
+@step
+def promote_model(
+    deploy_decision: bool,
+    model: RegressorMixin,
+    preprocessor: HousePreProcessor,
+    df: pd.DataFrame,
+    registered_model_name: str = REGISTERED_MODEL_NAME,
+) -> Optional[str]:
+    """Register the model this pipeline trained and evaluated, and point the
+    registry's production alias at that version, when the trigger accepts it.
+    Prediction servers following the alias (run_prediction_server.py) preload
+    it and swap it in without a restart. Rejected models are not registered.
+
+    The version is the preprocessing + model pipeline, tagged with the raw rows
+    `df` it was trained on, like the versions run_training_pipeline.py registers:
+    servers score raw houses with it and `--incremental` can extend it.
+
+    Returns:
+        The promoted version, or None if the model was rejected.
+    """
+    if not deploy_decision:
+        return None
+    pipeline = Pipeline([("preprocessor", preprocessor), ("model", model)])
+    version = register_version(pipeline, registered_model_name, tags=training_tags(df))
+    return promote_version(registered_model_name, version)
+
+
 class MLFlowDeploymentLoaderStepParameters(BaseModel):
     """MLflow deployment getter parameters
 
@@ -123,68 +171,38 @@ def prediction_service_loader(
     return existing_services[0]
 
 
+# Deployed models loaded in this process, keyed by (service model name, model URI).
+_MODEL_CACHE = ModelCache(lambda name, model_uri: mlflow.sklearn.load_model(model_uri))
+
+
 @step
 def predictor(
     service: MLFlowDeploymentService,
-    data: np.ndarray,
+    data: str,
 ) -> np.ndarray:
     """Run an inference request against a prediction service"""
 
     service.start(timeout=10)  # should be a NOP if already started
     data = json.loads(data)
-    data.pop("columns")
-    data.pop("index")
-    columns_for_df = [
-        "payment_sequential",
-        "payment_installments",
-        "payment_value",
-        "price",
-        "freight_value",
-        "product_name_lenght",
-        "product_description_lenght",
-        "product_photos_qty",
-        "product_weight_g",
-        "product_length_cm",
-        "product_height_cm",
-        "product_width_cm",
-    ]
-    df = pd.DataFrame(data["data"], columns=columns_for_df)
-    json_list = json.loads(json.dumps(list(df.T.to_dict().values())))
-    data = np.array(json_list)
-    prediction = service.predict(data)
+    df = pd.DataFrame(data["data"], columns=data["columns"])
+    prediction = service.predict(df)
     return prediction
 
 
 @step
-def predictor(
+def columnar_predictor(
     service: MLFlowDeploymentService,
-    data: str,
+    data: bytes,
 ) -> np.ndarray:
-    """Run an inference request against a prediction service"""
+    """Run a binary columnar (Arrow IPC) request against the deployed model.
 
-    service.start(timeout=10)  # should be a NOP if already started
-    data = json.loads(data)
-    data.pop("columns")
-    data.pop("index")
-    columns_for_df = [
-        "payment_sequential",
-        "payment_installments",
-        "payment_value",
-        "price",
-        "freight_value",
-        "product_name_lenght",
-        "product_description_lenght",
-        "product_photos_qty",
-        "product_weight_g",
-        "product_length_cm",
-        "product_height_cm",
-        "product_width_cm",
-    ]
-    df = pd.DataFrame(data["data"], columns=columns_for_df)
-    json_list = json.loads(json.dumps(list(df.T.to_dict().values())))
-    data = np.array(json_list)
-    prediction = service.predict(data)
-    return prediction
+    The model served by `service` is loaded in-process once per model URI (and
+    kept in an LRU model cache), and the request body is decoded straight into
+    the pipeline's input columns instead of being serialized to JSON for the
+    prediction server.
+    """
+    model = _MODEL_CACHE.get(service.config.model_name, service.config.model_uri)
+    return model.predict(decode_houses(data))
 
 
 @pipeline(enable_cache=True, settings={"docker": docker_settings})
@@ -195,10 +213,12 @@ def continuous_deployment_pipeline(
 ):
     # Link all the steps artifacts together
     df = ingest_data(data_path = '/Users/tawate/Documents/HousePredictionMLPipeline/data/olist_customers_dataset.csv')
-    x_train, x_test, y_train, y_test = clean_data(df)
+    processed_df, preprocessor = fit_clean_data(df)
+    x_train, x_test, y_train, y_test = split_data(processed_df)
     model = train_model(x_train, x_test, y_train, y_test, config = ModelNameConfig)
-    mse, rmse = evaluate_model(model, x_test, y_test)
-    deployment_decision = deployment_trigger(accuracy=mse)
+    r2_lower, r2, rmse = evaluate_model_with_intervals(model, x_test, y_test)
+    deployment_decision = deployment_trigger(accuracy=r2_lower)
+    promote_model(deploy_decision=deployment_decision, model=model, preprocessor=preprocessor, df=df)
     mlflow_model_deployer_step(
         model=model,
         deploy_decision=deployment_decision,
@@ -208,12 +228,18 @@ def continuous_deployment_pipeline(
 
 
 @pipeline(enable_cache=False, settings={"docker": docker_settings})
-def inference_pipeline(pipeline_name: str, pipeline_step_name: str):
+def inference_pipeline(pipeline_name: str, pipeline_step_name: str, columnar: bool = False):
+    # `columnar=True` sends the batch as an Arrow IPC body, which needs test rows with the
+    # house columns (see pipelines/utils.py); the default is the JSON request.
     # Link all the steps artifacts together
-    batch_data = dynamic_importer()
     model_deployment_service = prediction_service_loader(
         pipeline_name=pipeline_name,
         pipeline_step_name=pipeline_step_name,
         running=False,
     )
-    predictor(service=model_deployment_service, data=batch_data)
\ No newline at end of file
+    if columnar:
+        batch_data = columnar_importer()
+        columnar_predictor(service=model_deployment_service, data=batch_data)
+    else:
+        batch_data = dynamic_importer()
+        predictor(service=model_deployment_service, data=batch_data)
\ No newline at end of file
@@ -1,19 +1,36 @@
 import logging
 
 import pandas as pd
-from src.data_cleaning import DataCleaning, DataPreProcessStrategy
+
+from src.columnar_requests import encode_houses
+
+TEST_DATA_PATH = "/Users/tawate/Documents/HousePredictionMLPipeline/data/olist_customers_dataset.csv"
+
+
+def _sample_test_rows() -> pd.DataFrame:
+    df = pd.read_csv(TEST_DATA_PATH)
+    df = df.sample(n=100)
+    df.drop(["review_score"], axis=1, inplace=True)
+    return df
 
 
 def get_data_for_test():
+    # The deployed model bundles the preprocessor fitted at training time, so raw
+    # rows are sent as-is; refitting on this sample would change the encodings.
     try:
-        df = pd.read_csv("/Users/tawate/Documents/HousePredictionMLPipeline/data/olist_customers_dataset.csv")
-        df = df.sample(n=100)
-        preprocess_strategy = DataPreProcessStrategy()
-        data_cleaning = DataCleaning(df, preprocess_strategy)
-        df = data_cleaning.handle_data()
-        df.drop(["review_score"], axis=1, inplace=True)
+        df = _sample_test_rows()
         result = df.to_json(orient="split")
         return result
+    except Exception as e:
+        logging.error(e)
+        raise e
+
+
+def get_columnar_data_for_test() -> bytes:
+    # Same sample as `get_data_for_test`, as an Arrow IPC body (src/columnar_requests.py). The
+    # rows are encoded against REQUEST_SCHEMA, so TEST_DATA_PATH must hold raw house rows.
+    try:
+        return encode_houses(_sample_test_rows())
     except Exception as e:
         logging.error(e)
         raise e
\ No newline at end of file
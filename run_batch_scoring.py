@@ -0,0 +1,26 @@
+import click
+
+from config.config import REGISTERED_MODEL_NAME
+from steps.batch_scoring import score_file
+from steps.model_registry import PRODUCTION_ALIAS
+
+
+@click.command()
+@click.option("--input", "input_path", required=True, help="Raw houses to score, CSV or Parquet.")
+@click.option("--output", "output_dir", required=True, help="Directory of the Parquet predictions.")
+@click.option("--model-uri", default=f"models:/{REGISTERED_MODEL_NAME}@{PRODUCTION_ALIAS}",
+              help="MLflow URI of the preprocessing + model pipeline.")
+@click.option("--chunk-rows", default=250_000, type=int, help="Rows scored per chunk.")
+@click.option("--n-jobs", default=None, type=int, help="Cores to use (default: all).")
+@click.option("--restart", is_flag=True, default=False,
+              help="Discard predictions of an earlier run instead of resuming it.")
+def main(input_path: str, output_dir: str, model_uri: str, chunk_rows: int, n_jobs: int, restart: bool):
+    """Score a large file of houses offline; reruns resume after the last completed chunks."""
+    summary = score_file(input_path, output_dir, model_uri, chunk_rows=chunk_rows, n_jobs=n_jobs,
+                         restart=restart)
+    click.echo(f"Scored {summary['rows']} rows in {summary['chunks']} chunks "
+               f"({summary['skipped']} chunks already scored).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import click
+import uvicorn
+
+from config.config import (MODEL_ALIAS_POLL_S, MODEL_CACHE_MAX_BYTES, PREDICTION_CACHE_MAX_ENTRIES,
+                           PREDICTION_CACHE_TTL_S, PREDICTION_MAX_BATCH_SIZE, PREDICTION_MAX_QUEUE,
+                           PREDICTION_MAX_WAIT_MS, PREDICTION_TIMEOUT_MS, REGISTERED_MODEL_NAME)
+from src.micro_batching import MicroBatcher
+from src.model_cache import ModelCache
+from src.prediction_cache import PredictionCache
+from src.prediction_server import create_app
+from steps.model_registry import PRODUCTION_ALIAS, load_registered_model, watch_alias
+
+
+@click.command()
+@click.option("--model-name", default=REGISTERED_MODEL_NAME,
+              help="Registered preprocessing + model pipeline to serve.")
+@click.option("--alias", default=PRODUCTION_ALIAS,
+              help="Registry alias of the version to serve; new versions are swapped in as it moves.")
+@click.option("--poll-s", default=MODEL_ALIAS_POLL_S, type=float,
+              help="Seconds between checks of the alias.")
+@click.option("--cache-bytes", default=MODEL_CACHE_MAX_BYTES, type=int,
+              help="Memory budget of the in-process model cache.")
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=8000, type=int)
+@click.option("--max-batch-size", default=PREDICTION_MAX_BATCH_SIZE, type=int,
+              help="Most rows scored in one model call.")
+@click.option("--max-wait-ms", default=PREDICTION_MAX_WAIT_MS, type=float,
+              help="Longest a request waits for others to join its batch.")
+@click.option("--max-queue", default=PREDICTION_MAX_QUEUE, type=int,
+              help="Waiting requests beyond which new requests are rejected with 503.")
+@click.option("--timeout-ms", default=PREDICTION_TIMEOUT_MS, type=float,
+              help="Default request deadline; clients can set their own with X-Timeout-Ms.")
+@click.option("--prediction-cache-size", default=PREDICTION_CACHE_MAX_ENTRIES, type=int,
+              help="Predictions cached for repeated houses; 0 disables the prediction cache.")
+@click.option("--prediction-ttl-s", default=PREDICTION_CACHE_TTL_S, type=float,
+              help="Seconds a cached prediction stays valid.")
+def main(model_name: str, alias: str, poll_s: float, cache_bytes: int, host: str, port: int,
+         max_batch_size: int, max_wait_ms: float, max_queue: int, timeout_ms: float,
+         prediction_cache_size: int, prediction_ttl_s: float):
+    """Serve the house price model with micro-batched predictions."""
+    cache = ModelCache(load_registered_model, max_bytes=cache_bytes)
+    stop_watching = watch_alias(cache, model_name, alias, interval_s=poll_s)
+    predictions = None
+    if prediction_cache_size > 0:
+        predictions = PredictionCache(prediction_cache_size, prediction_ttl_s)
+    # Each batch predicts with the live version at that moment, so swaps need no restart; only the
+    # houses the prediction cache misses reach the model.
+    batcher = MicroBatcher(cache.predictor(model_name, predictions), max_batch_size=max_batch_size,
+                           max_wait_ms=max_wait_ms, max_queue=max_queue, timeout_ms=timeout_ms)
+    # One process: batching only pays off when all requests share the same queue.
+    try:
+        uvicorn.run(create_app(batcher, cache, model_name, predictions), host=host, port=port, workers=1)
+    finally:
+        stop_watching.set()
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,184 @@
 import mlflow.sklearn
 from steps.s3_ingest_data import *
+from steps.s3_cache import S3DiskCache
 from steps.clean_data import *
 from config.access_keys import *
+from config.config import (S3_CACHE_DIR, S3_CACHE_MAX_BYTES, S3_CACHE_REVALIDATE, TRIAL_STORE_PATH, COMPACT_THRESHOLD_DTYPE,
+                           COMPACT_VALUE_DTYPE, COMPACT_PRUNE_TOLERANCE, INCREMENTAL_HOLDOUT, REGISTERED_MODEL_NAME)
 import pandas as pd
 import logging
 from steps.model_training import train_model, tune_model
+from src.trial_store import TrialStore
 from steps.config import ModelNameConfig
-from hyperopt import hp
+from src.model_engines import get_engine
+from src.evaluate_scores import FusedMetrics
+from hyperopt import space_eval
 import mlflow
+from sklearn.pipeline import Pipeline
+import click
+import os
+import tempfile
+from sklearn.ensemble import RandomForestRegressor
+from src.compiled_forest import CompiledForest
+from src.compact_forest import export_compact_forest
+from steps.incremental_training import find_new_rows, load_latest_model, split_new_rows, training_tags, update_model
 
-if __name__ == "__main__":
+
+def register_model(pipeline: Pipeline, df: pd.DataFrame, X_val: pd.DataFrame, y_val: pd.Series,
+                   previous_tags: dict = None, metrics: dict = None) -> None:
+    """Log the preprocessing + model pipeline to MLflow and register it, tagged with the rows it has seen.
+
+    Random forests are also logged in compiled form (src/compiled_forest.py), which serving can
+    memory-map instead of unpickling the estimator, and as a compact quantized export
+    (src/compact_forest.py) with its validation report on the held-out `X_val`, `y_val`.
+    `previous_tags` are the tags of the model an incremental update extended, and `metrics`
+    are logged on the registering run.
+    """
+    with mlflow.start_run():
+        mlflow.set_tags(training_tags(df, previous_tags))
+        if metrics:
+            mlflow.log_metrics(metrics)
+        mlflow.sklearn.log_model(
+            sk_model=pipeline,
+            artifact_path="rf_regressor_v1",
+            input_example=df.drop(columns="Price").head(5),
+            registered_model_name=REGISTERED_MODEL_NAME
+        )
+        model = pipeline.named_steps["model"]
+        if isinstance(model, RandomForestRegressor):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "compiled_forest.bin")
+                compiled = CompiledForest.from_forest(model)
+                compiled.save(path)
+                mlflow.log_artifact(path, artifact_path="rf_regressor_v1_compiled")
+
+                compact_path = os.path.join(tmp_dir, "compact_forest.bin")
+                report = export_compact_forest(model, compact_path, X_val, y_val,
+                                               threshold_dtype=COMPACT_THRESHOLD_DTYPE,
+                                               value_dtype=COMPACT_VALUE_DTYPE,
+                                               prune_tolerance=COMPACT_PRUNE_TOLERANCE)
+                mlflow.log_artifact(compact_path, artifact_path="rf_regressor_v1_compact")
+                mlflow.log_dict(report, "rf_regressor_v1_compact/validation_report.json")
+
+
+@click.command()
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help="Extend the latest registered model with the rows appended to the S3 file since it was "
+    "trained, instead of retraining from scratch. Falls back to a full retrain when earlier "
+    "rows changed, no model is registered yet or the model engine does not support incremental training. "
+    "The update is only registered if it scores at least as well as the latest version on the newest rows.",
+)
+@click.option(
+    "--revalidate-cache/--no-revalidate-cache",
+    default=S3_CACHE_REVALIDATE,
+    show_default=True,
+    help="Check the locally cached copy of the S3 file against S3 (one HEAD request) and download it "
+    "again if it changed. Without it, a cached copy is used without any network I/O. The default "
+    "comes from S3_CACHE_REVALIDATE in config/config.py.",
+)
+@click.option(
+    "--tune",
+    is_flag=True,
+    default=False,
+    help="Tune the hyperparameters with TPE on the validation split before the final fit. Trials are "
+    "stored in the trial store (TRIAL_STORE_PATH), so an interrupted or repeated run on the same data "
+    "resumes the study instead of retraining the configurations it already evaluated.",
+)
+@click.option("--max-evals", default=50, show_default=True, help="Tuning trials, stored ones included.")
+@click.option("--n-workers", default=1, show_default=True, help="Tuning trials evaluated concurrently.")
+def main(incremental: bool, revalidate_cache: bool, tune: bool, max_evals: int, n_workers: int):
+    """Train (or incrementally update) the house price model and register it in MLflow."""
     logging.info("Starting S3CSVReader...")
     reader = S3CSVReader(bucket_name=S3_BUCKET_NAME, region_name=AWS_REGION, 
-                         aws_access_key_id=S3_AWS_ACCESS_KEY_ID, aws_secret_access_key=S3_AWS_SECRET_ACCESS_KEY)
-    # Read the CSV file from S3
-    df = reader.read_csv(s3_key=S3_KEY, encoding='utf-8')
+                         aws_access_key_id=S3_AWS_ACCESS_KEY_ID, aws_secret_access_key=S3_AWS_SECRET_ACCESS_KEY,
+                         cache=S3DiskCache(S3_CACHE_DIR, max_bytes=S3_CACHE_MAX_BYTES,
+                                           revalidate=revalidate_cache))
+    # Read the CSV file from S3 (through its cached Parquet snapshot)
+    df = reader.read_snapshot(s3_key=S3_KEY, encoding='utf-8')
+    
+    config = ModelNameConfig()
+    mlflow.set_tracking_uri(uri="http://127.0.0.1:8080")
+    mlflow.set_experiment(experiment_name="rf_regressor_experiment_8192025")
+    
+    # Incremental update: only the rows appended since the last registered model are trained on
+    if incremental and not get_engine(config.model_name).supports_incremental:
+        logging.info(f"{config.model_name} does not support incremental training; retraining from scratch.")
+    elif incremental:
+        latest = load_latest_model(REGISTERED_MODEL_NAME)
+        new_rows = find_new_rows(df, latest[1]) if latest else None
+        if new_rows is not None and len(new_rows) == 0:
+            logging.info("No new rows since the registered model; nothing to do.")
+            return
+        if new_rows is not None and len(new_rows) < 2:
+            logging.info("Too few new rows to train on and validate; waiting for more.")
+            return
+        if new_rows is not None:
+            pipeline, tags, version = latest
+            # The newest rows validate the update and are trained on by the next one
+            train_rows, holdout_rows = split_new_rows(new_rows, INCREMENTAL_HOLDOUT)
+            holdout = clean_data(holdout_rows, pipeline.named_steps["preprocessor"])
+            X_holdout, y_holdout = holdout.drop(columns="Price"), holdout["Price"]
+            # The update extends the model in place, so the current version is scored first
+            current = FusedMetrics().calculate_scores(y_holdout, pipeline.named_steps["model"].predict(X_holdout))
+            pipeline = update_model(pipeline, train_rows, config, rows_seen=int(tags["train_rows"]))
+            updated = FusedMetrics().calculate_scores(y_holdout, pipeline.named_steps["model"].predict(X_holdout))
+            logging.info(f"Holdout of {len(holdout_rows)} new rows: version {version} r2 {current['r2']:.4f}, "
+                         f"rmse {current['rmse']:.2f}; updated r2 {updated['r2']:.4f}, rmse {updated['rmse']:.2f}.")
+            # On the same holdout a lower rmse is a higher r2; rmse is also defined for a single held-out row
+            if updated["rmse"] > current["rmse"]:
+                logging.warning(f"The update scores below version {version} on the new rows; not registering it. "
+                                "Retrain from scratch without --incremental.")
+                return
+            logging.info(f"Registering version {version} extended with {len(train_rows)} new rows as a new version "
+                         f"({len(holdout_rows)} held out)...")
+            register_model(pipeline, df.iloc[:len(df) - len(holdout_rows)], X_holdout, y_holdout,
+                           previous_tags=tags,
+                           metrics={"holdout_r2": updated["r2"], "holdout_rmse": updated["rmse"],
+                                    "previous_holdout_r2": current["r2"], "previous_holdout_rmse": current["rmse"]})
+            logging.info("Model logged successfully.")
+            return
     
     # Clean, transform, and split the data.
-    processed_df = clean_data(df)
+    processed_df, preprocessor = fit_clean_data(df)
     X_train, X_val, y_train, y_val = split_data(processed_df)
     
     # Load the processed data back to S3
-    load_processed_data_to_s3(processed_df, bucket_name=S3_BUCKET_NAME, csvfilename='processed_house_prices.csv')
+    load_processed_data_to_s3(processed_df, bucket_name=S3_BUCKET_NAME, csvfilename='processed_house_prices.csv.gz',
+                              compression='gzip')
+    load_processed_snapshot_to_s3(processed_df, bucket_name=S3_BUCKET_NAME, filename='processed_house_prices.parquet')
     
     
-    # Train Model
-    config = ModelNameConfig()
-    mlflow.set_tracking_uri(uri="http://127.0.0.1:8080")
-    mlflow.set_experiment(experiment_name="rf_regressor_experiment_8192025")
+    # Tune Model, resuming the stored study for this data and search space
     mlflow.sklearn.autolog(silent=True)
+    hyperparameters = None
+    if tune:
+        search_space = get_engine(config.model_name).search_space()
+        best = tune_model(X_train = X_train,
+                          y_train = y_train,
+                          X_val = X_val,
+                          y_val = y_val,
+                          config = config,
+                          search_space = search_space,
+                          max_evals = max_evals,
+                          n_workers = n_workers,
+                          trial_store = TrialStore(TRIAL_STORE_PATH))
+        # fmin reports hp.choice parameters by index
+        hyperparameters = space_eval(search_space, best)
+
+    # Train Model
     model = train_model(X_train = X_train, 
                         y_train = y_train, 
-                        config = config)
+                        config = config,
+                        hyperparameters = hyperparameters)
     
-    # Log the sklearn model and register it in MLflow
+    # Log the sklearn model, bundled with its fitted preprocessor, and register it in MLflow
     logging.info("Logging the model to MLflow...")
-    mlflow.sklearn.log_model(
-        sk_model=model,
-        artifact_path="rf_regressor_v1",
-        input_example=X_train,
-        registered_model_name="Best_RF_House_Model"
-    )
+    register_model(Pipeline([("preprocessor", preprocessor), ("model", model)]), df, X_val, y_val)
     logging.info("Model logged successfully.")
-    
-    
-    # Tune Model
-    # config = ModelNameConfig()
-    # search_space =  {
-    #                 'n_estimators': hp.choice('n_estimators', range(100, 500)),
-    #                 'max_depth': hp.choice('max_depth', range(1, 20)),
-    #                 'min_samples_split': hp.uniform('min_samples_split', 0.1, 1.0),
-    #                 'min_samples_leaf': hp.choice('min_samples_leaf', range(1, 10))
-    #                 }
-    # mlflow.set_tracking_uri(uri="http://127.0.0.1:8080")
-    # mlflow.set_experiment(experiment_name="rf_regressor_experiment_8192025")
-    # mlflow.sklearn.autolog(silent=True)
-    # params = tune_model(X_train = X_train, 
-    #                     y_train = y_train,
-    #                     X_val = X_val,
-    #                     y_val = y_val, 
-    #                     config = config,
-    #                     search_space=search_space)
-    
-    # Train Model on best params and save to pkl
-    # config = ModelNameConfig()
-    # mlflow.set_tracking_uri(uri="http://127.0.0.1:8080")
-    # mlflow.set_experiment(experiment_name="rf_regressor_experiment_8192025")
-    # mlflow.sklearn.autolog()
-    # tuned_model = train_model(
-    #                 X_train,
-    #                 y_train,
-    #                 hyperparameters=params,
-    #                 config=config,
-    #             )
 
-    
-    
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.evaluate_scores import Evaluation
+from src.thread_budget import ThreadBudget
+
+""" Notes:
+- This module adds uncertainty to the validation metrics: bootstrap confidence intervals for R2 and RMSE,
+  and the same metrics per slice of the validation set (e.g. per location or condition).
+- R2 and RMSE of a resample only depend on three weighted sums over the rows: squared residual, centered
+  target and squared centered target. A block of resamples is therefore a (replicates x rows) matrix of
+  row weights, and its sums are a single matrix product with the (rows x 3) value matrix; there is no
+  Python loop per replicate. The weights and values are float32 to halve the memory traffic of the product;
+  it runs over blocks of `_ROW_BLOCK` rows whose partial sums are accumulated in float64.
+- The default "poisson" method draws each weight independently from Poisson(1) (the Poisson bootstrap),
+  with a 16-bit lookup table instead of a sampler. For large validation sets it is equivalent to
+  resampling rows with replacement, and about 4x cheaper than gathering a (replicates x rows) index
+  matrix. The "multinomial" method draws that index matrix and counts it into weights, for the classic
+  bootstrap on small validation sets.
+- Blocks have their own seeds spawned from `seed`, so results do not depend on the number of threads.
+- Per-slice metrics are group-by reductions: the slice codes index `np.bincount` sums, one pass per column.
+- R2 of a constant target follows sklearn (and `FusedMetrics`): 1 for perfect predictions, 0 otherwise. This
+  applies to the point estimate, the resamples and the slices.
+"""
+
+# Thresholds on a uniform 16-bit integer splitting it into Poisson(1) counts 0, 1, 2, ...
+_POISSON_CUTS = np.round(np.cumsum([math.exp(-1) / math.factorial(k) for k in range(8)]) * 65536)
+_POISSON_TABLE = np.searchsorted(_POISSON_CUTS, np.arange(65536), side="right").astype(np.uint8)
+# Rows per float32 product in a block of resamples; the partial sums are added up in float64.
+_ROW_BLOCK = 4096
+
+
+def _r2(sse: np.ndarray, sst: np.ndarray, constant: np.ndarray) -> np.ndarray:
+    # R2 where `constant` marks a constant target: 1 for perfect predictions, 0 otherwise, as in sklearn.
+    sse, sst = np.asarray(sse, dtype=np.float64), np.asarray(sst, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(constant, np.where(sse == 0, 1.0, 0.0), 1.0 - sse / sst)
+
+
+class BootstrapMetrics(Evaluation):
+    """ Evaluation with bootstrap confidence intervals for R2 and RMSE.
+    Args:
+        y_true (np.ndarray): True Labels
+        y_pred (np.ndarray): Prediction Labels
+    Returns:
+        scores (Dict[str, float]): r2 and rmse with their `_lower` and `_upper` bounds.
+    Raises:
+        Exception: If error in calculating the intervals.
+    """
+    def __init__(self, n_replicates: int = 1000, confidence: float = 0.95, method: str = "poisson",
+                 seed: Optional[int] = 42, n_jobs: Optional[int] = None, batch_elements: int = 1 << 24):
+        """
+        Args:
+            n_replicates (int): Number of bootstrap resamples (default: 1000).
+            confidence (float): Coverage of the percentile intervals (default: 0.95).
+            method (str): "poisson" or "multinomial" resampling (default: "poisson").
+            seed (int, optional): Seed of the resamples.
+            n_jobs (int, optional): Threads used for the resamples. Defaults to every available core.
+            batch_elements (int): Bound on replicates x rows drawn at once, to cap temporary
+                memory (default: 2**24).
+        """
+        if method not in ("poisson", "multinomial"):
+            raise ValueError(f"Unknown bootstrap method {method!r}; use 'poisson' or 'multinomial'.")
+        self.n_replicates = n_replicates
+        self.confidence = confidence
+        self.method = method
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.batch_elements = batch_elements
+
+    def calculate_scores(self, y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+        try:
+            logging.info(f"Bootstrapping R2 and RMSE over {self.n_replicates} {self.method} resamples...")
+            y_true = np.asarray(y_true, dtype=np.float64).ravel()
+            y_pred = np.asarray(y_pred, dtype=np.float64).ravel()
+            r2, rmse = self.replicates(y_true, y_pred)
+            tail = (1.0 - self.confidence) / 2
+            r2_lower, r2_upper = np.quantile(r2, [tail, 1.0 - tail])
+            rmse_lower, rmse_upper = np.quantile(rmse, [tail, 1.0 - tail])
+            residual = y_true - y_pred
+            sse = float(np.dot(residual, residual))
+            sst = float(np.dot(y_true - y_true.mean(), y_true - y_true.mean()))
+            scores = {
+                "r2": float(_r2(sse, sst, sst <= 0)),
+                "r2_lower": float(r2_lower),
+                "r2_upper": float(r2_upper),
+                "rmse": math.sqrt(sse / len(y_true)),
+                "rmse_lower": float(rmse_lower),
+                "rmse_upper": float(rmse_upper),
+            }
+            logging.info(f"Bootstrap {self.confidence:.0%} intervals: {scores}")
+            return scores
+        except Exception as e:
+            logging.error(f"Error in bootstrapping metrics: {e}")
+            raise e
+
+    def replicates(self, y_true: np.ndarray, y_pred: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """R2 and RMSE of every bootstrap resample.
+
+        Args:
+            y_true (np.ndarray): True Labels
+            y_pred (np.ndarray): Prediction Labels
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Arrays of shape (n_replicates,) with the R2 and RMSE
+                of each resample.
+        """
+        y_true = np.asarray(y_true, dtype=np.float64).ravel()
+        residual = y_true - np.asarray(y_pred, dtype=np.float64).ravel()
+        if len(residual) == 0:
+            raise ValueError("Cannot bootstrap an empty validation set.")
+        centered = y_true - y_true.mean()
+        values = np.stack([residual * residual, centered, centered * centered], axis=1).astype(np.float32)
+
+        block = max(1, min(self.n_replicates, self.batch_elements // len(residual)))
+        sizes = [min(block, self.n_replicates - start) for start in range(0, self.n_replicates, block)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        budget = ThreadBudget(self.n_jobs)
+        workers, _ = budget.split(len(sizes))
+        # Each block already runs one BLAS product per thread; keep BLAS from adding its own.
+        with budget.limit(1 if workers > 1 else None), ThreadPoolExecutor(max_workers=workers) as executor:
+            sums = np.concatenate(list(executor.map(
+                lambda args: self._block_sums(values, *args), zip(sizes, seeds))))
+
+        weight, squared_error, total, squared = sums.T
+        weight = np.maximum(weight, 1.0)
+        sst = squared - total * total / weight
+        return _r2(squared_error, sst, sst <= 0), np.sqrt(squared_error / weight)
+
+    def _block_sums(self, values: np.ndarray, size: int, seed: np.random.SeedSequence) -> np.ndarray:
+        # Weighted row count and sums of `values` for `size` resamples.
+        rng = np.random.default_rng(seed)
+        n_rows = len(values)
+        if self.method == "poisson":
+            bits = rng.integers(0, 65536, size=(size, n_rows), dtype=np.uint16)
+            weights = _POISSON_TABLE.take(bits)
+        else:
+            index = rng.integers(0, n_rows, size=(size, n_rows), dtype=np.int64)
+            index += np.arange(size, dtype=np.int64)[:, None] * n_rows
+            weights = np.bincount(index.ravel(), minlength=size * n_rows).reshape(size, n_rows)
+        weights = weights.astype(np.float32)
+        sums = np.zeros((size, values.shape[1]), dtype=np.float64)
+        for start in range(0, n_rows, _ROW_BLOCK):
+            sums += weights[:, start:start + _ROW_BLOCK] @ values[start:start + _ROW_BLOCK]
+        return np.column_stack([weights.sum(axis=1, dtype=np.float64), sums])
+
+
+def slice_scores(y_true: np.ndarray, y_pred: np.ndarray, slices: pd.DataFrame,
+                 columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Per-slice metrics, e.g. per `Location_Label_Encoded` value.
+
+    Args:
+        y_true (np.ndarray): True Labels
+        y_pred (np.ndarray): Prediction Labels
+        slices (pd.DataFrame): Columns to slice by, aligned with the labels (e.g. X_val).
+        columns (Sequence[str], optional): Columns of `slices` to use. Defaults to all of them.
+    Returns:
+        pd.DataFrame: One row per (column, value) with count, r2, rmse, mae and mean_residual
+            (label minus prediction). R2 of a slice with a constant target is 1 for perfect
+            predictions and 0 otherwise.
+    Raises:
+        Exception: If error in calculating the slice metrics.
+    """
+    try:
+        y_true = np.asarray(y_true, dtype=np.float64).ravel()
+        residual = y_true - np.asarray(y_pred, dtype=np.float64).ravel()
+        # Centering keeps the per-slice sums of squares accurate for large targets.
+        centered = y_true - y_true.mean()
+        frames = []
+        for column in columns if columns is not None else slices.columns:
+            codes, uniques = pd.factorize(slices[column], sort=True, use_na_sentinel=False)
+            n_groups = len(uniques)
+            count = np.bincount(codes, minlength=n_groups).astype(np.float64)
+            sse = np.bincount(codes, weights=residual * residual, minlength=n_groups)
+            sae = np.bincount(codes, weights=np.abs(residual), minlength=n_groups)
+            sum_residual = np.bincount(codes, weights=residual, minlength=n_groups)
+            total = np.bincount(codes, weights=centered, minlength=n_groups)
+            squared = np.bincount(codes, weights=centered * centered, minlength=n_groups)
+            sst = squared - total * total / count
+            # Below rounding error of the sums, the slice's target is constant.
+            r2 = _r2(sse, sst, sst <= 1e-12 * squared)
+            frames.append(pd.DataFrame({
+                "column": column,
+                "value": uniques,
+                "count": count.astype(np.int64),
+                "r2": r2,
+                "rmse": np.sqrt(sse / count),
+                "mae": sae / count,
+                "mean_residual": sum_residual / count,
+            }))
+        scores = pd.concat(frames, ignore_index=True)
+        logging.info(f"Calculated metrics for {len(scores)} slices.")
+        return scores
+    except Exception as e:
+        logging.error(f"Error in calculating slice metrics: {e}")
+        raise e
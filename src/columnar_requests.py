@@ -0,0 +1,82 @@
+import logging
+from typing import Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .schema import RAW_HOUSE_SCHEMA
+
+""" Notes:
+- This module defines the binary, columnar request format for batch predictions: an Arrow IPC stream
+  holding raw house rows with the `REQUEST_SCHEMA` columns (the raw schema without the Price target).
+- Decoding maps the request body without copying it, casts only the columns whose types differ from the
+  schema, and hands NumPy buffers to pandas; categoricals arrive dictionary-encoded and become
+  `category` columns, which the fitted preprocessor encodes with a code remap. No step builds a
+  Python object per row, unlike the JSON `orient="split"` path.
+- Predictions are returned the same way, as a one-column (`prediction`, float64) Arrow stream.
+"""
+
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+REQUEST_SCHEMA = pa.schema([field for field in RAW_HOUSE_SCHEMA if field.name != "Price"])
+PREDICTION_SCHEMA = pa.schema([("prediction", pa.float64())])
+
+
+def _write_stream(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _read_stream(body: Union[bytes, memoryview, pa.Buffer]) -> pa.Table:
+    return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+
+
+def encode_houses(df: pd.DataFrame) -> bytes:
+    """Serialize raw house rows into an Arrow IPC request body.
+
+    Args:
+        df (pd.DataFrame): Raw rows with (at least) the `REQUEST_SCHEMA` columns.
+    Returns:
+        bytes: The request body.
+    Raises:
+        pa.ArrowInvalid: If a column cannot be cast to its schema type.
+    """
+    return _write_stream(pa.Table.from_pandas(df, schema=REQUEST_SCHEMA, preserve_index=False))
+
+
+def decode_houses(body: Union[bytes, memoryview, pa.Buffer]) -> pd.DataFrame:
+    """Raw house rows from an Arrow IPC request body, ready for the model pipeline.
+
+    Args:
+        body (Union[bytes, memoryview, pa.Buffer]): The request body.
+    Returns:
+        pd.DataFrame: The `REQUEST_SCHEMA` columns, in schema order.
+    Raises:
+        ValueError: If the request misses columns of the schema.
+        pa.ArrowInvalid: If the body is not an Arrow stream or a column cannot be cast.
+    """
+    try:
+        table = _read_stream(body)
+        missing = [name for name in REQUEST_SCHEMA.names if name not in table.schema.names]
+        if missing:
+            raise ValueError(f"Request is missing columns {missing}.")
+        table = table.select(REQUEST_SCHEMA.names)
+        if not table.schema.equals(REQUEST_SCHEMA):
+            table = table.cast(REQUEST_SCHEMA)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    except Exception as e:
+        logging.error(f"Error decoding columnar request: {e}")
+        raise e
+
+
+def encode_predictions(predictions: np.ndarray) -> bytes:
+    """Serialize predictions into an Arrow IPC response body."""
+    column = pa.array(np.asarray(predictions, dtype=np.float64).ravel())
+    return _write_stream(pa.Table.from_arrays([column], schema=PREDICTION_SCHEMA))
+
+
+def decode_predictions(body: Union[bytes, memoryview, pa.Buffer]) -> np.ndarray:
+    """Predictions from an Arrow IPC response body."""
+    return _read_stream(body).column("prediction").to_numpy()
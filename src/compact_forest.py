@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import zlib
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.compiled_forest import CompiledForest
+from src.model_cache import estimate_nbytes
+
+""" Notes:
+- This module exports a forest as a small artifact: a `CompiledForest` that is quantized, optionally pruned
+  and stored with compressed node arrays. `load_compact_forest` restores a `CompiledForest` for prediction.
+- Quantization: leaf values are stored as float32 or float16. Thresholds are stored as float32 (exact, see
+  src/compiled_forest.py) or float16, rounded down. float16 keeps 11 significant bits, so values are divided
+  by a power-of-two scale (one for the values, one per feature for thresholds) to fit its range; the scaling
+  itself is exact, only the rounding changes predictions, and the report shows by how much.
+- Pruning: depth truncation turns nodes at a given depth into leaves (sklearn keeps the mean target of every
+  node, so those nodes already hold the right value). Dropping trees keeps a prefix of the forest, which is
+  an unbiased smaller forest because the trees are independent. The smallest depth and tree count are
+  chosen for which the validation RMSE is at most `prune_tolerance` (relative) above the original model's.
+- Storage: children are stored relative to their parent (depth-first trees put the left child right after
+  its parent), features in the smallest integer type, and each array is compressed with zstd when it is
+  installed, otherwise zlib.
+- Every export returns a validation report comparing predictions and metrics against the original forest.
+"""
+
+MAGIC = b"HPCOMPACT"
+_THRESHOLD_DTYPES = {"float32": np.float32, "float16": np.float16}
+_VALUE_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def _node_depths(arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    """Depth of every node, by walking all trees one level at a time from their roots."""
+    children = arrays["children"].reshape(-1, 2)
+    depths = np.full(len(children), -1, dtype=np.int32)
+    frontier, depth = arrays["roots"].astype(np.int64), 0
+    while len(frontier):
+        depths[frontier] = depth
+        internal = frontier[children[frontier, 0] != frontier]
+        frontier = children[internal].ravel()
+        depth += 1
+    return depths
+
+
+def prune_forest(compiled: CompiledForest, n_trees: Optional[int] = None,
+                 max_depth: Optional[int] = None) -> CompiledForest:
+    """Keep the first `n_trees` trees, truncated to `max_depth` levels.
+
+    Args:
+        compiled (CompiledForest): Forest to prune.
+        n_trees (int, optional): Trees to keep. Defaults to all.
+        max_depth (int, optional): Depth at which nodes become leaves. Defaults to no limit.
+    Returns:
+        CompiledForest: The pruned forest, with unreachable nodes removed.
+    """
+    a = compiled.arrays
+    n_trees = compiled.n_trees if n_trees is None else min(n_trees, compiled.n_trees)
+    max_depth = compiled.max_depth if max_depth is None else min(max_depth, compiled.max_depth)
+    n_nodes = len(a["value"])
+    end = a["roots"][n_trees] if n_trees < compiled.n_trees else n_nodes
+
+    depths = _node_depths(a)
+    keep = (np.arange(n_nodes) < end) & (depths >= 0) & (depths <= max_depth)
+    new_index = np.cumsum(keep) - 1
+    children = a["children"].reshape(-1, 2)[keep]
+    kept = np.flatnonzero(keep)
+    to_leaf = (depths[kept] == max_depth) | (children[:, 0] == kept)
+    children = np.where(to_leaf[:, None], new_index[kept][:, None], new_index[children])
+    index_dtype = a["roots"].dtype
+    arrays = {
+        "roots": new_index[a["roots"][:n_trees]].astype(index_dtype),
+        "feature": np.where(to_leaf, 0, a["feature"][kept]).astype(a["feature"].dtype),
+        "threshold": np.where(to_leaf, np.inf, a["threshold"][kept]).astype(a["threshold"].dtype),
+        "children": children.astype(index_dtype).ravel(),
+        "missing_left": np.where(to_leaf, True, a["missing_left"][kept]),
+        "value": a["value"][kept],
+    }
+    return CompiledForest(arrays, max_depth=max_depth, n_features_in_=compiled.n_features_in_,
+                          feature_names_in_=compiled.feature_names_in_)
+
+
+def _power_of_two_scale(magnitude: np.ndarray) -> np.ndarray:
+    """Power-of-two divisors bringing magnitudes within float16's range (at most 2**15)."""
+    magnitude = np.where(np.isfinite(magnitude) & (magnitude > 0), magnitude, 1.0)
+    return np.exp2(np.maximum(np.ceil(np.log2(magnitude / 2.0 ** 15)), -24))
+
+
+def _float16_floor(values: np.ndarray) -> np.ndarray:
+    """Largest float16 at or below each value."""
+    rounded = values.astype(np.float16)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float16(-np.inf))
+    return rounded
+
+
+def _tree_predictions(compiled: CompiledForest, X: np.ndarray) -> np.ndarray:
+    """Per-tree predictions (rows x trees) for choosing how many trees to keep."""
+    per_tree = np.empty((len(X), compiled.n_trees))
+    for tree in range(compiled.n_trees):
+        single = CompiledForest(dict(compiled.arrays, roots=compiled.arrays["roots"][tree:tree + 1]),
+                                max_depth=compiled.max_depth, n_features_in_=compiled.n_features_in_,
+                                feature_names_in_=compiled.feature_names_in_)
+        per_tree[:, tree] = single.predict(X)
+    return per_tree
+
+
+def _rmse(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    return float(np.sqrt(np.mean((y_true - y_pred) ** 2)))
+
+
+def choose_pruning(compiled: CompiledForest, X_val: np.ndarray, y_val: np.ndarray,
+                   tolerance: float) -> Tuple[int, int]:
+    """Smallest (max_depth, n_trees) whose validation RMSE is within `tolerance` of the full forest's.
+
+    Args:
+        compiled (CompiledForest): The unpruned forest.
+        X_val (np.ndarray): Validation features.
+        y_val (np.ndarray): Validation labels.
+        tolerance (float): Allowed relative RMSE increase, e.g. 0.01 for 1%.
+    Returns:
+        Tuple[int, int]: The chosen max_depth and number of trees.
+    """
+    budget = _rmse(y_val, compiled.predict(X_val)) * (1 + tolerance)
+    max_depth = compiled.max_depth
+    for depth in range(1, compiled.max_depth + 1):
+        if _rmse(y_val, prune_forest(compiled, max_depth=depth).predict(X_val)) <= budget:
+            max_depth = depth
+            break
+    # Mean of the first k trees for every k at once, from the per-tree predictions.
+    per_tree = _tree_predictions(prune_forest(compiled, max_depth=max_depth), X_val)
+    prefix_means = np.cumsum(per_tree, axis=1) / np.arange(1, compiled.n_trees + 1)
+    rmse = np.sqrt(np.mean((prefix_means - np.asarray(y_val)[:, None]) ** 2, axis=0))
+    n_trees = int(np.argmax(rmse <= budget)) + 1 if (rmse <= budget).any() else compiled.n_trees
+    return max_depth, n_trees
+
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    try:
+        import zstandard
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    except ImportError:
+        return "zlib", zlib.compress(data, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def save_compact_forest(compiled: CompiledForest, path: str, threshold_dtype: str = "float32",
+                        value_dtype: str = "float32") -> int:
+    """Write a (quantized) forest with compressed node arrays; returns the file size in bytes."""
+    a = compiled.arrays
+    nodes = np.arange(len(a["value"]), dtype=np.int64)
+    children = a["children"].reshape(-1, 2).astype(np.int64) - nodes[:, None]
+    threshold_scales = np.ones(compiled.n_features_in_)
+    value_scale = 1.0
+    thresholds, values = a["threshold"], a["value"]
+    if threshold_dtype == "float16":
+        split = np.isfinite(thresholds)
+        magnitude = np.zeros(compiled.n_features_in_)
+        np.maximum.at(magnitude, a["feature"][split], np.abs(thresholds[split]).astype(np.float64))
+        threshold_scales = _power_of_two_scale(magnitude)
+        thresholds = _float16_floor(thresholds / threshold_scales[a["feature"]])
+    if value_dtype == "float16":
+        value_scale = float(_power_of_two_scale(np.abs(values).max(initial=0)))
+        values = (values / value_scale).astype(np.float16)
+    stored = {
+        "roots": np.diff(a["roots"].astype(np.int64), prepend=0),
+        "feature": a["feature"].astype(np.min_scalar_type(max(compiled.n_features_in_ - 1, 0))),
+        "threshold": thresholds.astype(_THRESHOLD_DTYPES[threshold_dtype]),
+        "children": children.astype(np.min_scalar_type(-int(np.abs(children).max(initial=0)) - 1)),
+        "missing_left": np.packbits(a["missing_left"]),
+        "value": values.astype(_VALUE_DTYPES[value_dtype]),
+    }
+    header = {"max_depth": int(compiled.max_depth), "n_features_in_": int(compiled.n_features_in_),
+              "feature_names_in_": compiled.feature_names_in_, "n_nodes": int(len(nodes)),
+              "threshold_scales": threshold_scales.tolist(), "value_scale": value_scale, "arrays": {}}
+    blobs = []
+    for name, array in stored.items():
+        codec, blob = _compress(np.ascontiguousarray(array).tobytes())
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                                  "codec": codec, "length": len(blob)}
+        blobs.append(blob)
+    header_bytes = json.dumps(header).encode()
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def load_compact_forest(path: str) -> CompiledForest:
+    """Read a file written by `save_compact_forest` into a `CompiledForest`."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a compact forest file.")
+        header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+        stored = {}
+        for name, spec in header["arrays"].items():
+            data = _decompress(spec["codec"], f.read(spec["length"]))
+            stored[name] = np.frombuffer(data, dtype=np.dtype(spec["dtype"])).reshape(spec["shape"])
+    n_nodes = header["n_nodes"]
+    index_dtype = np.int32 if n_nodes < np.iinfo(np.int32).max else np.int64
+    nodes = np.arange(n_nodes, dtype=np.int64)
+    arrays = {
+        "roots": np.cumsum(stored["roots"]).astype(index_dtype),
+        "feature": stored["feature"].astype(np.int32),
+        "threshold": (stored["threshold"].astype(np.float64)
+                      * np.asarray(header["threshold_scales"])[stored["feature"]]).astype(np.float32),
+        "children": (stored["children"].astype(np.int64) + nodes[:, None]).astype(index_dtype).ravel(),
+        "missing_left": np.unpackbits(stored["missing_left"], count=n_nodes).astype(bool),
+        "value": stored["value"].astype(np.float64) * header["value_scale"],
+    }
+    return CompiledForest(arrays, max_depth=header["max_depth"], n_features_in_=header["n_features_in_"],
+                          feature_names_in_=header["feature_names_in_"])
+
+
+def export_compact_forest(forest, path: str, X_val: Union[pd.DataFrame, np.ndarray],
+                          y_val: Optional[Union[pd.Series, np.ndarray]] = None,
+                          threshold_dtype: str = "float32", value_dtype: str = "float32",
+                          prune_tolerance: Optional[float] = None) -> dict:
+    """Export a forest as a compact artifact and validate it against the original.
+
+    Args:
+        forest: A fitted forest (e.g. RandomForestRegressor) or a `CompiledForest`.
+        path (str): Output file.
+        X_val (Union[pd.DataFrame, np.ndarray]): Validation features for the report (and pruning).
+        y_val (Union[pd.Series, np.ndarray], optional): Validation labels; needed for pruning
+            and for the metrics in the report.
+        threshold_dtype (str): "float32" (exact) or "float16".
+        value_dtype (str): "float32" or "float16".
+        prune_tolerance (float, optional): Allowed relative increase of validation RMSE from
+            pruning, e.g. 0.01. None disables pruning.
+    Returns:
+        dict: The validation report: sizes, node counts, prediction deltas and metrics.
+    Raises:
+        ValueError: If pruning is requested without `y_val`, or a dtype is not supported.
+    """
+    try:
+        if threshold_dtype not in _THRESHOLD_DTYPES or value_dtype not in _VALUE_DTYPES:
+            raise ValueError(f"Unsupported dtypes: thresholds {threshold_dtype}, values {value_dtype}.")
+        if prune_tolerance is not None and y_val is None:
+            raise ValueError("Pruning needs validation labels (y_val).")
+        compiled = forest if isinstance(forest, CompiledForest) else CompiledForest.from_forest(forest)
+        original = forest.predict(X_val)
+
+        compact = compiled
+        if prune_tolerance is not None:
+            max_depth, n_trees = choose_pruning(compiled, X_val, y_val, prune_tolerance)
+            compact = prune_forest(compiled, n_trees=n_trees, max_depth=max_depth)
+        file_bytes = save_compact_forest(compact, path, threshold_dtype, value_dtype)
+        predictions = load_compact_forest(path).predict(X_val)
+
+        delta = np.abs(predictions - original)
+        scale = np.maximum(np.abs(original), np.finfo(np.float64).tiny)
+        report = {
+            "file_bytes": file_bytes,
+            "original_pickle_bytes": estimate_nbytes(forest),
+            "threshold_dtype": threshold_dtype,
+            "value_dtype": value_dtype,
+            "n_trees": [compiled.n_trees, compact.n_trees],
+            "max_depth": [int(compiled.max_depth), int(compact.max_depth)],
+            "n_nodes": [int(len(compiled.arrays["value"])), int(len(compact.arrays["value"]))],
+            "prediction_delta": {
+                "max_abs": float(delta.max(initial=0)),
+                "mean_abs": float(delta.mean()) if len(delta) else 0.0,
+                "p99_abs": float(np.quantile(delta, 0.99)) if len(delta) else 0.0,
+                "max_relative": float((delta / scale).max(initial=0)),
+            },
+        }
+        if y_val is not None:
+            y_true = np.asarray(y_val, dtype=np.float64)
+            report["rmse"] = [_rmse(y_true, original), _rmse(y_true, predictions)]
+        logging.info(f"Compact forest written to {path}: {file_bytes} bytes "
+                     f"(pickle {report['original_pickle_bytes']}), max abs prediction delta "
+                     f"{report['prediction_delta']['max_abs']:.6g}.")
+        return report
+    except Exception as e:
+        logging.error(f"Error exporting compact forest: {e}")
+        raise e
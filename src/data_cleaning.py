@@ -2,14 +2,22 @@ import logging
 from abc import ABC, abstractmethod
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from typing import Union
-from sklearn.preprocessing import LabelEncoder
+from sklearn.model_selection import KFold, RepeatedKFold, ShuffleSplit, TimeSeriesSplit
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+from src.sketches import HouseStatisticsSketch
 
 """ Notes:
 - This module defines strategies for data preprocessing and splitting.
 - The `DataStrategy` abstract class defines the interface for data handling strategies.
 - The `DataPreProcessStrategy` and `DataSplitStrategy` concrete strategies handle data preprocessing and splitting, respectively.
+- `HousePreProcessor` holds the learned preprocessing state (medians, category vocabularies) so it is fit once
+  at training time and reused, unchanged, at inference time. `fit_chunks` fits it from a stream of chunks
+  for datasets larger than memory.
+- `FeatureMatrix` and `IndexSplitStrategy` split by row indices over one shared feature buffer, so K-fold,
+  repeated and time-ordered splits do not copy the dataset per fold. `tune_model_cv` tunes on these folds,
+  so every trial (and every parallel worker, through shared memory) reuses the same feature buffer.
 - The `DataCleaning` class orchestrates the data cleaning and splitting process.
 - This is a strategy design pattern implementation for handling data in a flexible and reusable manner.
 """
@@ -24,30 +32,194 @@ class DataStrategy(ABC):
     def handle_data(self, data: pd.DataFrame) -> Union[pd.DataFrame, pd.Series]:
         pass
     
+class HousePreProcessor(BaseEstimator, TransformerMixin):
+    """Fitted preprocessing transformer for the house price data.
+
+    `fit` learns the imputation medians and the category vocabularies from the
+    training data. `transform` only applies them, so training and inference produce
+    identical encodings. Categories are encoded with their position in the sorted
+    training vocabulary (the same codes `LabelEncoder` produced); values never seen
+    during fit are encoded as -1. The transformer is picklable and can be bundled
+    with the model in a scikit-learn `Pipeline`.
+
+    Both passes work on NumPy buffers. `fit` computes every median in a single
+    `nanmedian` call over one numeric block (selection, not sorting) and builds the
+    vocabularies with hash-based `pd.unique`, sorting only the handful of distinct
+    levels. `transform` passes columns without missing values through as views,
+    imputes the rest into new buffers (the input is never modified), and encodes
+    categoricals by factorizing each column with one hash pass and looking up only
+    its distinct levels in the fitted vocabulary (a small code remap for `category`
+    columns), so time and memory grow linearly with the number of rows.
+    """
+    NUMERIC_COLUMNS: List[str] = ['Area', 'Bedrooms', 'Bathrooms', 'Floors', 'YearBuilt']
+    # Whole-number columns: their medians are rounded, so imputed values stay integral
+    # (a median of 2.5 bedrooms would not fit the integer snapshot schema).
+    INTEGER_COLUMNS: List[str] = ['Bedrooms', 'Bathrooms', 'Floors', 'YearBuilt']
+    CATEGORICAL_COLUMNS: List[str] = ['Location', 'Condition', 'Garage']
+    RATIO_FEATURES: Dict[str, Tuple[str, str]] = {
+        'bedroom_bathroom_ratio': ('Bedrooms', 'Bathrooms'),
+        'bedroom_floor_ratio': ('Bedrooms', 'Floors'),
+    }
+
+    def fit(self, X: pd.DataFrame, y: Optional[pd.Series] = None) -> "HousePreProcessor":
+        """Learn medians and category vocabularies from the training data."""
+        self._fit(X)
+        return self
+
+    def fit_transform(self, X: pd.DataFrame, y: Optional[pd.Series] = None) -> pd.DataFrame:
+        """Fit and transform, hashing each categorical column only once."""
+        encoded = self._fit(X)
+        return self._assemble(X, encoded)
+
+    def fit_chunks(self, chunks: Iterable[pd.DataFrame], k: int = 2048) -> "HousePreProcessor":
+        """Fit from a stream of chunks in constant memory.
+
+        Medians come from mergeable quantile sketches and are approximate (rank error
+        of roughly 1/k); category vocabularies are exact.
+
+        Args:
+            chunks (Iterable[pd.DataFrame]): Chunks covering the training data.
+            k (int): Size parameter of the quantile sketches (default: 2048).
+        """
+        statistics = HouseStatisticsSketch(self.NUMERIC_COLUMNS, self.CATEGORICAL_COLUMNS, k=k)
+        for chunk in chunks:
+            statistics.update(chunk)
+        logging.info(f"Built preprocessing statistics from {statistics.rows} rows.")
+        return self.fit_statistics(statistics)
+
+    def fit_statistics(self, statistics: HouseStatisticsSketch) -> "HousePreProcessor":
+        """Take the fitted state from (possibly merged) statistics sketches."""
+        self.medians_ = self._round_integer_medians(statistics.medians())
+        self.categories_ = statistics.categories()
+        return self
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        """Impute, add ratio features and encode categoricals with the fitted state."""
+        check_is_fitted(self, ['medians_', 'categories_'])
+        try:
+            encoded = {column: self._encode(X[column], self.categories_[column])
+                       for column in self.CATEGORICAL_COLUMNS}
+            return self._assemble(X, encoded)
+        except Exception as e:
+            logging.error(f"Error in data preprocessing: {e}")
+            raise
+
+    def _fit(self, X: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Learn the fitted state and return the training codes of each categorical."""
+        try:
+            numeric = X[self.NUMERIC_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+            medians = np.nanmedian(numeric, axis=0) if len(numeric) else np.full(numeric.shape[1], np.nan)
+            self.medians_ = self._round_integer_medians(dict(zip(self.NUMERIC_COLUMNS, medians.tolist())))
+            self.categories_, encoded = {}, {}
+            for column in self.CATEGORICAL_COLUMNS:
+                self.categories_[column], encoded[column] = self._factorize(X[column])
+            return encoded
+        except Exception as e:
+            logging.error(f"Error in fitting preprocessor: {e}")
+            raise
+
+    def _round_integer_medians(self, medians: Dict[str, float]) -> Dict[str, float]:
+        """Round the medians of whole-number columns; NaN (no observed values) is kept."""
+        for column in self.INTEGER_COLUMNS:
+            if not np.isnan(medians[column]):
+                medians[column] = round(medians[column])
+        return medians
+
+    def _assemble(self, X: pd.DataFrame, encoded: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """Build the output frame from imputed numeric buffers, ratios and category codes."""
+        try:
+            columns = {}
+            for column in X.columns:
+                if column in self.CATEGORICAL_COLUMNS:
+                    continue
+                columns[column] = self._impute(X[column], self.medians_.get(column))
+            for feature, (numerator, denominator) in self.RATIO_FEATURES.items():
+                # float32 matches the precision the tree models train on.
+                columns[feature] = np.divide(columns[numerator], columns[denominator], dtype=np.float32)
+            for column in self.CATEGORICAL_COLUMNS:
+                code_dtype = np.min_scalar_type(-max(len(self.categories_[column]), 1))
+                columns[f"{column}_Label_Encoded"] = encoded[column].astype(code_dtype)
+            return pd.DataFrame(columns, index=X.index, copy=False)
+        except Exception as e:
+            logging.error(f"Error in data preprocessing: {e}")
+            raise
+
+    def _impute(self, series: pd.Series, median: Optional[float]) -> np.ndarray:
+        """NumPy buffer of a column with missing values replaced by its fitted median.
+
+        Compact nullable integer columns (e.g. `Int8`) keep their width when the median
+        is integral and become float32 otherwise; plain NumPy columns without missing
+        values are returned as views.
+        """
+        if pd.api.types.is_extension_array_dtype(series.dtype) and series.dtype.kind in 'iu':
+            if not series.hasnans:
+                return series.to_numpy(dtype=series.dtype.numpy_dtype)
+            if median is None:
+                return series.to_numpy(dtype=np.float64, na_value=np.nan)
+            dtype = series.dtype.numpy_dtype if float(median).is_integer() else np.float32
+            return series.to_numpy(dtype=dtype, na_value=median)
+        values = series.to_numpy()
+        if median is not None and values.dtype.kind == 'f':
+            missing = np.isnan(values)
+            if missing.any():
+                # `values` may be a (possibly read-only) view of the caller's frame.
+                values = np.where(missing, values.dtype.type(median), values)
+        return values
+
+    @staticmethod
+    def _factorize(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted vocabulary of a column and its codes, from one hash-based pass.
+
+        Only the distinct levels are sorted; the codes are remapped to sorted order
+        through a lookup table. Missing values get code -1.
+        """
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            levels = series.cat.categories.to_numpy()
+            present = pd.unique(codes)
+            present = present[present >= 0]
+        else:
+            codes, levels = series.factorize()
+            levels = levels.to_numpy()
+            present = np.arange(len(levels))
+        order = present[np.argsort(levels[present], kind='stable')]
+        lookup = np.full(len(levels) + 1, -1, dtype=np.int64)
+        lookup[order] = np.arange(len(order))
+        return levels[order], lookup[codes]
+
+    @staticmethod
+    def _encode(series: pd.Series, categories: np.ndarray) -> np.ndarray:
+        """Position of each value in `categories`; -1 for missing or unseen values.
+
+        The column's own codes (category codes, or one hash-based `factorize` pass)
+        are remapped through a lookup table of its few distinct levels, so the
+        vocabulary is only searched once per level instead of once per row.
+        """
+        vocabulary = pd.Index(categories)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes, levels = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, levels = series.factorize()
+        lookup = np.append(vocabulary.get_indexer(levels), -1)
+        return lookup[codes].astype(np.int64, copy=False)
+
+
 class DataPreProcessStrategy(DataStrategy):
-    """Concrete Strategy for preprocessing data."""
+    """Concrete Strategy for preprocessing data.
+
+    Applies a `HousePreProcessor`. If none is given, or the given one is not yet
+    fitted, it is fit on the data first; the fitted preprocessor is kept on
+    `self.preprocessor` so it can be persisted and reused at inference time.
+    """
+    def __init__(self, preprocessor: Optional[HousePreProcessor] = None):
+        self.preprocessor = preprocessor if preprocessor is not None else HousePreProcessor()
+
     def handle_data(self, data: pd.DataFrame) -> pd.DataFrame:
         """ Preprocess Data """
         try:
-            # Impute missing values
-            data["Area"].fillna(data["Area"].median())
-            data["Bedrooms"].fillna(data["Bedrooms"].median())
-            data["Bathrooms"].fillna(data["Bathrooms"].median())
-            data["Floors"].fillna(data["Floors"].median())
-            data["YearBuilt"].fillna(round(data["YearBuilt"].median()))
-            
-            # Create new features
-            data['bedroom_bathroom_ratio'] = data['Bedrooms'] / data['Bathrooms']
-            data['bedroom_floor_ratio'] = data['Bedrooms'] / data['Floors']
-            
-            # Label Encode categorical features
-            data['Location_Label_Encoded'] = LabelEncoder().fit_transform(data['Location'])
-            data['Condition_Label_Encoded'] = LabelEncoder().fit_transform(data['Condition'])
-            data['Garage_Label_Encoded'] = LabelEncoder().fit_transform(data['Garage'])
-            
-            # Drop original categorical columns
-            data.drop(['Location', 'Condition', 'Garage'], axis=1, inplace=True)
-            return data
+            if not hasattr(self.preprocessor, 'medians_'):
+                return self.preprocessor.fit_transform(data)
+            return self.preprocessor.transform(data)
             
         except Exception as e:
             logging.error(f"Error in data preprocessing: {e}")
@@ -57,16 +229,131 @@ class DataSplitStrategy(DataStrategy):
     """Concrete Strategy for splitting data into training and validation."""
     def handle_data(self, data: pd.DataFrame) -> Union[pd.DataFrame, pd.DataFrame]:
         try:
-            X = data.drop("Price", axis=1)
-            y = data["Price"]
-            # Split the data into training and validation sets
-            X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+            # Same rows as train_test_split(test_size=0.2, random_state=42), but the
+            # feature frame is only materialized once per output, not via a full drop copy.
+            features = np.flatnonzero(data.columns != "Price")
+            train_idx, val_idx = next(ShuffleSplit(n_splits=1, test_size=0.2, random_state=42).split(data))
+            X_train = data.iloc[train_idx, features]
+            X_val = data.iloc[val_idx, features]
+            y_train = data["Price"].iloc[train_idx]
+            y_val = data["Price"].iloc[val_idx]
             return X_train, X_val, y_train, y_val
         
         except Exception as e:
             logging.error(f"Error in data splitting: {e}")
             raise
-            
+
+
+class FeatureMatrix:
+    """Features and target of a processed frame held once as NumPy buffers.
+
+    Splits are expressed as row-index arrays into this matrix; rows are only
+    gathered (`take`) when a fold is actually consumed. The features are stored as
+    a C-contiguous float32 block, the dtype the tree models train on, so they are
+    passed to `fit` without another conversion.
+    """
+    def __init__(self, data: pd.DataFrame, target: str = "Price", dtype: type = np.float32):
+        self.feature_names = [column for column in data.columns if column != target]
+        self.X = np.ascontiguousarray(data[self.feature_names].to_numpy(dtype=dtype))
+        self.y = data[target].to_numpy(dtype=np.float64)
+        self.index = data.index
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def column(self, name: str) -> np.ndarray:
+        """View of one feature column."""
+        return self.X[:, self.feature_names.index(name)]
+
+    def take(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Gather the feature rows and targets at `indices`."""
+        return self.X.take(indices, axis=0), self.y.take(indices)
+
+    def frame(self, indices: np.ndarray) -> Tuple[pd.DataFrame, pd.Series]:
+        """Gather rows as a DataFrame and Series, for APIs that need column names."""
+        X, y = self.take(indices)
+        index = self.index.take(indices)
+        return pd.DataFrame(X, columns=self.feature_names, index=index), pd.Series(y, index=index, name="Price")
+
+
+class IndexSplitStrategy(DataStrategy):
+    """Concrete Strategy for splitting data into row-index folds over a `FeatureMatrix`.
+
+    Modes:
+        - "holdout": one shuffled train/validation split (same rows as `DataSplitStrategy`).
+        - "kfold": `n_splits` shuffled folds.
+        - "repeated_kfold": `n_splits` folds repeated `n_repeats` times with different shuffles.
+        - "time": folds ordered by `time_column` (YearBuilt); every validation fold holds
+          strictly newer houses than its training rows. Fold boundaries fall between
+          distinct years (the year boundary closest to where `TimeSeriesSplit` would cut),
+          so no year is split between training and validation. With `n_splits=1` about the
+          newest `test_size` fraction is held out.
+    """
+    MODES = ("holdout", "kfold", "repeated_kfold", "time")
+
+    def __init__(self, mode: str = "holdout", n_splits: int = 5, n_repeats: int = 2,
+                 test_size: float = 0.2, time_column: str = "YearBuilt", random_state: int = 42):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown split mode '{mode}'. Choose one of {self.MODES}.")
+        self.mode = mode
+        self.n_splits = n_splits
+        self.n_repeats = n_repeats
+        self.test_size = test_size
+        self.time_column = time_column
+        self.random_state = random_state
+
+    def handle_data(self, data: Union[pd.DataFrame, FeatureMatrix]) -> Tuple[FeatureMatrix, List[Tuple[np.ndarray, np.ndarray]]]:
+        """Return the shared feature matrix and the (train, validation) index pairs."""
+        try:
+            matrix = data if isinstance(data, FeatureMatrix) else FeatureMatrix(data)
+            return matrix, list(self.split(matrix))
+        except Exception as e:
+            logging.error(f"Error in data splitting: {e}")
+            raise
+
+    def split(self, matrix: FeatureMatrix):
+        """Yield (train_indices, validation_indices) pairs."""
+        rows = np.empty((len(matrix), 0))
+        if self.mode == "holdout":
+            yield from ShuffleSplit(n_splits=1, test_size=self.test_size,
+                                    random_state=self.random_state).split(rows)
+        elif self.mode == "kfold":
+            yield from KFold(n_splits=self.n_splits, shuffle=True,
+                             random_state=self.random_state).split(rows)
+        elif self.mode == "repeated_kfold":
+            yield from RepeatedKFold(n_splits=self.n_splits, n_repeats=self.n_repeats,
+                                     random_state=self.random_state).split(rows)
+        else:
+            years = matrix.column(self.time_column)
+            order = np.argsort(years, kind="stable")
+            n = len(order)
+            if self.n_splits == 1:
+                targets = [n - int(np.ceil(self.test_size * n))]
+            else:
+                targets = [val[0] for _, val in TimeSeriesSplit(n_splits=self.n_splits).split(order)]
+            cuts = self._year_cuts(years[order], targets)
+            for cut, end in zip(cuts, cuts[1:] + [n]):
+                yield order[:cut], order[cut:end]
+
+    def _year_cuts(self, sorted_years: np.ndarray, targets: List[int]) -> List[int]:
+        """Snap row positions to the nearest start of a new year in the sorted rows."""
+        _, starts = np.unique(sorted_years, return_index=True)
+        boundaries = starts[1:]
+        if len(boundaries) < len(targets):
+            raise ValueError(f"{len(boundaries) + 1} distinct {self.time_column} values cannot make "
+                             f"{len(targets)} time-ordered folds.")
+        cuts = []
+        for target in targets:
+            i = int(np.searchsorted(boundaries, target))
+            nearest = min(boundaries[max(i - 1, 0):i + 1], key=lambda boundary: abs(boundary - target))
+            cuts.append(int(nearest))
+        cuts = sorted(set(cuts))
+        if len(cuts) < len(targets):
+            logging.warning(f"Only {len(cuts)} of {len(targets)} time-ordered folds remain after aligning "
+                            f"them to {self.time_column} boundaries.")
+        return cuts
+
+
 class DataCleaning:
     """
     Orchestrates data cleaning and divide into training and validation sets.
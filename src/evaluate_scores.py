@@ -1,7 +1,9 @@
 import logging
 from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional, Sequence, Tuple
 import numpy as np
 from sklearn.metrics import r2_score, mean_squared_error, root_mean_squared_error
+from src.sketches import QuantileSketch
 
 
 class Evaluation(ABC):
@@ -74,4 +76,159 @@ class RMSE(Evaluation):
             return rmse
         except Exception as e: 
             logging.error(f"Error in calculating RMSE: {e}")
-            raise e
\ No newline at end of file
+            raise e
+
+
+class MetricsAccumulator:
+    """ Mergeable partial sums for regression metrics, fed one chunk of predictions at a time.
+
+    Each `update` makes one vectorized pass over the chunk's residuals. Target variance
+    (for R2) is kept as a mean and sum of squared deviations and combined with Chan's
+    parallel formula, which stays accurate for large, offset targets such as prices.
+    Residual quantiles come from a mergeable `QuantileSketch` (exact while it holds
+    fewer than `k` values), or with `k=None` from the kept residuals, exactly.
+    Accumulators built on separate chunks or workers can be merged into the
+    accumulator of the whole validation set.
+    """
+    QUANTILES: Tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+    def __init__(self, quantiles: Sequence[float] = QUANTILES, k: Optional[int] = 2048):
+        """
+        Args:
+            quantiles (Sequence[float]): Residual quantiles to report.
+            k (int, optional): Size parameter of the residual quantile sketch (default: 2048).
+                None keeps every residual for exact quantiles (memory grows with the rows).
+        """
+        self.quantiles = tuple(quantiles)
+        self.count = 0
+        self.mean_true = 0.0
+        self.m2_true = 0.0
+        self.sum_squared_error = 0.0
+        self.sum_absolute_error = 0.0
+        self.sum_absolute_percentage_error = 0.0
+        self.residuals = QuantileSketch(k) if k is not None else None
+        self._residual_chunks = []
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> "MetricsAccumulator":
+        """Add a chunk of labels and predictions."""
+        y_true = np.asarray(y_true, dtype=np.float64).ravel()
+        y_pred = np.asarray(y_pred, dtype=np.float64).ravel()
+        if len(y_true) != len(y_pred):
+            raise ValueError(f"Got {len(y_true)} labels and {len(y_pred)} predictions.")
+        if len(y_true) == 0:
+            return self
+        residual = y_true - y_pred
+        absolute = np.abs(residual)
+        chunk_mean = y_true.mean()
+        chunk_m2 = float(np.dot(y_true - chunk_mean, y_true - chunk_mean))
+        self._merge_moments(len(y_true), chunk_mean, chunk_m2)
+        self.sum_squared_error += float(np.dot(residual, residual))
+        self.sum_absolute_error += float(absolute.sum())
+        # Same definition as sklearn's mean_absolute_percentage_error.
+        self.sum_absolute_percentage_error += float(
+            (absolute / np.maximum(np.abs(y_true), np.finfo(np.float64).eps)).sum())
+        if self.residuals is not None:
+            self.residuals.update(residual)
+        else:
+            self._residual_chunks.append(residual)
+        return self
+
+    def merge(self, other: "MetricsAccumulator") -> "MetricsAccumulator":
+        """Fold the partial sums of another (disjoint) set of chunks into this one."""
+        if other.count:
+            self._merge_moments(other.count, other.mean_true, other.m2_true)
+            self.sum_squared_error += other.sum_squared_error
+            self.sum_absolute_error += other.sum_absolute_error
+            self.sum_absolute_percentage_error += other.sum_absolute_percentage_error
+            if self.residuals is None and other.residuals is None:
+                self._residual_chunks.extend(other._residual_chunks)
+            else:
+                # Mixing exact and sketched residuals gives a sketch.
+                if self.residuals is None:
+                    self.residuals = QuantileSketch(other.residuals.k)
+                    for chunk in self._residual_chunks:
+                        self.residuals.update(chunk)
+                    self._residual_chunks = []
+                if other.residuals is None:
+                    for chunk in other._residual_chunks:
+                        self.residuals.update(chunk)
+                else:
+                    self.residuals.merge(other.residuals)
+        return self
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean_true
+        self.m2_true += m2 + delta * delta * self.count * count / total
+        self.mean_true += delta * count / total
+        self.count = total
+
+    def result(self) -> Dict[str, float]:
+        """The metrics of everything accumulated so far."""
+        if self.count == 0:
+            raise ValueError("No predictions have been accumulated.")
+        mse = self.sum_squared_error / self.count
+        # Like sklearn, a constant target gives R2 of 1 for perfect predictions and 0 otherwise.
+        if self.m2_true > 0:
+            r2 = 1.0 - self.sum_squared_error / self.m2_true
+        else:
+            r2 = 1.0 if self.sum_squared_error == 0 else 0.0
+        scores = {
+            "mse": float(mse),
+            "rmse": float(np.sqrt(mse)),
+            "mae": float(self.sum_absolute_error / self.count),
+            "r2": float(r2),
+            "mape": float(self.sum_absolute_percentage_error / self.count),
+        }
+        if self.residuals is not None:
+            values = [self.residuals.quantile(q) for q in self.quantiles]
+        else:
+            # One selection for all quantiles; "inverted_cdf" matches the sketch's definition.
+            values = np.quantile(np.concatenate(self._residual_chunks), self.quantiles, method="inverted_cdf")
+        for q, value in zip(self.quantiles, values):
+            scores[f"residual_q{round(q * 100):02d}"] = float(value)
+        return scores
+
+
+class FusedMetrics(Evaluation):
+    """ Evaluation computing MSE, RMSE, MAE, R2, MAPE and residual quantiles in one pass.
+    Args:
+        y_true (np.ndarray): True Labels
+        y_pred (np.ndarray): Prediction Labels
+    Returns:
+        scores (Dict[str, float]): Metric name to value.
+    Raises:
+        Exception: If error in calculating the metrics.
+    """
+    def __init__(self, quantiles: Sequence[float] = MetricsAccumulator.QUANTILES):
+        self.quantiles = quantiles
+
+    def calculate_scores(self, y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+        try:
+            logging.info("Calculating regression metrics...")
+            scores = MetricsAccumulator(self.quantiles, k=None).update(y_true, y_pred).result()
+            logging.info(f"Regression metrics: {scores}")
+            return scores
+        except Exception as e:
+            logging.error(f"Error in calculating regression metrics: {e}")
+            raise e
+
+    def calculate_scores_chunked(self, chunks: Iterable[Tuple[np.ndarray, np.ndarray]],
+                                 k: int = 2048) -> Dict[str, float]:
+        """Metrics over (y_true, y_pred) chunks, e.g. a validation set that does not fit in memory.
+
+        Args:
+            chunks (Iterable[Tuple[np.ndarray, np.ndarray]]): Labels and predictions per chunk.
+            k (int): Size parameter of the residual quantile sketch (default: 2048); quantiles
+                are approximate once more than `k` residuals have been seen.
+        """
+        try:
+            accumulator = MetricsAccumulator(self.quantiles, k=k)
+            for y_true, y_pred in chunks:
+                accumulator.update(y_true, y_pred)
+            scores = accumulator.result()
+            logging.info(f"Regression metrics over {accumulator.count} rows: {scores}")
+            return scores
+        except Exception as e:
+            logging.error(f"Error in calculating regression metrics: {e}")
+            raise e
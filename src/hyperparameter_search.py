@@ -0,0 +1,299 @@
+import logging
+import math
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from hyperopt import Trials, rand, space_eval, tpe
+from hyperopt.base import Domain, JOB_STATE_DONE, JOB_STATE_ERROR, JOB_STATE_RUNNING
+from hyperopt.utils import coarse_utcnow
+from sklearn.ensemble import RandomForestRegressor
+
+""" Notes:
+- This module runs hyperopt TPE searches with trials evaluated concurrently in a process pool.
+- Training and validation arrays are copied once into shared memory; workers attach to them in their
+  initializer, so each trial only ships its hyperparameters to the worker.
+- Suggestions stay asynchronous: whenever a worker finishes, its result is recorded and TPE proposes the
+  next point from all completed trials, while the other trials keep running.
+- `SuccessiveHalvingSearch` is a multi-fidelity alternative for random forests: configurations start
+  with a fraction of their trees and rows, and only the best ones are grown further with `warm_start`.
+"""
+
+
+class SharedArrays:
+    """A set of NumPy arrays copied into POSIX shared memory blocks.
+
+    `spec` is a small picklable description that other processes pass to
+    `attach_shared_arrays` to map the same buffers without copying them.
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._blocks = []
+        self.spec = {}
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                self._blocks.append(block)
+                self.spec[name] = (block.name, array.shape, array.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Release and remove the shared memory blocks."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# Per-worker state, set by the pool initializer.
+_worker_blocks = []
+_worker_arrays: Dict[str, np.ndarray] = {}
+
+
+def attach_shared_arrays(spec: Dict[str, Tuple[str, tuple, str]]) -> Dict[str, np.ndarray]:
+    """Map the arrays described by `SharedArrays.spec` into this process."""
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return arrays
+
+
+def _init_worker(spec: Dict[str, Tuple[str, tuple, str]], initializer: Optional[Callable] = None) -> None:
+    _worker_arrays.update(attach_shared_arrays(spec))
+    if initializer is not None:
+        initializer()
+
+
+def _run_objective(objective: Callable[[dict, Dict[str, np.ndarray]], dict], params: dict) -> dict:
+    return objective(params, _worker_arrays)
+
+
+class ParallelTPESearch:
+    """TPE search whose trials run concurrently in a process pool.
+
+    Up to `n_workers` trials are in flight at once. Each completed trial is written
+    back into the `Trials` object before the next point is suggested, so the search
+    sees results as soon as they arrive instead of in synchronized batches.
+    """
+    def __init__(self, objective: Callable[[dict, Dict[str, np.ndarray]], dict], space: dict,
+                 max_evals: int = 50, n_workers: Optional[int] = None, seed: int = 42,
+                 worker_initializer: Optional[Callable] = None,
+                 on_result: Optional[Callable[[dict, dict], None]] = None):
+        """
+        Args:
+            objective (Callable): Picklable top-level function `(params, arrays) -> result dict`
+                with at least 'loss' and 'status', where `arrays` are the shared arrays.
+            space (dict): hyperopt search space.
+            max_evals (int): Total number of trials (default: 50).
+            n_workers (int, optional): Worker processes. Defaults to the CPU count.
+            seed (int): Seed for the TPE suggestions (default: 42).
+            worker_initializer (Callable, optional): Picklable function run once in each worker.
+            on_result (Callable, optional): Called in the parent as `on_result(params, result)`
+                after each trial, e.g. to log it to MLflow.
+        """
+        self.objective = objective
+        self.space = space
+        self.max_evals = max_evals
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.seed = seed
+        self.worker_initializer = worker_initializer
+        self.on_result = on_result
+
+    def run(self, arrays: Dict[str, np.ndarray], trials: Optional[Trials] = None) -> Trials:
+        """Run the search over the given training/validation arrays.
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Arrays shared with every trial, e.g.
+                X_train, y_train, X_val and y_val.
+            trials (Trials, optional): Trials to extend. A new one is created if None.
+                With `PersistentTrials`, points evaluated before are served from the store.
+
+        Returns:
+            Trials: The completed trials; `trials.argmin` holds the best point in the
+                same encoding `fmin` returns.
+        """
+        trials = trials if trials is not None else Trials()
+        domain = Domain(lambda params: None, self.space)
+        rstate = np.random.default_rng(self.seed)
+        remaining = self.max_evals - len(trials.trials)
+        logging.info(f"Starting parallel TPE search: {remaining} trials on {self.n_workers} workers.")
+
+        with SharedArrays(arrays) as shared, ProcessPoolExecutor(
+                max_workers=self.n_workers, initializer=_init_worker,
+                initargs=(shared.spec, self.worker_initializer)) as pool:
+            running = {}
+            while remaining > 0 or running:
+                while remaining > 0 and len(running) < self.n_workers:
+                    trial, params = self._suggest(domain, trials, rstate)
+                    remaining -= 1
+                    cached = trials.cached_result(params) if hasattr(trials, 'cached_result') else None
+                    if cached is not None:
+                        # Evaluated before on the same data (see src.trial_store); no need to retrain.
+                        future = Future()
+                        future.set_result(cached)
+                        self._record(trials, trial, params, future)
+                        continue
+                    running[pool.submit(_run_objective, self.objective, params)] = (trial, params)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial, params = running.pop(future)
+                    self._record(trials, trial, params, future)
+        return trials
+
+    def _suggest(self, domain: Domain, trials: Trials, rstate: np.random.Generator) -> Tuple[dict, dict]:
+        """Ask TPE for one new point given every completed trial so far."""
+        new_ids = trials.new_trial_ids(1)
+        trials.refresh()
+        docs = tpe.suggest(new_ids, domain, trials, rstate.integers(2 ** 31 - 1))
+        trials.insert_trial_docs(docs)
+        trials.refresh()
+        trial = trials._dynamic_trials[-1]
+        trial['state'] = JOB_STATE_RUNNING
+        trial['book_time'] = coarse_utcnow()
+        vals = {label: values[0] for label, values in trial['misc']['vals'].items() if values}
+        return trial, space_eval(self.space, vals)
+
+    def _record(self, trials: Trials, trial: dict, params: dict, future) -> None:
+        """Write a finished trial back into `trials`."""
+        trial['refresh_time'] = coarse_utcnow()
+        error = future.exception()
+        if error is not None:
+            logging.error(f"Trial {trial['tid']} failed: {error}")
+            trial['state'] = JOB_STATE_ERROR
+            trial['misc']['error'] = (str(type(error)), str(error))
+        else:
+            trial['state'] = JOB_STATE_DONE
+            trial['result'] = future.result()
+            if self.on_result is not None:
+                self.on_result(params, trial['result'])
+        trials.refresh()
+
+
+class SuccessiveHalvingSearch:
+    """Successive halving / Hyperband search over a hyperopt space for RandomForestRegressor.
+
+    A configuration's budget is a fraction of its `n_estimators` together with the
+    same fraction of rows per tree (`max_samples`). Every configuration in a rung is
+    trained at that budget and scored on the validation set; the best 1/eta move to
+    the next rung, where their forests are grown with `warm_start` (adding trees
+    fit on larger row samples) instead of being refit. Only the final rung trains
+    forests at their full size.
+
+    With `hyperband=True`, several successive halving brackets are run, trading off
+    many cheap starts against fewer configurations started at larger budgets.
+    """
+    def __init__(self, space: dict, n_configs: int = 27, eta: int = 3, min_budget: float = 1 / 9,
+                 hyperband: bool = False, seed: int = 42, n_jobs: Optional[int] = None,
+                 on_result: Optional[Callable[[dict, dict], None]] = None):
+        """
+        Args:
+            space (dict): hyperopt search space (the same one used with TPE).
+            n_configs (int): Configurations sampled for successive halving (default: 27).
+                Ignored with `hyperband=True`, where bracket sizes follow from `eta`.
+            eta (int): Keep 1/eta of the configurations per rung (default: 3).
+            min_budget (float): Fraction of trees and rows in the first rung (default: 1/9).
+            hyperband (bool): Run Hyperband brackets instead of one halving run (default: False).
+            seed (int): Seed for sampling configurations (default: 42).
+            n_jobs (int, optional): `n_jobs` of each forest.
+            on_result (Callable, optional): Called as `on_result(params, result)` after every
+                evaluation; `result` holds 'r2', 'rung' and 'n_estimators'.
+        """
+        if not 0 < min_budget <= 1:
+            raise ValueError(f"min_budget must be in (0, 1], got {min_budget}.")
+        self.space = space
+        self.n_configs = n_configs
+        self.eta = eta
+        self.min_budget = min_budget
+        self.hyperband = hyperband
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.on_result = on_result
+        self.trees_trained = 0
+
+    def run(self, X_train: np.ndarray, y_train: np.ndarray,
+            X_val: np.ndarray, y_val: np.ndarray) -> Tuple[dict, dict, float]:
+        """Run the search.
+
+        Returns:
+            Tuple[dict, dict, float]: The best point in `fmin`'s encoding (choice indices),
+                the corresponding hyperparameter values, and its validation R2.
+        """
+        self.trees_trained = 0
+        trials = Trials()
+        domain = Domain(lambda params: None, self.space)
+        rstate = np.random.default_rng(self.seed)
+        rungs = int(math.floor(math.log(1 / self.min_budget, self.eta) + 1e-9)) + 1
+        if self.hyperband:
+            brackets = [(int(math.ceil(rungs / (s + 1) * self.eta ** s)), s) for s in reversed(range(rungs))]
+        else:
+            brackets = [(self.n_configs, rungs - 1)]
+
+        best = None
+        for n_configs, start_rung in brackets:
+            candidates = [self._sample(domain, trials, rstate) for _ in range(n_configs)]
+            winner = self._halve(candidates, rungs - 1 - start_rung, rungs, X_train, y_train, X_val, y_val)
+            if best is None or winner['score'] > best['score']:
+                best = winner
+        logging.info(f"Successive halving finished: {self.trees_trained} trees trained, "
+                     f"best validation R2 {best['score']:.4f}.")
+        return best['vals'], best['params'], best['score']
+
+    def _halve(self, candidates: List[dict], first_rung: int, rungs: int,
+               X_train, y_train, X_val, y_val) -> dict:
+        """Run one successive halving bracket and return its surviving candidate."""
+        for rung in range(first_rung, rungs):
+            fraction = min(1.0, self.min_budget * self.eta ** rung)
+            for candidate in candidates:
+                self._grow(candidate, fraction, X_train, y_train)
+                candidate['score'] = candidate['model'].score(X_val, y_val)
+                if self.on_result is not None:
+                    self.on_result(candidate['params'], {'r2': candidate['score'], 'rung': rung,
+                                                         'n_estimators': candidate['model'].n_estimators})
+            candidates.sort(key=lambda candidate: candidate['score'], reverse=True)
+            if rung < rungs - 1:
+                for dropped in candidates[max(1, len(candidates) // self.eta):]:
+                    dropped['model'] = None
+                candidates = candidates[:max(1, len(candidates) // self.eta)]
+            logging.info(f"Rung {rung}: {len(candidates)} configurations kept at {fraction:.0%} budget, "
+                         f"best R2 {candidates[0]['score']:.4f}.")
+        return candidates[0]
+
+    def _grow(self, candidate: dict, fraction: float, X_train, y_train) -> None:
+        """Train a candidate's forest up to `fraction` of its trees, adding trees if it already exists."""
+        params = candidate['params']
+        target_trees = params.get('n_estimators', 100)
+        n_estimators = max(1, int(math.ceil(target_trees * fraction)))
+        max_samples = None if fraction >= 1 else max(fraction, 1 / len(y_train))
+        if candidate['model'] is None:
+            forest_params = {key: value for key, value in params.items() if key != 'n_estimators'}
+            candidate['model'] = RandomForestRegressor(**forest_params, warm_start=True, random_state=42,
+                                                       n_jobs=self.n_jobs)
+        model = candidate['model']
+        already = len(getattr(model, 'estimators_', []))
+        if n_estimators > already:
+            model.set_params(n_estimators=n_estimators, max_samples=max_samples)
+            model.fit(X_train, y_train)
+            self.trees_trained += n_estimators - already
+
+    def _sample(self, domain: Domain, trials: Trials, rstate: np.random.Generator) -> dict:
+        """Draw one random configuration from the space, keeping its fmin-style encoding."""
+        docs = rand.suggest(trials.new_trial_ids(1), domain, trials, rstate.integers(2 ** 31 - 1))
+        trials.insert_trial_docs(docs)
+        trials.refresh()
+        vals = {label: values[0] for label, values in docs[0]['misc']['vals'].items() if values}
+        return {'vals': vals, 'params': space_eval(self.space, vals), 'model': None, 'score': None}
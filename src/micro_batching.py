@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+
+""" Notes:
+- This module coalesces concurrent prediction requests into micro-batches, so the model runs one
+  vectorized `predict` per batch instead of one call (and one pipeline overhead) per house.
+- Requests wait in a bounded asyncio queue. A full queue rejects new requests at once (`ServerOverloaded`)
+  instead of letting latency grow without bound; callers should retry later.
+- Batching is adaptive: whatever is queued when the model becomes free is taken at once, and the batcher
+  only waits for more requests when, judging by the recent arrival rate, one is expected before
+  `max_wait` runs out. An idle server answers a lone request without waiting; a busy one fills batches
+  up to `max_batch_size`.
+- Every request has a deadline. Requests that expired (or whose caller gave up) while queued are dropped
+  before prediction, and callers get `DeadlineExceeded` when their deadline passes.
+- `predict` runs in a worker thread, so the event loop keeps accepting requests while a batch is scored.
+- `stop` fails every request it will not answer (queued, held over, or in a batch being collected or
+  scored) with `ServerOverloaded`, so no caller waits out its deadline during a shutdown.
+"""
+
+Request = Union[Dict[str, Any], pd.DataFrame]
+
+
+class ServerOverloaded(RuntimeError):
+    """Raised when the request queue is full."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request is not answered before its deadline."""
+
+
+class _Pending:
+    __slots__ = ("request", "rows", "deadline", "future")
+
+    def __init__(self, request: Request, deadline: float, future: asyncio.Future):
+        self.request = request
+        self.rows = len(request) if isinstance(request, pd.DataFrame) else 1
+        self.deadline = deadline
+        self.future = future
+
+
+class MicroBatcher:
+    """Async front end that batches prediction requests for a vectorized `predict` function."""
+
+    def __init__(self, predict: Callable[[pd.DataFrame], np.ndarray], max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, max_queue: int = 1024, timeout_ms: float = 1000.0,
+                 workers: int = 1):
+        """
+        Args:
+            predict (Callable[[pd.DataFrame], np.ndarray]): Scores a batch of raw house rows,
+                e.g. the `predict` of the preprocessing + model pipeline.
+            max_batch_size (int): Most rows scored in one batch (default: 64).
+            max_wait_ms (float): Longest a request waits for others to join its batch (default: 5).
+            max_queue (int): Requests that may wait at once before new ones are rejected (default: 1024).
+            timeout_ms (float): Default deadline of a request (default: 1000).
+            workers (int): Batches scored concurrently (default: 1).
+        """
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.timeout = timeout_ms / 1000
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._held: List[_Pending] = []
+        # Requests taken into a batch and not answered yet.
+        self._in_flight: Set[_Pending] = set()
+        self._interarrival = self.max_wait
+        self._last_arrival = None
+        self.stats = {"requests": 0, "rows": 0, "batches": 0, "rejected": 0, "expired": 0, "failed": 0}
+
+    async def start(self) -> None:
+        """Start the batching loops on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="predict")
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        logging.info(f"Micro-batcher started: batches of up to {self.max_batch_size} rows, "
+                     f"max wait {self.max_wait * 1000:.1f} ms, queue of {self.max_queue}.")
+
+    async def stop(self) -> None:
+        """Stop batching; requests still queued or in flight fail with `ServerOverloaded`."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        unanswered = list(self._in_flight) + self._held
+        while self._queue is not None and not self._queue.empty():
+            unanswered.append(self._queue.get_nowait())
+        for pending in unanswered:
+            if not pending.future.done():
+                pending.future.set_exception(ServerOverloaded("The prediction server is shutting down."))
+        self._in_flight.clear()
+        self._held = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._tasks = []
+
+    async def submit(self, request: Request, timeout_ms: Optional[float] = None) -> np.ndarray:
+        """Queue a request and wait for its predictions.
+
+        Args:
+            request (Union[Dict[str, Any], pd.DataFrame]): One house as a column -> value dict,
+                or raw house rows.
+            timeout_ms (float, optional): Deadline of this request. Defaults to the batcher's.
+        Returns:
+            np.ndarray: The request's predictions, one per row.
+        Raises:
+            ServerOverloaded: If the queue is full.
+            DeadlineExceeded: If the request is not answered in time.
+        """
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher.start() has not been called.")
+        timeout = self.timeout if timeout_ms is None else timeout_ms / 1000
+        now = time.monotonic()
+        pending = _Pending(request, now + timeout, asyncio.get_running_loop().create_future())
+        try:
+            self._queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise ServerOverloaded(f"{self.max_queue} requests are already waiting.")
+        self._record_arrival(now)
+        try:
+            return await asyncio.wait_for(pending.future, timeout)
+        except asyncio.TimeoutError:
+            self.stats["expired"] += 1
+            raise DeadlineExceeded(f"No prediction within {timeout * 1000:.0f} ms.")
+
+    def _record_arrival(self, now: float) -> None:
+        # Exponentially weighted mean time between requests, to decide whether waiting pays off.
+        if self._last_arrival is not None:
+            self._interarrival += 0.2 * (min(now - self._last_arrival, self.max_wait) - self._interarrival)
+        self._last_arrival = now
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if batch:
+                await self._score(loop, batch)
+                self._in_flight.difference_update(batch)
+
+    async def _score(self, loop: asyncio.AbstractEventLoop, batch: List[_Pending]) -> None:
+        try:
+            frame = self._frame([pending.request for pending in batch])
+            predictions = await loop.run_in_executor(self._executor, self.predict, frame)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+            else:
+                # One malformed request must not fail the others: score them one by one.
+                logging.warning(f"Error predicting a batch of {len(batch)} requests, retrying singly: {e}")
+                for pending in batch:
+                    await self._predict_single(loop, pending)
+            return
+        self.stats["batches"] += 1
+        start = 0
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_result(predictions[start:start + pending.rows])
+            start += pending.rows
+
+    async def _predict_single(self, loop: asyncio.AbstractEventLoop, pending: _Pending) -> None:
+        if pending.future.done():
+            return
+        try:
+            frame = self._frame([pending.request])
+            predictions = await loop.run_in_executor(self._executor, self.predict, frame)
+        except Exception as e:
+            self._fail(pending, e)
+            return
+        self.stats["batches"] += 1
+        if not pending.future.done():
+            pending.future.set_result(predictions)
+
+    def _fail(self, pending: _Pending, error: Exception) -> None:
+        logging.error(f"Error predicting a request of {pending.rows} rows: {error}")
+        self.stats["failed"] += 1
+        if not pending.future.done():
+            pending.future.set_exception(error)
+
+    async def _next(self, timeout: Optional[float] = None) -> Optional[_Pending]:
+        """Next request: one held over from the last batch, a queued one, or the next to arrive."""
+        if self._held:
+            return self._held.pop()
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if timeout is None:
+            return await self._queue.get()
+        if timeout <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _collect(self) -> List[_Pending]:
+        """Take the next batch, dropping requests nobody waits for anymore."""
+        batch, rows = [], 0
+        pending = await self._next()
+        wait_until = time.monotonic() + self.max_wait
+        while pending is not None:
+            if pending.future.done() or pending.deadline <= time.monotonic():
+                # Expired or cancelled while queued; its caller already got an error.
+                pending.future.cancel()
+            elif rows and rows + pending.rows > self.max_batch_size:
+                # Does not fit; it starts the next batch.
+                self._held.append(pending)
+                break
+            else:
+                batch.append(pending)
+                self._in_flight.add(pending)
+                rows += pending.rows
+                if rows >= self.max_batch_size:
+                    break
+            if not batch:
+                pending = await self._next()
+                wait_until = time.monotonic() + self.max_wait
+                continue
+            remaining = wait_until - time.monotonic()
+            if self._queue.empty() and self._interarrival > remaining:
+                # The next request is not expected before the wait runs out.
+                break
+            pending = await self._next(remaining)
+        self.stats["requests"] += len(batch)
+        self.stats["rows"] += rows
+        return batch
+
+    @staticmethod
+    def _frame(requests: List[Request]) -> pd.DataFrame:
+        """One frame of the batch's rows, in request order."""
+        pieces, records = [], []
+        for request in requests:
+            if isinstance(request, pd.DataFrame):
+                if records:
+                    pieces.append(pd.DataFrame.from_records(records))
+                    records = []
+                pieces.append(request)
+            else:
+                records.append(request)
+        if records:
+            pieces.append(pd.DataFrame.from_records(records))
+        return pd.concat(pieces, ignore_index=True) if len(pieces) > 1 else pieces[0]
@@ -0,0 +1,200 @@
+import logging
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .prediction_cache import PredictionCache
+
+""" Notes:
+- This module keeps loaded models in process memory, keyed by (registered model name, version), so a
+  model is loaded from the registry once and reused by every request and pipeline run of the process.
+- The cache is an LRU bounded by the estimated memory of its models. Each model is measured once, when
+  it is loaded, by pickling it into a byte counter. Large NumPy buffers such as tree node arrays are
+  passed out of band and only their sizes are counted, so nothing is copied.
+- Loads happen in a background thread, and concurrent requests for the same version share one load.
+- Each model name has a live version. `promote` preloads the new version and only then swaps the live
+  pointer, under a lock, so the swap is atomic. Requests already running keep a reference to the model
+  they started with and finish on it; the old version stays cached until the LRU evicts it. Live
+  versions are never evicted.
+- `predict` can go through a `PredictionCache`, keyed on the live version, so repeated houses skip the
+  model and a swap never serves predictions of the previous version.
+"""
+
+Key = Tuple[str, Hashable]
+
+
+class _ByteCounter:
+    def __init__(self):
+        self.nbytes = 0
+
+    def write(self, data) -> None:
+        self.nbytes += memoryview(data).nbytes
+
+
+def estimate_nbytes(model: Any) -> int:
+    """Approximate memory held by a model: its pickled size, with array buffers counted in place."""
+    counter = _ByteCounter()
+
+    def count_buffer(buffer: pickle.PickleBuffer) -> bool:
+        counter.nbytes += buffer.raw().nbytes
+        return False  # out of band: not written to the counter
+
+    pickle.Pickler(counter, protocol=5, buffer_callback=count_buffer).dump(model)
+    return counter.nbytes
+
+
+class ModelCache:
+    """In-process LRU of loaded models with background preloading and atomic version swaps."""
+
+    def __init__(self, loader: Callable[[str, Hashable], Any], max_bytes: int = 2 * 1024 ** 3,
+                 load_workers: int = 1):
+        """
+        Args:
+            loader (Callable[[str, Hashable], Any]): Loads the model of a (name, version),
+                e.g. from the MLflow registry.
+            max_bytes (int): Memory budget of the cached models (default: 2 GiB). Live
+                versions stay cached even beyond it.
+            load_workers (int): Models loaded concurrently in the background (default: 1).
+        """
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._models: "OrderedDict[Key, Tuple[Any, int]]" = OrderedDict()
+        self._loading: Dict[Key, Future] = {}
+        self._live: Dict[str, Hashable] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=load_workers, thread_name_prefix="model-load")
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "swaps": 0}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def preload(self, name: str, version: Hashable) -> Future:
+        """Start loading a version in the background, unless it is cached or already loading.
+
+        Returns:
+            Future: Resolves to the loaded model.
+        """
+        key = (name, version)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.stats["hits"] += 1
+                future = Future()
+                future.set_result(self._models[key][0])
+                return future
+            if key not in self._loading:
+                self.stats["misses"] += 1
+                self._loading[key] = self._executor.submit(self._load, key)
+            return self._loading[key]
+
+    def get(self, name: str, version: Hashable, timeout: Optional[float] = None) -> Any:
+        """The model of a version, loading it first if needed."""
+        return self.preload(name, version).result(timeout)
+
+    def promote(self, name: str, version: Hashable, wait: bool = True) -> Future:
+        """Make `version` the live version of `name` as soon as it is loaded.
+
+        Args:
+            name (str): Registered model name.
+            version (Hashable): Version to serve.
+            wait (bool): Block until the swap happened (default: True).
+        Returns:
+            Future: Resolves to the new live model; fails, keeping the old live version,
+                if the load fails.
+        """
+        swapped = Future()
+
+        def swap(loaded: Future) -> None:
+            try:
+                model = loaded.result()
+            except Exception as e:
+                logging.error(f"Could not load {name} version {version}; keeping the live version: {e}")
+                swapped.set_exception(e)
+                return
+            with self._lock:
+                if (name, version) not in self._models:
+                    # Evicted between its load and the swap (only possible under a tight budget).
+                    self._models[(name, version)] = (model, estimate_nbytes(model))
+                previous = self._live.get(name)
+                self._live[name] = version
+                self.stats["swaps"] += 1
+                self._evict()
+            logging.info(f"{name}: now serving version {version} (was {previous}).")
+            swapped.set_result(model)
+
+        self.preload(name, version).add_done_callback(swap)
+        if wait:
+            swapped.result()
+        return swapped
+
+    def live(self, name: str) -> Tuple[Hashable, Any]:
+        """The live version of `name` and its model.
+
+        Raises:
+            LookupError: If no version of `name` has been promoted.
+        """
+        with self._lock:
+            version = self._live.get(name)
+            if version is None:
+                raise LookupError(f"No live version of {name}.")
+            key = (name, version)
+            self._models.move_to_end(key)
+            return version, self._models[key][0]
+
+    def predict(self, name: str, X: pd.DataFrame,
+                predictions: Optional[PredictionCache] = None) -> np.ndarray:
+        """Predict with the live version; a swap during the call does not affect it.
+
+        Args:
+            name (str): Registered model name.
+            X (pd.DataFrame): Raw house rows.
+            predictions (PredictionCache, optional): Cache of earlier predictions; only
+                the rows it misses are scored.
+        """
+        version, model = self.live(name)
+        if predictions is None:
+            return model.predict(X)
+        return predictions.predict(model, (name, version), X)
+
+    def predictor(self, name: str,
+                  predictions: Optional[PredictionCache] = None) -> Callable[[pd.DataFrame], np.ndarray]:
+        """`predict` bound to a model name, e.g. for a `MicroBatcher`."""
+        return lambda X: self.predict(name, X, predictions)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _load(self, key: Key) -> Any:
+        try:
+            logging.info(f"Loading {key[0]} version {key[1]}...")
+            model = self.loader(*key)
+            size = estimate_nbytes(model)
+            with self._lock:
+                self._models[key] = (model, size)
+                self.stats["loads"] += 1
+                self._evict(keep=key)
+            logging.info(f"Loaded {key[0]} version {key[1]} ({size / 1024 ** 2:.1f} MiB).")
+            return model
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def _evict(self, keep: Optional[Key] = None) -> None:
+        # Caller holds the lock. Least recently used first, never a live version (nor `keep`).
+        total = self.nbytes
+        for key in list(self._models):
+            if total <= self.max_bytes:
+                break
+            if key == keep or self._live.get(key[0]) == key[1]:
+                continue
+            total -= self._models.pop(key)[1]
+            self.stats["evictions"] += 1
+            logging.info(f"Evicted {key[0]} version {key[1]} from the model cache.")
+        if total > self.max_bytes:
+            logging.warning(f"Live models use {total} bytes, over the cache budget of {self.max_bytes}.")
@@ -0,0 +1,218 @@
+import logging
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from hyperopt import STATUS_OK, hp
+from sklearn.base import RegressorMixin
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+""" Notes:
+- This module defines the model engines that `train_model` and `tune_model` can use.
+- The `ModelEngine` abstract class bundles how to build an estimator, its default hyperopt search space
+  and its parallelism settings; engines are registered under the `ModelNameConfig.model_name` they serve.
+- `RandomForestRegressor` is the original engine. `HistGradientBoostingRegressor` bins features into at most
+  256 buckets, so it fits much faster and stores far smaller models on large datasets. `Ridge` is a
+  linear baseline.
+"""
+
+
+class ModelEngine(ABC):
+    """ Abstract Class for defining a model engine. """
+    # Name under which the engine is registered (ModelNameConfig.model_name).
+    name: str = None
+    # Whether tuning trials may be evaluated concurrently in worker processes. Engines that
+    # already spread one fit over every core (e.g. through OpenMP) gain little from it.
+    parallel_trials: bool = True
+    # Whether the estimator can be grown incrementally with `warm_start`.
+    supports_warm_start: bool = False
+    # Whether a fitted estimator can be updated with appended rows at a cost proportional to
+    # them. Engines that set it implement `extend(model, X_new, y_new, n_seen)`, which returns
+    # the estimator fitted on `n_seen` earlier rows, updated with the new ones.
+    supports_incremental: bool = False
+
+    def __init__(self, n_jobs: Optional[int] = None):
+        """
+        Args:
+            n_jobs (int, optional): Threads or processes used by one fit, for estimators
+                that accept `n_jobs`. None keeps the estimator's default.
+        """
+        self.n_jobs = n_jobs
+
+    @abstractmethod
+    def build(self, params: Optional[dict] = None) -> RegressorMixin:
+        """Create an unfitted estimator with the given hyperparameters.
+
+        Args:
+            params (dict, optional): Hyperparameters, e.g. one point of the search space.
+        Returns:
+            RegressorMixin: The estimator.
+        """
+        pass
+
+    @abstractmethod
+    def search_space(self) -> dict:
+        """Default hyperopt search space of the engine."""
+        pass
+
+    @staticmethod
+    def _added_rounds(current: int, n_new: int, n_seen: int) -> int:
+        # Grow the ensemble in proportion to the data, so old and new rows keep
+        # roughly the same weight per row.
+        return max(1, int(math.ceil(current * n_new / max(n_seen, 1))))
+
+    def evaluate(self, params: dict, X_train: np.ndarray, y_train: np.ndarray,
+                 X_val: np.ndarray, y_val: np.ndarray) -> dict:
+        """Fit on the training data and score on validation, as a hyperopt result."""
+        model = self.build(params).fit(X_train, y_train)
+        score = r2_score(y_val, model.predict(X_val))
+        return {'loss': -score, 'status': STATUS_OK, 'r2': score}
+
+    def cross_validate(self, params: dict, X: np.ndarray, y: np.ndarray,
+                       folds: List[Tuple[np.ndarray, np.ndarray]]) -> dict:
+        """Mean validation r2 over row-index folds into one feature matrix, as a hyperopt result.
+
+        Only the rows of the fold being fitted are gathered; `X` itself is never copied.
+        """
+        scores = [self.evaluate(params, X.take(train, axis=0), y.take(train), X.take(val, axis=0), y.take(val))['r2']
+                  for train, val in folds]
+        score = float(np.mean(scores))
+        return {'loss': -score, 'status': STATUS_OK, 'r2': score, 'fold_r2': scores}
+
+
+class RandomForestEngine(ModelEngine):
+    """ Engine for sklearn's RandomForestRegressor. """
+    name = "RandomForestRegressor"
+    supports_warm_start = True
+    supports_incremental = True
+
+    def build(self, params: Optional[dict] = None) -> RegressorMixin:
+        params = dict(params or {})
+        params.setdefault('random_state', 42)
+        if self.n_jobs is not None:
+            params.setdefault('n_jobs', self.n_jobs)
+        return RandomForestRegressor(**params)
+
+    def search_space(self) -> dict:
+        return {
+            'n_estimators': hp.choice('n_estimators', range(10, 300)),
+            'max_depth': hp.choice('max_depth', range(1, 20)),
+            'min_samples_split': hp.uniform('min_samples_split', 0.1, 1.0),
+            'min_samples_leaf': hp.choice('min_samples_leaf', range(1, 10))
+        }
+
+    def extend(self, model: RegressorMixin, X_new: np.ndarray, y_new: np.ndarray, n_seen: int) -> RegressorMixin:
+        """Add trees fit only on the new rows with `warm_start`; existing trees are kept as they are."""
+        added = self._added_rounds(model.n_estimators, len(y_new), n_seen)
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + added)
+        if self.n_jobs is not None:
+            model.set_params(n_jobs=self.n_jobs)
+        model.fit(X_new, y_new)
+        model.set_params(warm_start=False)
+        logging.info(f"Added {added} trees trained on {len(y_new)} new rows ({model.n_estimators} in total).")
+        return model
+
+
+class HistGradientBoostingEngine(ModelEngine):
+    """ Engine for sklearn's HistGradientBoostingRegressor.
+
+    The estimator has no `n_jobs`; it uses OpenMP threads on every core for a single
+    fit, so its tuning trials are evaluated one after another.
+    """
+    name = "HistGradientBoostingRegressor"
+    parallel_trials = False
+    supports_warm_start = True
+    supports_incremental = True
+
+    def build(self, params: Optional[dict] = None) -> RegressorMixin:
+        params = dict(params or {})
+        params.setdefault('random_state', 42)
+        params.setdefault('early_stopping', 'auto')
+        return HistGradientBoostingRegressor(**params)
+
+    def search_space(self) -> dict:
+        return {
+            'learning_rate': hp.loguniform('learning_rate', np.log(0.01), np.log(0.3)),
+            'max_iter': hp.choice('max_iter', range(50, 500)),
+            'max_leaf_nodes': hp.choice('max_leaf_nodes', range(15, 256)),
+            'min_samples_leaf': hp.choice('min_samples_leaf', range(5, 100)),
+            'l2_regularization': hp.loguniform('l2_regularization', np.log(1e-6), np.log(10.0))
+        }
+
+    def extend(self, model: RegressorMixin, X_new: np.ndarray, y_new: np.ndarray, n_seen: int) -> RegressorMixin:
+        """Continue boosting on the new rows with `warm_start`, adding iterations in proportion to them."""
+        added = self._added_rounds(model.n_iter_, len(y_new), n_seen)
+        # The new rows alone are too few to hold out a validation split for early stopping.
+        model.set_params(warm_start=True, early_stopping=False, max_iter=model.n_iter_ + added)
+        model.fit(X_new, y_new)
+        model.set_params(warm_start=False)
+        logging.info(f"Added {added} boosting iterations on {len(y_new)} new rows ({model.n_iter_} in total).")
+        return model
+
+
+class RidgeEngine(ModelEngine):
+    """ Linear baseline: standardized features followed by Ridge regression. """
+    name = "Ridge"
+
+    def build(self, params: Optional[dict] = None) -> RegressorMixin:
+        return Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(**(params or {})))])
+
+    def search_space(self) -> dict:
+        return {'alpha': hp.loguniform('alpha', np.log(1e-4), np.log(1e3))}
+
+
+MODEL_ENGINES: Dict[str, type] = {}
+
+
+def register_engine(engine: type) -> type:
+    """Register a `ModelEngine` subclass under its `name`; usable as a class decorator."""
+    MODEL_ENGINES[engine.name] = engine
+    return engine
+
+
+for _engine in (RandomForestEngine, HistGradientBoostingEngine, RidgeEngine):
+    register_engine(_engine)
+
+
+def get_engine(model_name: str, n_jobs: Optional[int] = None) -> ModelEngine:
+    """Return the engine registered for a model name.
+
+    Args:
+        model_name (str): ModelNameConfig.model_name.
+        n_jobs (int, optional): Passed to the engine.
+    Returns:
+        ModelEngine: The engine.
+    Raises:
+        ValueError: If no engine is registered under `model_name`.
+    """
+    try:
+        return MODEL_ENGINES[model_name](n_jobs=n_jobs)
+    except KeyError:
+        logging.error(f"Model {model_name} is not supported. Available: {sorted(MODEL_ENGINES)}")
+        raise ValueError(f"Model {model_name} is not supported.")
+
+
+def engine_objective(model_name: str, params: dict, arrays: Dict[str, np.ndarray], n_jobs: int = 1) -> dict:
+    """Objective for `ParallelTPESearch`; bind `model_name` (and `n_jobs`) with functools.partial."""
+    return get_engine(model_name, n_jobs=n_jobs).evaluate(
+        params, arrays['X_train'], arrays['y_train'], arrays['X_val'], arrays['y_val'])
+
+
+def fold_arrays(X: np.ndarray, y: np.ndarray, folds: List[Tuple[np.ndarray, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Arrays for `engine_cv_objective`: the feature matrix once, plus the index arrays of every fold."""
+    arrays = {'X': X, 'y': y}
+    for i, (train, val) in enumerate(folds):
+        arrays[f'train_{i}'] = train
+        arrays[f'val_{i}'] = val
+    return arrays
+
+
+def engine_cv_objective(model_name: str, params: dict, arrays: Dict[str, np.ndarray], n_jobs: int = 1) -> dict:
+    """Cross-validation objective for `ParallelTPESearch` over the arrays of `fold_arrays`."""
+    folds = [(arrays[f'train_{i}'], arrays[f'val_{i}']) for i in range(sum(name.startswith('train_') for name in arrays))]
+    return get_engine(model_name, n_jobs=n_jobs).cross_validate(params, arrays['X'], arrays['y'], folds)
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .sketches import QuantileSketch
+
+""" Notes:
+- This module caches predictions per house, so repeated requests for a house (UI refreshes, retries,
+  rescoring the same listings) skip the model.
+- The key of a row is a hash of its preprocessed features, the ones the model actually sees, plus the
+  model version. Requests that differ only in representation share a key: column order, integer vs
+  float types, and missing values that impute to the same median. A new model version never reuses
+  the predictions of an older one.
+- The current models use `Id` as a feature, so `Id` is part of the key: a house re-listed under a new
+  `Id` is a miss, even with identical attributes. Only models trained without `Id` get such hits.
+- The cache pays off in a long-lived process: the prediction server (run_prediction_server.py) keeps
+  it across requests. Short-lived processes such as pipeline steps would start cold on every run, so
+  they do not use it.
+- Lookups are batch-aware. A batch is preprocessed once, its hits are answered from the cache and only
+  its distinct misses go to the model, in one `predict` call.
+- Memory is bounded by `max_entries` (an entry costs about 250 bytes), with least recently used
+  entries evicted first. Entries also expire `ttl_s` seconds after they were stored.
+- `metrics` reports the hit ratio and the latency of cached predictions and of the model calls behind them.
+"""
+
+
+class PredictionCache:
+    """Thread-safe LRU/TTL cache of per-row predictions in front of a preprocessing + model pipeline."""
+
+    def __init__(self, max_entries: int = 100_000, ttl_s: Optional[float] = 3600.0):
+        """
+        Args:
+            max_entries (int): Most predictions kept (default: 100,000).
+            ttl_s (float, optional): Seconds a prediction stays valid (default: one hour).
+                None keeps predictions until they are evicted.
+        """
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._latency_ms = QuantileSketch(k=256)
+        self.stats = {"hits": 0, "misses": 0, "scored": 0, "evictions": 0, "expired": 0,
+                      "calls": 0, "latency_s": 0.0, "model_calls": 0, "model_s": 0.0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def keys(features: pd.DataFrame, version: Hashable) -> List[bytes]:
+        """Cache keys of the rows of a preprocessed feature frame for a model version.
+
+        Rows are canonicalized before hashing: columns in name order, every value as float64 (exact for
+        the integer, float32 and category code columns), -0.0 as 0.0 and a single NaN bit pattern.
+        """
+        names = [str(column) for column in features.columns]
+        order = sorted(range(len(names)), key=names.__getitem__)
+        columns = [names[i] for i in order]
+        # One conversion of the whole frame, then a column permutation (cheaper than reindexing the frame).
+        matrix = features.to_numpy(dtype=np.float64, na_value=np.nan)[:, order]
+        matrix = np.ascontiguousarray(np.where(matrix == 0, 0.0, matrix))
+        matrix[np.isnan(matrix)] = np.nan
+        salt = hashlib.blake2b(repr((version, columns)).encode(), digest_size=32).digest()
+        return [hashlib.blake2b(row, digest_size=16, key=salt).digest() for row in matrix]
+
+    def predict(self, model: Any, version: Hashable, X: pd.DataFrame,
+                score: Optional[Callable[[pd.DataFrame], np.ndarray]] = None) -> np.ndarray:
+        """Predict a batch of raw houses, scoring only the rows that are not cached.
+
+        Args:
+            model (Any): Fitted model; for a scikit-learn `Pipeline`, every step but the last is the
+                preprocessing whose output is hashed.
+            version (Hashable): Model version (or URI); part of every key.
+            X (pd.DataFrame): Raw house rows.
+            score (Callable, optional): Scores the raw rows of the misses, e.g. a remote
+                `service.predict`. By default the misses' preprocessed rows go to the
+                pipeline's final estimator, so nothing is preprocessed twice.
+        Returns:
+            np.ndarray: One prediction per row of `X`.
+        """
+        start = time.perf_counter()
+        preprocess, estimator = self._split(model)
+        features = preprocess.transform(X) if preprocess is not None else X
+        keys = self.keys(features, version)
+        predictions = np.empty(len(keys), dtype=np.float64)
+        # Distinct missing keys and the rows waiting for each of them.
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            now = time.monotonic()
+            for row, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    self.stats["expired"] += 1
+                    entry = None
+                if entry is None:
+                    missing.setdefault(key, []).append(row)
+                else:
+                    self._entries.move_to_end(key)
+                    predictions[row] = entry[0]
+            self.stats["hits"] += len(keys) - sum(len(rows) for rows in missing.values())
+            self.stats["misses"] += sum(len(rows) for rows in missing.values())
+
+        if missing:
+            first = [rows[0] for rows in missing.values()]
+            model_start = time.perf_counter()
+            if score is not None:
+                scored = np.asarray(score(X.iloc[first]), dtype=np.float64).ravel()
+            else:
+                scored = np.asarray(estimator.predict(features.iloc[first]), dtype=np.float64).ravel()
+            model_s = time.perf_counter() - model_start
+            expires = time.monotonic() + self.ttl_s if self.ttl_s is not None else float("inf")
+            with self._lock:
+                for (key, rows), value in zip(missing.items(), scored.tolist()):
+                    predictions[rows] = value
+                    self._entries[key] = (value, expires)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+                self.stats["scored"] += len(first)
+                self.stats["model_calls"] += 1
+                self.stats["model_s"] += model_s
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["latency_s"] += elapsed
+            self._latency_ms.update(np.array([elapsed * 1000.0]))
+        return predictions
+
+    def predictor(self, model: Any, version: Hashable) -> Callable[[pd.DataFrame], np.ndarray]:
+        """`predict` bound to one model version, e.g. for a `MicroBatcher`."""
+        return lambda X: self.predict(model, version, X)
+
+    def metrics(self) -> Dict[str, float]:
+        """Hit ratio, sizes and latencies (in milliseconds) for monitoring."""
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+            p50, p99 = 0.0, 0.0
+            if stats["calls"]:
+                p50, p99 = self._latency_ms.quantile(0.5), self._latency_ms.quantile(0.99)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "entries": entries,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_ratio": stats["hits"] / lookups if lookups else 0.0,
+            "scored_rows": stats["scored"],
+            "evictions": stats["evictions"],
+            "expired": stats["expired"],
+            "latency_ms_mean": 1000.0 * stats["latency_s"] / stats["calls"] if stats["calls"] else 0.0,
+            "latency_ms_p50": p50,
+            "latency_ms_p99": p99,
+            "model_ms_mean": 1000.0 * stats["model_s"] / stats["model_calls"] if stats["model_calls"] else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _split(model: Any):
+        # (preprocessing, final estimator) of a Pipeline; models without steps are keyed on raw rows.
+        steps = getattr(model, "steps", None)
+        if steps is None or len(steps) < 2:
+            return None, model
+        return model[:-1], model[-1]
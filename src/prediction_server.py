@@ -0,0 +1,96 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from .columnar_requests import ARROW_STREAM_CONTENT_TYPE, decode_houses, encode_predictions
+from .micro_batching import DeadlineExceeded, MicroBatcher, ServerOverloaded
+from .model_cache import ModelCache
+from .prediction_cache import PredictionCache
+
+""" Notes:
+- This module is the HTTP front end of the in-house prediction server (`run_prediction_server.py`).
+- `POST /predict` takes one house as a JSON object (or several as a JSON list) and returns
+  `{"predictions": [...]}`; `POST /predict/arrow` takes and returns Arrow IPC bodies
+  (src/columnar_requests.py). Both go through the same `MicroBatcher`.
+- A full queue answers 503 with `Retry-After`, a missed deadline 504. The deadline of a request is the
+  `X-Timeout-Ms` header, or the batcher's default.
+- `GET /health` reports liveness (and the live model version) and `GET /stats` the batching, model
+  cache and prediction cache counters (hit ratio and latencies).
+"""
+
+TIMEOUT_HEADER = "X-Timeout-Ms"
+
+
+def create_app(batcher: MicroBatcher, cache: Optional[ModelCache] = None,
+               model_name: Optional[str] = None, predictions: Optional[PredictionCache] = None) -> FastAPI:
+    """Build the prediction server app around a (not yet started) micro-batcher.
+
+    Args:
+        batcher (MicroBatcher): Batches requests for the model's `predict`.
+        cache (ModelCache, optional): Cache the batcher predicts from, for health and stats.
+        model_name (str, optional): Model name served from `cache`.
+        predictions (PredictionCache, optional): Prediction cache the batcher predicts through, for stats.
+    Returns:
+        FastAPI: The app; the batcher is started and stopped with it.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await batcher.start()
+        yield
+        await batcher.stop()
+
+    app = FastAPI(title="House price prediction server", lifespan=lifespan)
+
+    async def predict(request: Request, houses) -> list:
+        timeout = request.headers.get(TIMEOUT_HEADER)
+        try:
+            return await batcher.submit(houses, timeout_ms=float(timeout) if timeout else None)
+        except ServerOverloaded as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except (KeyError, ValueError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=f"Invalid houses: {e}")
+
+    @app.post("/predict")
+    async def predict_json(request: Request) -> dict:
+        body = await request.json()
+        if isinstance(body, dict):
+            houses = body
+        elif isinstance(body, list) and body and all(isinstance(house, dict) for house in body):
+            houses = pd.DataFrame.from_records(body)
+        else:
+            raise HTTPException(status_code=422, detail="Expected a house object or a non-empty list of them.")
+        predictions = await predict(request, houses)
+        return {"predictions": predictions.tolist()}
+
+    @app.post("/predict/arrow")
+    async def predict_arrow(request: Request) -> Response:
+        try:
+            houses = decode_houses(await request.body())
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Invalid Arrow request: {e}")
+        predictions = await predict(request, houses)
+        return Response(encode_predictions(predictions), media_type=ARROW_STREAM_CONTENT_TYPE)
+
+    @app.get("/health")
+    async def health() -> dict:
+        if cache is None:
+            return {"status": "ok"}
+        version, _ = cache.live(model_name)
+        return {"status": "ok", "model": model_name, "version": version}
+
+    @app.get("/stats")
+    async def stats() -> dict:
+        if cache is None and predictions is None:
+            return dict(batcher.stats)
+        stats = {"batching": dict(batcher.stats)}
+        if cache is not None:
+            stats["model_cache"] = dict(cache.stats, nbytes=cache.nbytes)
+        if predictions is not None:
+            stats["prediction_cache"] = predictions.metrics()
+        return stats
+
+    return app
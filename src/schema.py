@@ -0,0 +1,109 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+""" Notes:
+- This module defines the typed column schemas of the house price data.
+- `RAW_HOUSE_SCHEMA` describes the CSV as ingested from S3.
+- `PROCESSED_HOUSE_SCHEMA` describes the output of `DataPreProcessStrategy`.
+- `RAW_HOUSE_DTYPES` is the pandas counterpart of `RAW_HOUSE_SCHEMA`: the compact dtypes the raw
+  columns are held in instead of int64/float64/object.
+- `pd.read_csv` silently wraps integers that do not fit a narrow dtype (300 bedrooms parsed as Int8
+  become 44). CSVs are therefore parsed with `parse_dtypes(...)`, which widens integer columns to
+  Int64, and then narrowed with `narrow_integers(...)`, which raises on out-of-range values like the
+  Arrow casts of the snapshot schemas do.
+- The schemas are used when writing and reading columnar (Parquet) snapshots, so
+  every run sees the same column types regardless of how pandas infers them.
+"""
+
+CATEGORICAL_COLUMNS = ['Location', 'Condition', 'Garage']
+
+
+def _category() -> pa.DataType:
+    """Dictionary-encoded string type; the categoricals have only a handful of levels."""
+    return pa.dictionary(pa.int8(), pa.string())
+
+
+RAW_HOUSE_SCHEMA = pa.schema([
+    ('Id', pa.int64()),
+    ('Area', pa.float32()),
+    ('Bedrooms', pa.int8()),
+    ('Bathrooms', pa.int8()),
+    ('Floors', pa.int8()),
+    ('YearBuilt', pa.int16()),
+    ('Location', _category()),
+    ('Condition', _category()),
+    ('Garage', _category()),
+    ('Price', pa.float64()),
+])
+
+PROCESSED_HOUSE_SCHEMA = pa.schema([
+    ('Id', pa.int64()),
+    ('Area', pa.float32()),
+    ('Bedrooms', pa.int8()),
+    ('Bathrooms', pa.int8()),
+    ('Floors', pa.int8()),
+    ('YearBuilt', pa.int16()),
+    ('Price', pa.float64()),
+    ('bedroom_bathroom_ratio', pa.float32()),
+    ('bedroom_floor_ratio', pa.float32()),
+    ('Location_Label_Encoded', pa.int8()),
+    ('Condition_Label_Encoded', pa.int8()),
+    ('Garage_Label_Encoded', pa.int8()),
+])
+
+# Compact pandas dtypes of the raw columns. Small counts use nullable integers so
+# missing values survive until imputation.
+RAW_HOUSE_DTYPES = {
+    'Id': 'Int64',
+    'Area': 'float32',
+    'Bedrooms': 'Int8',
+    'Bathrooms': 'Int8',
+    'Floors': 'Int8',
+    'YearBuilt': 'Int16',
+    'Location': 'category',
+    'Condition': 'category',
+    'Garage': 'category',
+    'Price': 'float64',
+}
+
+
+def parse_dtypes(dtype: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """Dtypes to pass to `pd.read_csv`: integer columns widened to Int64 so nothing wraps.
+
+    Args:
+        dtype (dict, optional): Target dtype per column, e.g. RAW_HOUSE_DTYPES.
+    Returns:
+        dict: The parse dtype per column; anything but a dict is returned unchanged.
+    """
+    if not isinstance(dtype, dict):
+        return dtype
+    return {column: 'Int64' if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(target)) else target
+            for column, target in dtype.items()}
+
+
+def narrow_integers(df: pd.DataFrame, dtype: Optional[Dict[str, str]]) -> pd.DataFrame:
+    """Casts integer columns parsed with `parse_dtypes` down to their target dtypes.
+
+    Args:
+        df (pd.DataFrame): Frame (or chunk) parsed with `parse_dtypes(dtype)`.
+        dtype (dict, optional): Target dtype per column, e.g. RAW_HOUSE_DTYPES.
+    Returns:
+        pd.DataFrame: `df`, with its integer columns narrowed in place.
+    Raises:
+        ValueError: If a column holds values outside the range of its target dtype.
+    """
+    if not isinstance(dtype, dict):
+        return df
+    for column, target in dtype.items():
+        target = pd.api.types.pandas_dtype(target)
+        if column not in df.columns or not pd.api.types.is_integer_dtype(target) or df[column].dtype == target:
+            continue
+        limits = np.iinfo(getattr(target, 'numpy_dtype', target))
+        low, high = df[column].min(), df[column].max()
+        if not pd.isna(low) and (low < limits.min or high > limits.max):
+            raise ValueError(f"Column '{column}' has values in [{low}, {high}], outside the range of {target}.")
+        df[column] = df[column].astype(target)
+    return df
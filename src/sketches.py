@@ -0,0 +1,131 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+""" Notes:
+- This module defines mergeable summaries used to fit preprocessing on data that does not fit in memory.
+- `QuantileSketch` is a KLL-style compactor sketch: memory is O(k log(n / k)) and the rank error of a
+  quantile estimate is roughly 1 / k of the number of values seen.
+- `HouseStatisticsSketch` keeps one quantile sketch per numeric column plus the category vocabularies,
+  and can be updated chunk by chunk or merged with sketches built on other chunks or workers.
+"""
+
+
+class QuantileSketch:
+    """Mergeable approximate quantile sketch.
+
+    Values enter level 0 with weight 1. Whenever a level grows past `k` items it
+    is sorted and every other item (starting at a random offset) is promoted to the
+    next level, where each item carries twice the weight. Merging two sketches
+    concatenates their levels and compacts again, so sketches built on separate
+    chunks combine into the sketch of the whole dataset.
+    """
+
+    def __init__(self, k: int = 2048, seed: Optional[int] = 0):
+        """
+        Args:
+            k (int): Items kept per level before compaction (default: 2048). Larger k
+                     means smaller error and more memory.
+            seed (int, optional): Seed for the compaction offsets, for reproducible sketches.
+        """
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray) -> "QuantileSketch":
+        """Add a batch of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold another sketch into this one."""
+        for height, items in enumerate(other.levels):
+            if height == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            self.levels[height] = np.concatenate([self.levels[height], items])
+        self.count += other.count
+        self._compact()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile of the values seen; NaN if the sketch is empty."""
+        if self.count == 0:
+            return float('nan')
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** height, dtype=np.int64)
+                                  for height, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(values[order][min(index, len(values) - 1)])
+
+    def _compact(self) -> None:
+        height = 0
+        while height < len(self.levels):
+            items = self.levels[height]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # An odd item out stays at this level so total weight is preserved.
+                keep = items[len(items) - len(items) % 2:]
+                promoted = items[self._rng.integers(2):len(items) - len(items) % 2:2]
+                self.levels[height] = keep
+                if height + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                self.levels[height + 1] = np.concatenate([self.levels[height + 1], promoted])
+            height += 1
+
+
+class HouseStatisticsSketch:
+    """Mergeable statistics needed to fit `HousePreProcessor` one chunk at a time."""
+
+    def __init__(self, numeric_columns: List[str], categorical_columns: List[str], k: int = 2048):
+        """
+        Args:
+            numeric_columns (List[str]): Columns whose medians are estimated.
+            categorical_columns (List[str]): Columns whose vocabularies are collected.
+            k (int): Size parameter of each quantile sketch (default: 2048).
+        """
+        self.quantiles: Dict[str, QuantileSketch] = {column: QuantileSketch(k) for column in numeric_columns}
+        self.vocabularies: Dict[str, set] = {column: set() for column in categorical_columns}
+        self.rows = 0
+
+    def update(self, chunk: pd.DataFrame) -> "HouseStatisticsSketch":
+        """Add the rows of one chunk."""
+        try:
+            for column, sketch in self.quantiles.items():
+                sketch.update(chunk[column].to_numpy(dtype=np.float64, na_value=np.nan))
+            for column, vocabulary in self.vocabularies.items():
+                values = chunk[column]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    codes = pd.unique(values.cat.codes.to_numpy())
+                    vocabulary.update(values.cat.categories[codes[codes >= 0]])
+                else:
+                    vocabulary.update(pd.unique(values.dropna().to_numpy()))
+            self.rows += len(chunk)
+            return self
+        except Exception as e:
+            logging.error(f"Error updating statistics sketch: {e}")
+            raise
+
+    def merge(self, other: "HouseStatisticsSketch") -> "HouseStatisticsSketch":
+        """Fold the statistics of another (disjoint) set of chunks into this one."""
+        for column, sketch in self.quantiles.items():
+            sketch.merge(other.quantiles[column])
+        for column, vocabulary in self.vocabularies.items():
+            vocabulary.update(other.vocabularies[column])
+        self.rows += other.rows
+        return self
+
+    def medians(self) -> Dict[str, float]:
+        return {column: sketch.quantile(0.5) for column, sketch in self.quantiles.items()}
+
+    def categories(self) -> Dict[str, np.ndarray]:
+        return {column: np.sort(np.array(list(vocabulary), dtype=object))
+                for column, vocabulary in self.vocabularies.items()}
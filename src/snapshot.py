@@ -0,0 +1,66 @@
+import logging
+import os
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def write_parquet_snapshot(df: pd.DataFrame, path: str, schema: Optional[pa.Schema] = None,
+                           compression: str = 'zstd') -> str:
+    """Writes a DataFrame to a Parquet snapshot.
+
+    The file is written to a temporary path and renamed into place, so readers
+    never see a partially written snapshot.
+
+    Args:
+        df (pd.DataFrame): Data frame to snapshot.
+        path (str): Destination path of the Parquet file.
+        schema (pa.Schema, optional): Typed schema to cast the columns to. Columns
+            not in the schema are dropped. If None, types are inferred by pyarrow.
+        compression (str): Parquet compression codec (default: 'zstd').
+
+    Returns:
+        str: The path of the written snapshot.
+
+    Raises:
+        pa.ArrowInvalid: If a column cannot be cast to its schema type.
+    """
+    try:
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.part"
+        pq.write_table(table, tmp_path, compression=compression)
+        os.replace(tmp_path, path)
+        logging.info(f"Wrote Parquet snapshot with {table.num_rows} rows to {path}.")
+        return path
+    except Exception as e:
+        logging.error(f"Error writing Parquet snapshot to {path}: {e}")
+        raise e
+
+
+def read_parquet_snapshot(path: str, columns: Optional[List[str]] = None,
+                          memory_map: bool = True) -> pd.DataFrame:
+    """Reads a Parquet snapshot into a DataFrame.
+
+    Only the requested columns are decoded. With `memory_map`, the file is mapped
+    instead of being read into an intermediate buffer, and blocks are not
+    consolidated so numeric columns can be handed to pandas without another copy.
+
+    Args:
+        path (str): Path of the Parquet file.
+        columns (List[str], optional): Columns to load. Loads all columns if None.
+        memory_map (bool): Memory-map the file while reading (default: True).
+
+    Returns:
+        pd.DataFrame: The snapshot data.
+    """
+    try:
+        table = pq.read_table(path, columns=columns, memory_map=memory_map)
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        logging.info(f"Loaded Parquet snapshot {path}. Shape: {df.shape}")
+        return df
+    except Exception as e:
+        logging.error(f"Error reading Parquet snapshot {path}: {e}")
+        raise e
@@ -0,0 +1,72 @@
+import logging
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from threadpoolctl import threadpool_limits
+
+""" Notes:
+- This module splits a per-process CPU budget between concurrent model fits.
+- A fit's threads come from two places: sklearn's `n_jobs` (joblib workers, e.g. one tree per thread in a
+  random forest) and native thread pools (OpenMP in HistGradientBoosting, BLAS in linear models). Both are
+  capped, the first by passing `n_jobs` and the second with threadpoolctl.
+- A single fit gets the whole budget. When several fits run at once, e.g. parallel tuning trials, each gets
+  an equal share, so the machine is neither oversubscribed nor left idle.
+"""
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects CPU affinity, e.g. container limits)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ThreadBudget:
+    """A number of threads to be shared by the fits running in this process tree."""
+
+    def __init__(self, total: Optional[int] = None):
+        """
+        Args:
+            total (int, optional): Threads in the budget. Defaults to every available core;
+                a negative value means all cores but `-total - 1`, as with sklearn's `n_jobs`.
+        """
+        cores = available_cores()
+        if total is None:
+            total = cores
+        elif total < 0:
+            total = cores + 1 + total
+        self.total = max(1, total)
+
+    def split(self, concurrent_fits: int) -> Tuple[int, int]:
+        """Share the budget between concurrent fits.
+
+        Args:
+            concurrent_fits (int): Fits that should run at the same time.
+        Returns:
+            Tuple[int, int]: The number of fits to actually run at once (never more than the
+                budget) and the threads each of them may use.
+        """
+        workers = max(1, min(concurrent_fits, self.total))
+        threads = max(1, self.total // workers)
+        logging.info(f"Thread budget of {self.total}: {workers} concurrent fits with {threads} threads each.")
+        return workers, threads
+
+    @contextmanager
+    def limit(self, threads: Optional[int] = None) -> Iterator[int]:
+        """Cap native (BLAS/OpenMP) thread pools while fitting; yields the thread count.
+
+        Args:
+            threads (int, optional): Threads for the fit. Defaults to the whole budget.
+        """
+        threads = threads or self.total
+        with threadpool_limits(limits=threads):
+            yield threads
+
+
+def limit_worker_threads(threads: int) -> None:
+    """Cap native thread pools for the rest of a worker process's life (pool initializer)."""
+    for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    threadpool_limits(limits=threads)
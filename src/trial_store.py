@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from hyperopt import Trials, space_eval
+from hyperopt.base import JOB_STATE_DONE, STATUS_OK
+from hyperopt.pyll import as_apply
+
+""" Notes:
+- This module persists hyperopt trials in a SQLite database so tuning survives interruptions.
+- Trials are grouped into studies identified by the model, a fingerprint of the training/validation data
+  and a fingerprint of the search space. Loading a study rebuilds a `Trials` object, which lets TPE
+  resume where a crashed run stopped or warm-start a new run from earlier ones.
+- A completed trial is written as soon as hyperopt refreshes its trials, i.e. after every evaluation.
+- Results are also looked up by their hyperparameters, so a configuration already evaluated on the same
+  data (in any study) is served from the store instead of being retrained.
+"""
+
+
+def dataset_fingerprint(*data) -> str:
+    """Content hash of the given DataFrames, Series or arrays, including their shapes and dtypes."""
+    digest = hashlib.sha256()
+    for item in data:
+        if isinstance(item, (pd.DataFrame, pd.Series)):
+            digest.update(repr((type(item).__name__, item.shape, [str(d) for d in np.atleast_1d(item.dtypes)],
+                                list(item.columns) if isinstance(item, pd.DataFrame) else item.name)).encode())
+            digest.update(pd.util.hash_pandas_object(item, index=False).to_numpy().tobytes())
+        else:
+            array = np.ascontiguousarray(item)
+            digest.update(repr((array.shape, array.dtype.str)).encode())
+            digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def space_fingerprint(space) -> str:
+    """Hash of a hyperopt search space's expression graph (labels, distributions and choices)."""
+    return hashlib.sha256(str(as_apply(space)).encode()).hexdigest()
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=_to_builtin)
+
+
+class TrialStore:
+    """SQLite-backed store of completed hyperopt trials."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the SQLite database; it is created if missing.
+        """
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trials (
+                    scope TEXT NOT NULL,
+                    dataset TEXT NOT NULL,
+                    space TEXT NOT NULL,
+                    tid INTEGER NOT NULL,
+                    params_key TEXT NOT NULL,
+                    vals TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (scope, dataset, space, tid)
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS trials_by_params ON trials (scope, dataset, params_key)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def trials(self, space, dataset: str, scope: str = "RandomForestRegressor") -> "PersistentTrials":
+        """
+        Load a study as a `Trials` object that keeps writing new results to the store.
+
+        Args:
+            space: The hyperopt search space of the study.
+            dataset (str): Fingerprint of the data, from `dataset_fingerprint`.
+            scope (str): Name of the model or objective (default: "RandomForestRegressor").
+
+        Returns:
+            PersistentTrials: Trials holding every completed trial of the study.
+        """
+        return PersistentTrials(self, scope, dataset, space)
+
+    def load(self, scope: str, dataset: str, space: str) -> list:
+        """Completed trials of a study as (vals, result) pairs, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT vals, result FROM trials WHERE scope = ? AND dataset = ? AND space = ? ORDER BY tid",
+                (scope, dataset, space)).fetchall()
+        return [(json.loads(vals), json.loads(result)) for vals, result in rows]
+
+    def save(self, scope: str, dataset: str, space: str, tid: int, params: dict, vals: dict,
+             result: dict) -> None:
+        """Store one completed trial."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, dataset, space, tid, _params_key(params), json.dumps(vals, default=_to_builtin),
+                 json.dumps(result, default=_to_builtin), time.time()))
+
+    def lookup(self, scope: str, dataset: str, params: dict) -> Optional[dict]:
+        """Result of an earlier evaluation of `params` on the same data, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result FROM trials WHERE scope = ? AND dataset = ? AND params_key = ? "
+                "ORDER BY created DESC LIMIT 1",
+                (scope, dataset, _params_key(params))).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class PersistentTrials(Trials):
+    """`Trials` that are loaded from and saved to a `TrialStore`.
+
+    Passing these to `fmin` or `ParallelTPESearch.run` resumes the study: trials
+    already in the store count towards `max_evals` and inform TPE's suggestions,
+    and every newly completed trial is saved on the next refresh.
+    """
+
+    def __init__(self, store: TrialStore, scope: str, dataset: str, space):
+        self.store = store
+        self.scope = scope
+        self.dataset = dataset
+        self.search_space = space
+        self.space_key = space_fingerprint(space)
+        self._saved = set()
+        super().__init__(refresh=False)
+
+        stored = store.load(scope, dataset, self.space_key)
+        tids = self.new_trial_ids(len(stored))
+        specs, results, miscs = [], [], []
+        for tid, (vals, result) in zip(tids, stored):
+            specs.append(None)
+            results.append(result)
+            miscs.append({'tid': tid, 'cmd': None, 'workdir': None,
+                          'idxs': {label: [tid] * len(values) for label, values in vals.items()},
+                          'vals': vals})
+        docs = self.new_trial_docs(tids, specs, results, miscs)
+        for doc in docs:
+            doc['state'] = JOB_STATE_DONE
+        self.insert_trial_docs(docs)
+        self._saved.update(tids)
+        self.refresh()
+        if stored:
+            logging.info(f"Loaded {len(stored)} stored trials for {scope} (dataset {dataset[:12]}).")
+
+    def cached_result(self, params: dict) -> Optional[dict]:
+        """Result of an earlier evaluation of `params` on this study's data, or None."""
+        return self.store.lookup(self.scope, self.dataset, params)
+
+    def refresh(self) -> None:
+        super().refresh()
+        for trial in self._dynamic_trials:
+            if (trial['state'] == JOB_STATE_DONE and trial['tid'] not in self._saved
+                    and trial['result'].get('status') == STATUS_OK):
+                vals = trial['misc']['vals']
+                params = space_eval(self.search_space,
+                                    {label: values[0] for label, values in vals.items() if values})
+                self.store.save(self.scope, self.dataset, self.space_key, trial['tid'], params, vals,
+                                trial['result'])
+                self._saved.add(trial['tid'])
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import mlflow.artifacts
+import mlflow.sklearn
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.schema import RAW_HOUSE_DTYPES, RAW_HOUSE_SCHEMA, narrow_integers, parse_dtypes
+from src.thread_budget import ThreadBudget, limit_worker_threads
+
+""" Notes:
+- Offline batch scoring of arbitrarily large CSV or Parquet files with the fitted preprocessing + model
+  pipeline.
+- The input is read in chunks of about `chunk_rows` rows. Chunk boundaries only depend on the file and
+  `chunk_rows`: fixed row counts for CSV, whole row groups for Parquet. Chunk `i` is therefore the same
+  rows on every run. Chunks are indexed by row position in the file; inputs without an Id column get
+  those positions as ids, so ids stay unique across chunks.
+- Chunks are scored in a process pool. Each worker loads the model once and writes its predictions to
+  `part-<i>.parquet` in the output directory, through a temporary file and a rename. A part file
+  exists only once its chunk is complete, and the directory reads as one Parquet dataset.
+- At most `max_pending` chunks are read ahead of the workers, so memory is bounded by the chunk size
+  and not by the input size.
+- A `_manifest.json` records the input file, its size and mtime, `chunk_rows` and the model (a hash of
+  its MLmodel file, so a moved alias counts as a different model). A rerun
+  with the same manifest skips the chunks whose part file exists, so a failed job resumes after its
+  last completed chunks. If the input, the chunking or the model changed, a rerun refuses to mix
+  outputs unless `restart=True`.
+- `_SUCCESS` is written last and records the number of chunks. A directory with `_SUCCESS` is complete
+  only while all those part files exist; if some were deleted, a rerun scores just the missing chunks.
+"""
+
+MANIFEST = "_manifest.json"
+SUCCESS = "_SUCCESS"
+OUTPUT_SCHEMA = pa.schema([RAW_HOUSE_SCHEMA.field("Id"), ("prediction", pa.float64())])
+
+_worker_model = None
+
+
+def _part_path(output_dir: str, index: int) -> str:
+    return os.path.join(output_dir, f"part-{index:06d}.parquet")
+
+
+def _is_parquet(path: str) -> bool:
+    return path.endswith((".parquet", ".pq"))
+
+
+def plan_parquet_chunks(path: str, chunk_rows: int) -> List[List[int]]:
+    """Row groups of a Parquet file, grouped into chunks of about `chunk_rows` rows."""
+    metadata = pq.ParquetFile(path).metadata
+    chunks, current, rows = [], [], 0
+    for group in range(metadata.num_row_groups):
+        current.append(group)
+        rows += metadata.row_group(group).num_rows
+        if rows >= chunk_rows:
+            chunks.append(current)
+            current, rows = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def iter_chunks(path: str, chunk_rows: int, skip: Optional[set] = None) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """Numbered chunks of a CSV or Parquet file, leaving out the chunk numbers in `skip`.
+
+    Args:
+        path (str): Input file; Parquet if it ends in .parquet or .pq, CSV otherwise.
+        chunk_rows (int): Rows per CSV chunk; Parquet chunks are whole row groups of about that many rows.
+        skip (set, optional): Chunk numbers not to read (e.g. already scored).
+    Yields:
+        Tuple[int, pd.DataFrame]: The chunk number and its raw rows, indexed by their (0-based)
+            row position in the file.
+    """
+    skip = skip or set()
+    if _is_parquet(path):
+        parquet_file = pq.ParquetFile(path)
+        start = 0
+        for index, row_groups in enumerate(plan_parquet_chunks(path, chunk_rows)):
+            rows = sum(parquet_file.metadata.row_group(group).num_rows for group in row_groups)
+            if index not in skip:
+                chunk = parquet_file.read_row_groups(row_groups).to_pandas(split_blocks=True, self_destruct=True)
+                chunk.index = pd.RangeIndex(start, start + rows)
+                yield index, chunk
+            start += rows
+        return
+    # Scored chunks at the start of the file are skipped without parsing their fields.
+    first = 0
+    while first in skip:
+        first += 1
+    reader = pd.read_csv(path, dtype=parse_dtypes(RAW_HOUSE_DTYPES), chunksize=chunk_rows,
+                         skiprows=range(1, first * chunk_rows + 1))
+    with reader:
+        for index, chunk in enumerate(reader, start=first):
+            if index not in skip:
+                # Skipped leading rows restart pandas' index at 0.
+                chunk.index = pd.RangeIndex(index * chunk_rows, index * chunk_rows + len(chunk))
+                yield index, narrow_integers(chunk, RAW_HOUSE_DTYPES)
+
+
+def _model_fingerprint(model_path: str) -> str:
+    # The MLmodel file names the run and model id, so an alias that moved gives another fingerprint.
+    with open(os.path.join(model_path, "MLmodel"), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _init_worker(model_path: str, threads: int) -> None:
+    global _worker_model
+    limit_worker_threads(threads)
+    _worker_model = mlflow.sklearn.load_model(model_path)
+    estimator = getattr(_worker_model, "steps", [(None, _worker_model)])[-1][1]
+    if "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=threads)
+
+
+def _score_chunk(index: int, chunk: pd.DataFrame, output_dir: str) -> Tuple[int, int]:
+    # Runs in a worker process.
+    predictions = _worker_model.predict(chunk.drop(columns="Price", errors="ignore"))
+    ids = chunk["Id"].to_numpy(dtype=np.int64, na_value=-1) if "Id" in chunk else chunk.index.to_numpy(np.int64)
+    table = pa.Table.from_arrays([pa.array(ids, pa.int64()), pa.array(predictions, pa.float64())],
+                                 schema=OUTPUT_SCHEMA)
+    path = _part_path(output_dir, index)
+    pq.write_table(table, path + ".part", compression="zstd")
+    os.replace(path + ".part", path)
+    return index, len(chunk)
+
+
+def _prepare_output(output_dir: str, manifest: dict, restart: bool) -> set:
+    """Create or check the output directory; returns the chunk numbers already scored."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    if os.path.exists(manifest_path) and not restart:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError(f"{output_dir} holds predictions for a different input, chunking or model "
+                             f"({previous}); pass restart=True to score from scratch.")
+    else:
+        for name in os.listdir(output_dir):
+            if name.startswith("part-") or name == SUCCESS:
+                os.remove(os.path.join(output_dir, name))
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+    return {int(name[5:11]) for name in os.listdir(output_dir)
+            if name.startswith("part-") and name.endswith(".parquet")}
+
+
+def score_file(input_path: str, output_dir: str, model_uri: str, chunk_rows: int = 250_000,
+               n_jobs: Optional[int] = None, max_pending: Optional[int] = None,
+               restart: bool = False) -> dict:
+    """Score a large CSV or Parquet file of raw houses into a directory of Parquet predictions.
+
+    Args:
+        input_path (str): Raw houses, CSV or Parquet (a Price column, if any, is ignored).
+        output_dir (str): Directory of the `part-*.parquet` predictions (columns Id, prediction).
+        model_uri (str): MLflow URI of the preprocessing + model pipeline, e.g.
+            "models:/Best_RF_House_Model@production".
+        chunk_rows (int): Rows per chunk (default: 250,000).
+        n_jobs (int, optional): Cores to use. Defaults to every available core.
+        max_pending (int, optional): Chunks read ahead of the workers. Defaults to the number
+            of workers, so at most twice that many chunks are in memory.
+        restart (bool): Discard existing predictions instead of resuming (default: False).
+    Returns:
+        dict: Chunks and rows scored by this run, and chunks skipped as already scored.
+    Raises:
+        ValueError: If `output_dir` holds predictions of another input, chunking or model.
+    """
+    try:
+        # Download once; the workers load the model from local disk.
+        model_path = mlflow.artifacts.download_artifacts(model_uri)
+        stat = os.stat(input_path)
+        manifest = {"input": os.path.abspath(input_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                    "chunk_rows": chunk_rows, "model_uri": model_uri, "model": _model_fingerprint(model_path)}
+        done = _prepare_output(output_dir, manifest, restart)
+        success_path = os.path.join(output_dir, SUCCESS)
+        if os.path.exists(success_path):
+            with open(success_path) as f:
+                content = f.read()
+            # An empty _SUCCESS predates the chunk count; trust it.
+            total = json.loads(content)["chunks"] if content else len(done)
+            if done >= set(range(total)):
+                logging.info(f"{output_dir} is already complete.")
+                return {"chunks": 0, "rows": 0, "skipped": len(done)}
+            logging.info(f"{total - len(done)} part files of {output_dir} are missing; scoring them again.")
+            os.remove(success_path)
+        if done:
+            logging.info(f"Resuming: {len(done)} chunks already scored in {output_dir}.")
+
+        budget = ThreadBudget(n_jobs)
+        workers, threads = budget.split(budget.total)
+        max_pending = max_pending or workers
+        chunks, rows = 0, 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, threads)) as executor:
+            pending = deque()
+            for index, chunk in iter_chunks(input_path, chunk_rows, skip=done):
+                pending.append(executor.submit(_score_chunk, index, chunk, output_dir))
+                del chunk
+                # Bound the chunks held in memory: wait for the oldest before reading further.
+                while len(pending) > workers + max_pending:
+                    _, scored = pending.popleft().result()
+                    chunks, rows = chunks + 1, rows + scored
+            while pending:
+                _, scored = pending.popleft().result()
+                chunks, rows = chunks + 1, rows + scored
+        with open(success_path, "w") as f:
+            json.dump({"chunks": chunks + len(done)}, f)
+        logging.info(f"Scored {rows} rows in {chunks} chunks into {output_dir}.")
+        return {"chunks": chunks, "rows": rows, "skipped": len(done)}
+    except Exception as e:
+        logging.error(f"Error in batch scoring of {input_path}: {e}")
+        raise e
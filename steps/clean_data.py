@@ -1,16 +1,27 @@
 import logging
 import pandas as pd
-from src.data_cleaning import DataCleaning, DataPreProcessStrategy, DataSplitStrategy
+from src.data_cleaning import (DataCleaning, DataPreProcessStrategy, DataSplitStrategy, HousePreProcessor,
+                               FeatureMatrix, IndexSplitStrategy)
 from typing_extensions import Annotated
-from typing import Union, Tuple
-from io import StringIO
+import os
+from typing import Callable, Iterable, Optional, Union, Tuple
+import tempfile
 import boto3
+from boto3.s3.transfer import TransferConfig
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.schema import PROCESSED_HOUSE_SCHEMA
+from src.snapshot import write_parquet_snapshot
+from steps.s3_transfer import MB, S3MultipartCSVWriter
 from config.access_keys import *
 
-def clean_data(df: pd.DataFrame) -> Annotated[pd.DataFrame, "processed_data"]:
+def clean_data(df: pd.DataFrame,
+               preprocessor: Optional[HousePreProcessor] = None) -> Annotated[pd.DataFrame, "processed_data"]:
     """Cleans the input data frame.
     Args:
         df (pd.DataFrame): input data frame to be cleaned.
+        preprocessor (HousePreProcessor, optional): fitted preprocessor to apply. If None,
+            a new one is fit on `df` (use `fit_clean_data` to keep it).
 
     Raises:
         e: error in processing data cleaning.
@@ -18,18 +29,84 @@ def clean_data(df: pd.DataFrame) -> Annotated[pd.DataFrame, "processed_data"]:
     Returns:
         pd.DataFrame: Processed data frame after cleaning.
     """
+    processed_data, _ = fit_clean_data(df, preprocessor)
+    return processed_data
+
+def fit_clean_data(df: pd.DataFrame,
+                   preprocessor: Optional[HousePreProcessor] = None) -> Tuple[
+                                    Annotated[pd.DataFrame, "processed_data"],
+                                    Annotated[HousePreProcessor, "preprocessor"]
+                                    ]:
+    """Cleans the input data frame and returns the fitted preprocessor.
+
+    The preprocessor should be persisted with the model so inference applies the
+    same medians and category codes that were learned at training time.
+
+    Args:
+        df (pd.DataFrame): input data frame to be cleaned.
+        preprocessor (HousePreProcessor, optional): fitted preprocessor to apply. If None,
+            a new one is fit on `df`.
+
+    Raises:
+        e: error in processing data cleaning.
+
+    Returns:
+        pd.DataFrame: Processed data frame after cleaning.
+        HousePreProcessor: The fitted preprocessor.
+    """
     try:
         logging.info("Starting data cleaning process...")
         # Process Data Cleaning
-        process_strategy = DataPreProcessStrategy()
+        process_strategy = DataPreProcessStrategy(preprocessor)
         data_cleaning = DataCleaning(df, process_strategy)
         processed_data = data_cleaning.handle_data()
         logging.info("Data preprocessing completed successfully.")
-        return processed_data
+        return processed_data, process_strategy.preprocessor
     except Exception as e:
         logging.error(f"Error in data cleaning step: {e}")
         raise e
 
+def clean_data_chunked(chunk_source: Callable[[], Iterable[pd.DataFrame]], output_path: str,
+                       preprocessor: Optional[HousePreProcessor] = None) -> HousePreProcessor:
+    """Cleans a dataset larger than memory, chunk by chunk, into a Parquet file.
+
+    The first pass fits the preprocessor from mergeable sketches (skipped if a fitted
+    preprocessor is given); the second pass transforms each chunk and appends it to
+    the Parquet sink. Memory use depends on the chunk size, not the dataset size.
+
+    Args:
+        chunk_source (Callable): Returns a fresh iterator of raw chunks on each call,
+            e.g. `lambda: reader.read_csv(s3_key, chunksize=500_000)`.
+        output_path (str): Path of the Parquet file to write.
+        preprocessor (HousePreProcessor, optional): fitted preprocessor to apply. If None,
+            a new one is fit with `HousePreProcessor.fit_chunks`.
+
+    Raises:
+        e: error in chunked data cleaning.
+
+    Returns:
+        HousePreProcessor: The fitted preprocessor.
+    """
+    try:
+        if preprocessor is None:
+            logging.info("Fitting preprocessor from chunk statistics...")
+            preprocessor = HousePreProcessor().fit_chunks(chunk_source())
+        logging.info(f"Writing cleaned chunks to {output_path}...")
+        tmp_path = f"{output_path}.part"
+        rows = 0
+        with pq.ParquetWriter(tmp_path, PROCESSED_HOUSE_SCHEMA, compression='zstd') as writer:
+            for chunk in chunk_source():
+                processed = preprocessor.transform(chunk)
+                writer.write_table(pa.Table.from_pandas(processed, schema=PROCESSED_HOUSE_SCHEMA,
+                                                        preserve_index=False))
+                rows += len(processed)
+        os.replace(tmp_path, output_path)
+        logging.info(f"Chunked data cleaning completed: {rows} rows written.")
+        return preprocessor
+    except Exception as e:
+        logging.error(f"Error in chunked data cleaning step: {e}")
+        raise e
+
 def split_data(df: pd.DataFrame) -> Tuple[
                                     Annotated[pd.DataFrame, "X_train"],
                                     Annotated[pd.DataFrame, "X_val"],
@@ -63,25 +140,90 @@ def split_data(df: pd.DataFrame) -> Tuple[
         logging.error(f"Error in data cleaning step: {e}")
         raise e
     
-def load_processed_data_to_s3(df: pd.DataFrame, bucket_name: str, csvfilename: str) -> None:
+def split_data_folds(df: pd.DataFrame, mode: str = "kfold", **kwargs) -> Tuple[
+                                    Annotated[FeatureMatrix, "feature_matrix"],
+                                    Annotated[list, "folds"]
+                                    ]:
+    """Splits data into row-index folds over one shared feature matrix, for `tune_model_cv`.
+
+    Args:
+        df (pd.DataFrame): cleaned data frame to be split.
+        mode (str): "holdout", "kfold", "repeated_kfold" or "time" (YearBuilt-ordered).
+        **kwargs: Additional options for IndexSplitStrategy (n_splits, n_repeats, test_size, ...).
+
+    Returns:
+        feature_matrix (FeatureMatrix): Features and labels held once as NumPy buffers.
+        folds (list): (train_indices, validation_indices) pairs into the feature matrix.
+
+    Raises:
+        e: error in processing data splitting.
+    """
+    try:
+        logging.info(f"Splitting data into '{mode}' index folds...")
+        divide_strategy = IndexSplitStrategy(mode=mode, **kwargs)
+        data_split = DataCleaning(df, divide_strategy)
+        feature_matrix, folds = data_split.handle_data()
+        logging.info(f"Data splitting completed successfully: {len(folds)} folds.")
+        return feature_matrix, folds
+
+    except Exception as e:
+        logging.error(f"Error in data splitting step: {e}")
+        raise e
+    
+def load_processed_data_to_s3(df: pd.DataFrame, bucket_name: str, csvfilename: str,
+                              compression: Optional[str] = None, chunk_rows: int = 100_000,
+                              max_concurrency: int = 4) -> None:
     """Loads the processed data to S3 bucket.
 
+    The data frame is streamed as a multipart upload in blocks of `chunk_rows` rows,
+    so the full CSV is never held in memory and objects larger than 5 GB can be written.
+
     Args:
         df (pd.DataFrame): Processed data frame to be uploaded.
         bucket_name (str): Name of the S3 bucket.
         csvfilename (str): Name of the CSV file to be created in S3.
+        compression (str, optional): None, 'gzip' or 'zstd'. Defaults to None (plain CSV).
+        chunk_rows (int): Number of rows serialized per block. Defaults to 100,000.
+        max_concurrency (int): Number of parts uploaded in parallel. Defaults to 4.
         
     Raises:
         e: error in uploading processed data to S3.
     """
     try:
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
         s3_client = boto3.client('s3')
-        bucket_name = bucket_name
-        object_key = csvfilename
-        s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=csv_buffer.getvalue())
-        logging.info(f"Processed data saved to S3 bucket {bucket_name} at key {object_key}.")
+        writer = S3MultipartCSVWriter(s3_client, max_concurrency=max_concurrency,
+                                      chunk_rows=chunk_rows, compression=compression)
+        writer.write(df, bucket_name, csvfilename)
+        logging.info(f"Processed data saved to S3 bucket {bucket_name} at key {csvfilename}.")
     except Exception as e:
         logging.error(f"Error uploading processed data to S3: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+def load_processed_snapshot_to_s3(df: pd.DataFrame, bucket_name: str, filename: str,
+                                  max_concurrency: int = 4) -> None:
+    """Loads the processed data to S3 bucket as a typed Parquet snapshot.
+
+    The snapshot is written to a temporary file and uploaded from disk as a multipart
+    upload, so the Parquet bytes are never held in memory and files above the 5 GB
+    single-request limit upload too.
+
+    Args:
+        df (pd.DataFrame): Processed data frame to be uploaded.
+        bucket_name (str): Name of the S3 bucket.
+        filename (str): Name of the Parquet file to be created in S3.
+        max_concurrency (int): Number of parts uploaded in parallel. Defaults to 4.
+
+    Raises:
+        e: error in uploading processed snapshot to S3.
+    """
+    try:
+        s3_client = boto3.client('s3')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_parquet_snapshot(df, os.path.join(tmp_dir, "snapshot.parquet"),
+                                          schema=PROCESSED_HOUSE_SCHEMA)
+            s3_client.upload_file(path, bucket_name, filename,
+                                  Config=TransferConfig(multipart_chunksize=8 * MB, max_concurrency=max_concurrency))
+        logging.info(f"Processed snapshot saved to S3 bucket {bucket_name} at key {filename}.")
+    except Exception as e:
+        logging.error(f"Error uploading processed snapshot to S3: {e}")
+        raise e
@@ -1,5 +1,9 @@
 from pydantic import BaseModel
 
 class ModelNameConfig(BaseModel):
-    """ Model Configurations """
+    """ Model Configurations 
+
+    model_name selects an engine registered in src/model_engines.py:
+    "RandomForestRegressor", "HistGradientBoostingRegressor" or "Ridge".
+    """
     model_name: str = "RandomForestRegressor"
@@ -1,10 +1,11 @@
 import logging
 import pandas as pd
 from zenml import step
-from src.evaluate_scores import Evaluation, MSE, RMSE, R2
+from src.evaluate_scores import Evaluation, FusedMetrics
+from src.bootstrap_metrics import BootstrapMetrics, slice_scores
 from sklearn.base import BaseEstimator, RegressorMixin
 from typing_extensions import Annotated
-from typing import Tuple
+from typing import Dict, Iterable, Sequence, Tuple
 import mlflow
 from zenml.client import Client
 
@@ -36,26 +37,85 @@ def evaluate_model(model: RegressorMixin,
         # Calculate Precitions
         predictions = model.predict(X_val)
         
-        # Initialize evaluation metrics
-        mse = MSE()
-        rmse = RMSE()
-        r2 = R2()
-
-        # Evaluate the model
-        mse_score = mse.calculate_scores(y_val, predictions)
-        rmse_score = rmse.calculate_scores(y_val, predictions)
-        r2_score = r2.calculate_scores(y_val, predictions)
+        # Evaluate the model: MSE, RMSE, MAE, R2, MAPE and residual quantiles in one pass
+        scores = FusedMetrics().calculate_scores(y_val, predictions)
 
         # Log the evaluation results
-        logging.info(f"MSE: {mse_score}")
-        logging.info(f"RMSE: {rmse_score}")
-        logging.info(f"R2: {r2_score}")
-        mlflow.log_metric("mse", mse_score)
-        mlflow.log_metric("rmse", rmse_score)
-        mlflow.log_metric("r2", r2_score)
+        mlflow.log_metrics(scores)
         
-        return r2_score, rmse_score
+        return scores["r2"], scores["rmse"]
 
     except Exception as e:
         logging.error(f"Error in model evaluation step: {e}")
         raise e
+
+
+def evaluate_model_chunked(model: RegressorMixin,
+                           chunks: Iterable[Tuple[pd.DataFrame, pd.Series]]) -> Dict[str, float]:
+    """
+    Evaluate a model on a validation set streamed in chunks.
+
+    Predictions are made and reduced one chunk at a time into mergeable partial sums,
+    so validation sets that do not fit in memory can be evaluated.
+
+    Args:
+        model (RegressorMixin): The trained machine learning model.
+        chunks (Iterable[Tuple[pd.DataFrame, pd.Series]]): Validation features and labels per chunk.
+
+    Returns:
+        Dict[str, float]: MSE, RMSE, MAE, R2, MAPE and (approximate) residual quantiles.
+    """
+    try:
+        scores = FusedMetrics().calculate_scores_chunked(
+            (y_chunk, model.predict(X_chunk)) for X_chunk, y_chunk in chunks)
+        mlflow.log_metrics(scores)
+        return scores
+    except Exception as e:
+        logging.error(f"Error in chunked model evaluation: {e}")
+        raise e
+
+
+SLICE_COLUMNS = ("Location_Label_Encoded", "Condition_Label_Encoded")
+
+
+@step(experiment_tracker=expierment_tracker.name)
+def evaluate_model_with_intervals(model: RegressorMixin,
+                                  X_val: pd.DataFrame,
+                                  y_val: pd.Series,
+                                  n_replicates: int = 1000,
+                                  confidence: float = 0.95,
+                                  slice_columns: Sequence[str] = SLICE_COLUMNS
+                                  ) -> Tuple[Annotated[float, "r2_lower"],
+                                             Annotated[float, "r2_score"],
+                                             Annotated[float, "rmse_score"]
+                                       ]:
+    """
+    Evaluate the model with bootstrap confidence intervals and per-slice metrics.
+
+    The lower bound of the R2 interval is a less noisy deployment gate than the
+    point estimate on a single validation set.
+
+    Args:
+        model (RegressorMixin): The trained machine learning model.
+        X_val (pd.DataFrame): Validation features.
+        y_val (pd.Series): Validation labels.
+        n_replicates (int): Number of bootstrap resamples.
+        confidence (float): Coverage of the intervals.
+        slice_columns (Sequence[str]): Columns of X_val to report metrics per value of.
+
+    Returns:
+        Tuple[float, float, float]: Lower bound of R2, R2 and RMSE.
+    """
+    try:
+        predictions = model.predict(X_val)
+        scores = BootstrapMetrics(n_replicates, confidence).calculate_scores(y_val, predictions)
+        mlflow.log_metrics(scores)
+
+        slices = slice_scores(y_val, predictions, X_val, [c for c in slice_columns if c in X_val.columns])
+        mlflow.log_table(slices, "evaluation/slice_metrics.json")
+
+        return scores["r2_lower"], scores["r2"], scores["rmse"]
+
+    except Exception as e:
+        logging.error(f"Error in model evaluation with intervals: {e}")
+        raise e
@@ -0,0 +1,150 @@
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+import mlflow
+import mlflow.sklearn
+import pandas as pd
+from mlflow import MlflowClient
+from sklearn.pipeline import Pipeline
+
+from src.model_engines import get_engine
+from src.thread_budget import ThreadBudget
+from src.trial_store import dataset_fingerprint
+from .clean_data import clean_data
+from .config import ModelNameConfig
+
+""" Notes:
+- Registered models are logged with the number of raw rows they have seen (`train_rows`), a rolling
+  fingerprint of those rows (`train_fingerprint`) and a fingerprint of the last `TAIL_ROWS` of them
+  (`train_tail_fingerprint`) as run tags.
+- The rolling fingerprint of an update chains the previous fingerprint with a hash of the appended rows,
+  and appending is detected by re-hashing only the tail, so checking and tagging an update costs time in
+  proportion to the new rows, not to the history. The trade-off: an edit to rows older than the tail is
+  not detected, so `--incremental` assumes the source file is append-only. A full retrain re-hashes
+  everything and starts a new chain.
+- When the tail still matches, only the rows after `train_rows` are new. Anything else (edited, truncated
+  or reordered rows at the boundary) needs a full retrain.
+- The update keeps the preprocessor fitted on the original data and extends the model with the engine's
+  `extend` (e.g. extra warm-started trees), so its cost depends on the number of new rows only. Engines
+  declare this with `supports_incremental`; for the others the caller retrains from scratch.
+"""
+
+TRAIN_ROWS_TAG = "train_rows"
+TRAIN_FINGERPRINT_TAG = "train_fingerprint"
+TRAIN_TAIL_FINGERPRINT_TAG = "train_tail_fingerprint"
+# Rows at the end of the seen data re-hashed to check that the source was only appended to.
+TAIL_ROWS = 1000
+
+
+def training_tags(df: pd.DataFrame, previous: Optional[dict] = None) -> dict:
+    """Run tags recording which raw rows a model has been trained on.
+
+    Args:
+        df (pd.DataFrame): The raw data the model has seen, in source order.
+        previous (dict, optional): Tags of the model that was extended, whose rows are a prefix
+            of `df`. Only the rows after that prefix are hashed. None hashes all of `df`.
+    Returns:
+        dict: Tags to log on the run that registers the model.
+    """
+    if previous is None:
+        fingerprint = dataset_fingerprint(df)
+    else:
+        appended = dataset_fingerprint(df.iloc[int(previous[TRAIN_ROWS_TAG]):])
+        fingerprint = hashlib.sha256(f"{previous[TRAIN_FINGERPRINT_TAG]}:{appended}".encode()).hexdigest()
+    return {TRAIN_ROWS_TAG: str(len(df)), TRAIN_FINGERPRINT_TAG: fingerprint,
+            TRAIN_TAIL_FINGERPRINT_TAG: dataset_fingerprint(df.iloc[-TAIL_ROWS:])}
+
+
+def load_latest_model(registered_model_name: str) -> Optional[Tuple[Pipeline, dict, str]]:
+    """Load the newest version of a registered model.
+
+    Args:
+        registered_model_name (str): Name of the model in the MLflow registry.
+    Returns:
+        Optional[Tuple[Pipeline, dict, str]]: The preprocessing + model pipeline, the tags
+            of the run that logged it and its version, or None if nothing is registered.
+    """
+    client = MlflowClient()
+    versions = client.search_model_versions(f"name='{registered_model_name}'",
+                                            order_by=["version_number DESC"], max_results=1)
+    if not versions:
+        return None
+    version = versions[0]
+    tags = client.get_run(version.run_id).data.tags
+    pipeline = mlflow.sklearn.load_model(f"models:/{registered_model_name}/{version.version}")
+    logging.info(f"Loaded {registered_model_name} version {version.version}.")
+    return pipeline, tags, version.version
+
+
+def find_new_rows(df: pd.DataFrame, tags: dict) -> Optional[pd.DataFrame]:
+    """Rows appended since the model described by `tags` was trained.
+
+    Args:
+        df (pd.DataFrame): The current raw data, in source order.
+        tags (dict): Run tags written by `training_tags`.
+    Returns:
+        Optional[pd.DataFrame]: The new rows (possibly empty), or None if the last rows seen
+            changed or the tags are missing, in which case the model must be retrained.
+    """
+    if any(tag not in tags for tag in (TRAIN_ROWS_TAG, TRAIN_FINGERPRINT_TAG, TRAIN_TAIL_FINGERPRINT_TAG)):
+        logging.info("The registered model has no training row tags; a full retrain is needed.")
+        return None
+    seen = int(tags[TRAIN_ROWS_TAG])
+    if seen > len(df) or dataset_fingerprint(df.iloc[max(seen - TAIL_ROWS, 0):seen]) != tags[TRAIN_TAIL_FINGERPRINT_TAG]:
+        logging.info("Rows the registered model was trained on have changed; a full retrain is needed.")
+        return None
+    logging.info(f"{len(df) - seen} new rows since the registered model ({seen} rows seen).")
+    return df.iloc[seen:]
+
+
+def update_model(pipeline: Pipeline,
+                 new_rows: pd.DataFrame,
+                 config: ModelNameConfig,
+                 rows_seen: int,
+                 n_jobs: int = None) -> Pipeline:
+    """Extend a trained pipeline with appended rows.
+
+    The fitted preprocessor is reused unchanged, so the new rows get the medians and
+    category codes learned at training time (unseen categories are encoded as -1).
+
+    Args:
+        pipeline (Pipeline): Pipeline with "preprocessor" and "model" steps.
+        new_rows (pd.DataFrame): Raw appended rows, including the Price target.
+        config (ModelNameConfig): Configuration for the model; its engine must have
+            `supports_incremental` set.
+        rows_seen (int): Raw rows the model has been trained on so far.
+        n_jobs (int, optional): Thread budget of the update. Defaults to every available core.
+    Returns:
+        Pipeline: The same pipeline with its model updated.
+    Raises:
+        ValueError: If the engine does not support incremental training.
+    """
+    try:
+        budget = ThreadBudget(n_jobs)
+        engine = get_engine(config.model_name, n_jobs=budget.total)
+        if not engine.supports_incremental:
+            raise ValueError(f"{config.model_name} does not support incremental training.")
+        processed = clean_data(new_rows, pipeline.named_steps["preprocessor"])
+        X_new, y_new = processed.drop(columns="Price"), processed["Price"]
+        with budget.limit():
+            engine.extend(pipeline.named_steps["model"], X_new, y_new, rows_seen)
+        return pipeline
+    except Exception as e:
+        logging.error(f"Error in incremental training: {e}")
+        raise e
+
+
+def split_new_rows(new_rows: pd.DataFrame, holdout: float) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Split appended rows into rows to train on and the newest rows, held out for validation.
+
+    The held-out rows are not recorded as seen, so the next update trains on them.
+
+    Args:
+        new_rows (pd.DataFrame): Raw appended rows, in source order.
+        holdout (float): Fraction of the rows to hold out; at least one row is held out.
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: The rows to train on and the held-out rows.
+    """
+    n_holdout = max(1, int(round(len(new_rows) * holdout)))
+    return new_rows.iloc[:-n_holdout], new_rows.iloc[-n_holdout:]
@@ -1,17 +1,23 @@
 import logging
 import pandas as pd
+from typing import Dict, Optional
 from zenml import step
+from src.schema import RAW_HOUSE_DTYPES, narrow_integers, parse_dtypes
 
 class IngestData:
     """
     Ingesting data from data_path
     """
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str, dtype: Optional[Dict[str, str]] = RAW_HOUSE_DTYPES):
         """
         Args:
             data_path (str): _description_
+            dtype (dict, optional): Column dtypes of the ingested frame. Defaults to the
+                compact RAW_HOUSE_DTYPES; None lets pandas infer int64/float64/object.
+                Integer columns are parsed as Int64 and narrowed with a range check.
         """
         self.data_path = data_path
+        self.dtype = dtype
         
     def get_data(self):
         """
@@ -21,7 +27,8 @@ class IngestData:
             df: dataframe containing the ingested data
         """
         logging.info(f"Reading data from {self.data_path}")
-        df = pd.read_csv(self.data_path)
+        df = narrow_integers(pd.read_csv(self.data_path, dtype=parse_dtypes(self.dtype)), self.dtype)
+        logging.info(f"Ingested {df.shape} frame using {df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB")
         return df
     
 @step
@@ -0,0 +1,110 @@
+import logging
+import threading
+from typing import Optional
+
+import mlflow.sklearn
+from mlflow import MlflowClient
+from mlflow.exceptions import MlflowException
+from sklearn.pipeline import Pipeline
+
+from src.model_cache import ModelCache
+
+""" Notes:
+- The registered model version to serve is the one holding the `production` alias. `promote_version`
+  moves the alias to an explicit version: the deployment pipeline registers the model it trained with
+  `register_version` only when `deployment_trigger` accepts it, and promotes exactly that version, so a
+  version registered by another run is never promoted by accident. Serving processes follow the alias
+  with `watch_alias`. The watcher preloads the new version into their
+  `ModelCache` and swaps it in, with no restart.
+"""
+
+PRODUCTION_ALIAS = "production"
+
+
+def load_registered_model(name: str, version: str) -> Pipeline:
+    """Loader for `ModelCache`: one version of a registered preprocessing + model pipeline."""
+    return mlflow.sklearn.load_model(f"models:/{name}/{version}")
+
+
+def aliased_version(name: str, alias: str = PRODUCTION_ALIAS) -> Optional[str]:
+    """Version of `name` holding `alias`, or None if the alias is not set."""
+    try:
+        return str(MlflowClient().get_model_version_by_alias(name, alias).version)
+    except MlflowException:
+        return None
+
+
+def register_version(model: Pipeline, name: str, artifact_path: str = "model", tags: Optional[dict] = None) -> str:
+    """Log a fitted model and register it as a new version of `name`.
+
+    Args:
+        model (Pipeline): The fitted preprocessing + model pipeline (any sklearn estimator).
+        name (str): Registered model name.
+        artifact_path (str): Artifact path of the model in its run.
+        tags (dict, optional): Tags of the logging run, e.g. `training_tags` of the rows
+            the model was trained on.
+    Returns:
+        str: The registered version.
+    """
+    with mlflow.start_run(nested=mlflow.active_run() is not None):
+        if tags:
+            mlflow.set_tags(tags)
+        info = mlflow.sklearn.log_model(sk_model=model, artifact_path=artifact_path, registered_model_name=name)
+    version = str(info.registered_model_version)
+    logging.info(f"Registered {name} version {version}.")
+    return version
+
+
+def promote_version(name: str, version: str, alias: str = PRODUCTION_ALIAS) -> str:
+    """Point `alias` at a version of `name`.
+
+    Args:
+        name (str): Registered model name.
+        version (str): Version to promote, e.g. as returned by `register_version`.
+        alias (str): Alias followed by the serving processes.
+    Returns:
+        str: The promoted version.
+    """
+    MlflowClient().set_registered_model_alias(name, alias, version)
+    logging.info(f"Promoted {name} version {version} to '{alias}'.")
+    return version
+
+
+def watch_alias(cache: ModelCache, name: str, alias: str = PRODUCTION_ALIAS,
+                interval_s: float = 30.0) -> threading.Event:
+    """Serve the version of `name` holding `alias`, following the alias as it moves.
+
+    The current version is loaded and made live before returning. A background thread then checks
+    the alias every `interval_s` seconds and promotes new versions in the cache.
+
+    Args:
+        cache (ModelCache): Cache whose live version of `name` should follow the alias.
+        name (str): Registered model name.
+        alias (str): Alias to follow.
+        interval_s (float): Seconds between registry checks.
+    Returns:
+        threading.Event: Set it to stop watching.
+    Raises:
+        LookupError: If the alias is not set.
+    """
+    version = aliased_version(name, alias)
+    if version is None:
+        raise LookupError(f"{name} has no '{alias}' version.")
+    cache.promote(name, version)
+    stop = threading.Event()
+
+    def watch() -> None:
+        live = version
+        while not stop.wait(interval_s):
+            try:
+                current = aliased_version(name, alias)
+                if current is not None and current != live:
+                    logging.info(f"{name} '{alias}' moved to version {current}; preloading it...")
+                    cache.promote(name, current)
+                    live = current
+            except Exception as e:
+                # Keep serving the live version and retry on the next check.
+                logging.error(f"Error following {name} '{alias}': {e}")
+
+    threading.Thread(target=watch, name=f"watch-{name}", daemon=True).start()
+    return stop
@@ -5,46 +5,51 @@ from typing import Union
 from sklearn.base import BaseEstimator, RegressorMixin
 from .config import ModelNameConfig
 import mlflow
-from hyperopt import fmin, tpe, hp, STATUS_OK, Trials
-from sklearn.ensemble import RandomForestRegressor
-import mlflow
+import numpy as np
+from functools import partial
+from hyperopt import fmin, tpe, Trials
+from src.hyperparameter_search import ParallelTPESearch, SuccessiveHalvingSearch
+from src.data_cleaning import FeatureMatrix
+from src.model_engines import engine_cv_objective, engine_objective, fold_arrays, get_engine
+from src.trial_store import TrialStore, dataset_fingerprint
+from src.thread_budget import ThreadBudget, limit_worker_threads
 
 
 def train_model(X_train: pd.DataFrame,
                 y_train: pd.Series,
                 config: ModelNameConfig,
-                hyperparameters = None,) -> RegressorMixin:
+                hyperparameters = None,
+                n_jobs: int = None) -> RegressorMixin:
     """
     Train a machine learning model using the provided DataFrame.
     
     Args:
         X_train (pd.DataFrame): Training features.
         y_train (pd.Series): Training labels.
-        config (ModelNameConfig): Configuration for the model.
+        config (ModelNameConfig): Configuration for the model; `model_name` selects the
+            engine registered in src/model_engines.py.
         hyperparameters (dict, optional): Hyperparameters for the model. Defaults to None.
+        n_jobs (int, optional): Thread budget of the fit, covering sklearn n_jobs and
+            BLAS/OpenMP threads. Defaults to every available core.
     Returns:
         None
+    Raises:
+        ValueError: If no engine is registered for `config.model_name`.
     """
     try:
-        model = None
+        budget = ThreadBudget(n_jobs)
+        engine = get_engine(config.model_name, n_jobs=budget.total)
         with mlflow.start_run():        
-            if config.model_name == "RandomForestRegressor":
-                # If hyperparameters are provided, use them
-                if hyperparameters:
-                    model = RandomForestRegressor(**hyperparameters)
-                else:
-                    model = RandomForestRegressor()
-                # Train the model
-                logging.info(f"Training model: {config.model_name} with hyperparameters: {hyperparameters}")
-                # Fit the model
-                if hyperparameters:
-                    trained_model = model.fit(X_train, y_train, **hyperparameters)
-                else:
-                    trained_model = model.fit(X_train, y_train)
-                logging.info("Model trained successfully.")
-                return trained_model
-            else:
-                raise ValueError(f"Model {ModelNameConfig.model_name} is not supported.")
+            # If hyperparameters are provided, use them
+            model = engine.build(hyperparameters)
+            # Train the model
+            logging.info(f"Training model: {config.model_name} with hyperparameters: {hyperparameters} "
+                         f"on {budget.total} threads")
+            # Fit the model; hyperparameters belong to the estimator, not to fit()
+            with budget.limit():
+                trained_model = model.fit(X_train, y_train)
+            logging.info("Model trained successfully.")
+            return trained_model
         
     except Exception as e:
         logging.error(f"Error in training model: {e}")
@@ -55,61 +60,163 @@ def tune_model(X_train: pd.DataFrame,
                X_val: pd.DataFrame,
                y_val: pd.Series,
                config: ModelNameConfig,
-               search_space: dict = None) -> dict:
+               search_space: dict = None,
+               max_evals: int = 50,
+               n_workers: int = 1,
+               method: str = "tpe",
+               trial_store: TrialStore = None,
+               n_jobs: int = None) -> dict:
     """ Tune a machine learning model using the provided DataFrame.
     Args:
         X_train (pd.DataFrame): Training features.
         y_train (pd.Series): Training labels.
         X_val (pd.DataFrame): Validation features.
         y_val (pd.Series): Validation labels.
+        config (ModelNameConfig): Configuration for the model; `model_name` selects the engine.
+        search_space (dict, optional): hyperopt search space. Defaults to the engine's space.
+        max_evals (int, optional): Number of trials. Defaults to 50.
+        n_workers (int, optional): Trials evaluated concurrently in a process pool, with the
+            data passed through shared memory, for engines that allow parallel trials. Capped
+            at the thread budget. Defaults to 1 (serial fmin, each trial using the whole budget).
+        method (str, optional): "tpe" (default) trains every trial's model in full.
+            "halving" and "hyperband" (RandomForestRegressor only) start random configurations
+            on a fraction of their trees and rows and grow only the best ones with warm_start;
+            with these, `max_evals` is the number of configurations sampled for successive halving.
+        trial_store (TrialStore, optional): Persist TPE trials. A run on the same data and
+            search space resumes the stored study, so `max_evals` counts the stored trials
+            too, and configurations already evaluated on this data are not retrained.
+        n_jobs (int, optional): Thread budget shared by all trials, covering sklearn n_jobs
+            and BLAS/OpenMP threads. Parallel trials each get an equal share. Defaults to
+            every available core.
     Returns:
         dict: Best hyperparameters found during tuning.
+    Raises:
+        ValueError: If no engine is registered for `config.model_name`, or `method` does
+            not apply to it.
     """
     # Define objective function
-    def objective_rf(params):
+    def objective(params):
+        cached = trials.cached_result(params) if trial_store is not None else None
+        if cached is not None:
+            return cached
         with mlflow.start_run(nested=True):
-            reg = RandomForestRegressor(
-                n_estimators=params['n_estimators'],
-                max_depth=params['max_depth'],
-                min_samples_split=params['min_samples_split'],
-                min_samples_leaf=params['min_samples_leaf'],
-                random_state=42
-            )
-            
-            reg.fit(X_train, y_train)
-            r2_score = reg.score(X_val, y_val)
+            return engine.evaluate(params, X_train, y_train, X_val, y_val)
 
-            return {'loss': -r2_score, 'status': STATUS_OK}
-    
-    
     try:
-        with mlflow.start_run():        
-            if config.model_name == "RandomForestRegressor":
-                # Define the search space for hyperparameters
-                if search_space:
-                    space = search_space
-                else:
-                    space = {
-                        'n_estimators': hp.choice('n_estimators', range(10, 300)),
-                        'max_depth': hp.choice('max_depth', range(1, 20)),
-                        'min_samples_split': hp.uniform('min_samples_split', 0.1, 1.0),
-                        'min_samples_leaf': hp.choice('min_samples_leaf', range(1, 10))
-                    }
-        # Run optimization
-        if config.model_name == "RandomForestRegressor":
+        budget = ThreadBudget(n_jobs)
+        engine = get_engine(config.model_name, n_jobs=budget.total)
+        # Define the search space for hyperparameters
+        space = search_space if search_space else engine.search_space()
+        # Load the stored study for this data and space, if any
+        if trial_store is not None:
+            trials = trial_store.trials(space, dataset_fingerprint(X_train, y_train, X_val, y_val),
+                                        scope=config.model_name)
+        else:
             trials = Trials()
-            logging.info("Starting hyperparameter tuning for RandomForestRegressor.")
+        # Run optimization
+        if method in ("halving", "hyperband"):
+            if config.model_name != "RandomForestRegressor":
+                raise ValueError(f"Tuning method {method} is not supported for {config.model_name}.")
+            logging.info(f"Starting {method} hyperparameter tuning for {config.model_name}.")
             with mlflow.start_run():
-                best_params = fmin(
-                    fn=objective_rf,
-                    space=space,
-                    algo=tpe.suggest,
-                    max_evals=50,
-                    trials=trials
-            )
-            print("Best parameters found:", best_params)
+                search = SuccessiveHalvingSearch(space, n_configs=max_evals, hyperband=(method == "hyperband"),
+                                                 n_jobs=budget.total, on_result=_log_trial)
+                with budget.limit():
+                    best_params, _, best_r2 = search.run(
+                        X_train.to_numpy(dtype=np.float32), y_train.to_numpy(dtype=np.float64),
+                        X_val.to_numpy(dtype=np.float32), y_val.to_numpy(dtype=np.float64))
+                mlflow.log_metric("best_r2", best_r2)
+                mlflow.log_metric("trees_trained", search.trees_trained)
+        elif method != "tpe":
+            raise ValueError(f"Unknown tuning method: {method}")
+        else:
+            best_params = _run_tpe(config, engine, budget, space, trials, objective, engine_objective, {
+                'X_train': X_train.to_numpy(dtype=np.float32),
+                'y_train': y_train.to_numpy(dtype=np.float64),
+                'X_val': X_val.to_numpy(dtype=np.float32),
+                'y_val': y_val.to_numpy(dtype=np.float64),
+            }, max_evals, n_workers)
+        logging.info(f"Best parameters found: {best_params}")
+    except Exception as e:
+        logging.error(f"Error in tuning model: {e}")
+        raise e
+    return best_params
+
+def tune_model_cv(feature_matrix: FeatureMatrix,
+                  folds: list,
+                  config: ModelNameConfig,
+                  search_space: dict = None,
+                  max_evals: int = 50,
+                  n_workers: int = 1,
+                  trial_store: TrialStore = None,
+                  n_jobs: int = None) -> dict:
+    """ Tune a machine learning model by cross-validation over row-index folds.
+
+    The folds come from `split_data_folds`; every trial fits the same `feature_matrix`
+    buffers, gathering only the rows of the fold it trains on. Parallel workers map the
+    matrix and the fold indices from shared memory once, instead of receiving a copy of
+    the data per fold or per trial.
+
+    Args:
+        feature_matrix (FeatureMatrix): Features and labels of the cleaned data.
+        folds (list): (train_indices, validation_indices) pairs into `feature_matrix`.
+        config (ModelNameConfig): Configuration for the model; `model_name` selects the engine.
+        search_space (dict, optional): hyperopt search space. Defaults to the engine's space.
+        max_evals (int, optional): Number of trials. Defaults to 50.
+        n_workers (int, optional): Trials evaluated concurrently, as in `tune_model`. Defaults to 1.
+        trial_store (TrialStore, optional): Persist TPE trials, as in `tune_model`; the study
+            is keyed on the matrix and the folds.
+        n_jobs (int, optional): Thread budget shared by all trials. Defaults to every available core.
+    Returns:
+        dict: Best hyperparameters found during tuning (mean validation r2 over the folds).
+    Raises:
+        ValueError: If no engine is registered for `config.model_name`.
+    """
+    def objective(params):
+        cached = trials.cached_result(params) if trial_store is not None else None
+        if cached is not None:
+            return cached
+        with mlflow.start_run(nested=True):
+            return engine.cross_validate(params, feature_matrix.X, feature_matrix.y, folds)
+
+    try:
+        budget = ThreadBudget(n_jobs)
+        engine = get_engine(config.model_name, n_jobs=budget.total)
+        space = search_space if search_space else engine.search_space()
+        arrays = fold_arrays(feature_matrix.X, feature_matrix.y, folds)
+        if trial_store is not None:
+            trials = trial_store.trials(space, dataset_fingerprint(*arrays.values()), scope=config.model_name)
+        else:
+            trials = Trials()
+        best_params = _run_tpe(config, engine, budget, space, trials, objective, engine_cv_objective,
+                               arrays, max_evals, n_workers)
+        logging.info(f"Best parameters found: {best_params}")
     except Exception as e:
         logging.error(f"Error in tuning model: {e}")
         raise e
     return best_params
-                
+
+def _log_trial(params: dict, result: dict) -> None:
+    """Log a trial evaluated outside `fmin` (worker process or halving rung) as a nested run of the tuning run."""
+    with mlflow.start_run(nested=True):
+        mlflow.log_params(params)
+        mlflow.log_metric("r2", result['r2'])
+        if 'rung' in result:
+            mlflow.log_metric("rung", result['rung'])
+            mlflow.log_metric("trees", result['n_estimators'])
+
+def _run_tpe(config: ModelNameConfig, engine, budget: ThreadBudget, space: dict, trials: Trials,
+             objective, worker_objective, arrays: dict, max_evals: int, n_workers: int) -> dict:
+    """Run TPE serially with `objective`, or in worker processes with `worker_objective` over shared `arrays`."""
+    if n_workers > 1 and engine.parallel_trials and budget.total > 1:
+        n_workers, threads = budget.split(n_workers)
+        logging.info(f"Starting parallel hyperparameter tuning for {config.model_name} on {n_workers} workers "
+                     f"with {threads} threads each.")
+        with mlflow.start_run():
+            search = ParallelTPESearch(partial(worker_objective, config.model_name, n_jobs=threads), space,
+                                       max_evals=max_evals, n_workers=n_workers, on_result=_log_trial,
+                                       worker_initializer=partial(limit_worker_threads, threads))
+            return search.run(arrays, trials=trials).argmin
+    logging.info(f"Starting hyperparameter tuning for {config.model_name} on {budget.total} threads.")
+    with mlflow.start_run(), budget.limit():
+        return fmin(fn=objective, space=space, algo=tpe.suggest, max_evals=max_evals, trials=trials)
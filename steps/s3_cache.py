@@ -0,0 +1,188 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from .s3_transfer import S3RangedDownloader
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 * 1024 * 1024
+
+
+class S3DiskCache:
+    """
+    Content-addressed local disk cache for S3 objects.
+
+    Objects are stored under a name derived from their ETag and size, so an
+    unchanged object is reused across runs and re-uploads of identical content
+    share one file. A small reference file per bucket/key remembers the last ETag
+    seen, which lets `revalidate=False` serve reads without contacting S3 at all.
+    The price is staleness: without revalidation, an object overwritten in S3 keeps
+    being served from its old cached copy until a revalidating read (or clearing
+    the cache) picks up the new ETag. Keys that were never cached are always fetched.
+    The total size of cached objects is bounded with least-recently-used eviction,
+    using file modification times as the access clock. Files derived from a cached
+    object (such as its Parquet snapshot) are stored next to it, count towards the
+    bound and are evicted together with it.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 10 * GB, revalidate: bool = True):
+        """
+        Args:
+            cache_dir (str): Directory holding the cached objects.
+            max_bytes (int): Upper bound on the total size of cached objects (default: 10 GB).
+            revalidate (bool): Check the cached copy against a HEAD request before using
+                               it (default: True). When False, the last cached version of
+                               a key is used without any network I/O.
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.refs_dir = os.path.join(self.cache_dir, "refs")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+
+    def fetch(self, downloader: S3RangedDownloader, bucket_name: str, s3_key: str) -> str:
+        """
+        Returns a local path holding the current content of an S3 object.
+
+        The object is downloaded only if no cached copy matches its ETag and size.
+
+        Args:
+            downloader (S3RangedDownloader): Downloader used for HEAD requests and misses.
+            bucket_name (str): The name of the S3 bucket.
+            s3_key (str): The key of the object.
+
+        Returns:
+            str: Path to the cached copy of the object.
+        """
+        if not self.revalidate:
+            ref = self._read_ref(bucket_name, s3_key)
+            if ref is not None:
+                path = self.lookup(ref['etag'], ref['size'])
+                if path is not None:
+                    logger.info(f"Cache hit for '{s3_key}' (not revalidated): {path}")
+                    return path
+
+        size, etag = downloader.head(bucket_name, s3_key)
+        path = self.lookup(etag, size)
+        if path is not None:
+            logger.info(f"Cache hit for '{s3_key}' (ETag {etag}): {path}")
+        else:
+            logger.info(f"Cache miss for '{s3_key}' (ETag {etag}). Downloading {size} bytes.")
+            path = self._object_path(etag, size)
+            fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".part")
+            os.close(fd)
+            try:
+                downloader.download_to_file(bucket_name, s3_key, tmp_path, size=size, etag=etag)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+            self.evict(keep=path)
+        self._write_ref(bucket_name, s3_key, etag, size)
+        return path
+
+    def lookup(self, etag: str, size: int) -> Optional[str]:
+        """
+        Returns the cached path for an object version, or None if it is not cached.
+
+        A hit refreshes the entry's position in the LRU order.
+        """
+        path = self._object_path(etag, size)
+        try:
+            if os.path.getsize(path) != size:
+                return None
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def derived_path(self, path: str, key: str) -> str:
+        """
+        Returns the path of a file derived from a cached object, e.g. its Parquet snapshot.
+
+        Args:
+            path (str): Cached object the file is derived from, as returned by `fetch`.
+            key (str): Everything besides the object's content that the derived file
+                       depends on (such as a schema and parser options). A different
+                       key gives a different file.
+
+        Returns:
+            str: Path of the derived file; it may not exist yet.
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f"{path}.{digest}"
+
+    def lookup_derived(self, path: str, key: str) -> Optional[str]:
+        """
+        Returns the path of an existing derived file, or None if it was not built yet.
+
+        A hit refreshes the entry's position in the LRU order, like `lookup`.
+        """
+        derived = self.derived_path(path, key)
+        try:
+            os.utime(derived)
+        except FileNotFoundError:
+            return None
+        return derived
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Removes least-recently-used objects until the cache fits in `max_bytes`.
+
+        An object and the files derived from it are evicted together, and they are
+        as recent as the most recently used of them.
+
+        Args:
+            keep (str, optional): Path of an object that must not be evicted, such as
+                                  the object that was just stored.
+        """
+        groups = {}
+        for entry in os.scandir(self.objects_dir):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                stat = entry.stat()
+                source = os.path.join(self.objects_dir, entry.name.split(".", 1)[0])
+                mtime, size, paths = groups.get(source, (0.0, 0, []))
+                groups[source] = (max(mtime, stat.st_mtime), size + stat.st_size, paths + [entry.path])
+        total = sum(size for _, size, _ in groups.values())
+        for source, (_, size, paths) in sorted(groups.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            if source == keep:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            logger.info(f"Evicted {source} and {len(paths) - 1} derived files ({size} bytes) from the S3 cache.")
+        if total > self.max_bytes:
+            logger.warning(f"S3 cache holds {total} bytes, above its {self.max_bytes} byte limit, "
+                           f"because the most recent object alone exceeds it.")
+
+    def _object_path(self, etag: str, size: int) -> str:
+        digest = hashlib.sha256(f"{etag}:{size}".encode()).hexdigest()
+        return os.path.join(self.objects_dir, digest)
+
+    def _ref_path(self, bucket_name: str, s3_key: str) -> str:
+        digest = hashlib.sha256(f"{bucket_name}/{s3_key}".encode()).hexdigest()
+        return os.path.join(self.refs_dir, digest + ".json")
+
+    def _read_ref(self, bucket_name: str, s3_key: str) -> Optional[dict]:
+        try:
+            with open(self._ref_path(bucket_name, s3_key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_ref(self, bucket_name: str, s3_key: str, etag: str, size: int) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.refs_dir, suffix=".part")
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'bucket': bucket_name, 'key': s3_key, 'etag': etag, 'size': size}, f)
+        os.replace(tmp_path, self._ref_path(bucket_name, s3_key))
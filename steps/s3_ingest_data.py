@@ -1,8 +1,17 @@
 import boto3
+from botocore.config import Config
 import pandas as pd
+import pyarrow as pa
+import hashlib
 import io
+import json
 import logging # Import the logging module
 import os # For better credential handling (optional)
+from typing import Iterator, List, Optional, Union
+from .s3_transfer import S3RangedDownloader, MemoryViewReader, MB
+from .s3_cache import S3DiskCache
+from src.schema import RAW_HOUSE_SCHEMA, RAW_HOUSE_DTYPES, narrow_integers, parse_dtypes
+from src.snapshot import write_parquet_snapshot, read_parquet_snapshot
 
 # --- Configure logging ---
 # You can customize this logging configuration based on your needs.
@@ -11,6 +20,53 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__) # Get a logger specific to this module
 
+def snapshot_key(schema: Optional[pa.Schema], encoding: str, read_kwargs: dict) -> str:
+    """
+    Identifies what a Parquet snapshot of a CSV depends on besides the CSV's content.
+
+    Args:
+        schema (pa.Schema, optional): Typed schema of the snapshot.
+        encoding (str): The encoding of the CSV file.
+        read_kwargs (dict): Keyword arguments passed to pandas.read_csv().
+
+    Returns:
+        str: A stable string for `S3DiskCache.derived_path`.
+    """
+    schema_digest = hashlib.sha256(schema.serialize().to_pybytes()).hexdigest() if schema is not None else None
+    return json.dumps({'schema': schema_digest, 'encoding': encoding, 'read_csv': read_kwargs},
+                      sort_keys=True, default=repr)
+
+class CSVChunks:
+    """
+    Iterator over the DataFrame chunks of a CSV that owns the body they are parsed from.
+
+    The body is closed when the iterator is exhausted, when `close()` is called or when
+    a `with` block around it exits, including when no chunk was ever read. Use it as a
+    context manager if the iteration may stop early.
+    """
+
+    def __init__(self, chunks: Iterator[pd.DataFrame], body):
+        self._chunks = chunks
+        self._body = body
+
+    def __iter__(self) -> "CSVChunks":
+        return self
+
+    def __next__(self) -> pd.DataFrame:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        """Stop parsing and close the body (and its HTTP connection)."""
+        self._chunks.close()
+        self._body.close()
+
+    def __enter__(self) -> "CSVChunks":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
 class S3CSVReader:
     """
     A class to read CSV files directly from an AWS S3 bucket into a pandas DataFrame.
@@ -18,7 +74,9 @@ class S3CSVReader:
     """
 
     def __init__(self, bucket_name: str, region_name: str = 'us-east-1',
-                 aws_access_key_id: str = None, aws_secret_access_key: str = None):
+                 aws_access_key_id: str = None, aws_secret_access_key: str = None,
+                 part_size: int = 8 * MB, max_concurrency: int = 8,
+                 cache: Optional[S3DiskCache] = None):
         """
         Initializes the S3CSVReader with S3 bucket details and AWS credentials.
 
@@ -30,64 +88,112 @@ class S3CSVReader:
                                                shared credential file (~/.aws/credentials),
                                                or IAM roles.
             aws_secret_access_key (str, optional): AWS Secret Access Key. Similar to above.
+            part_size (int): Byte range size used by parallel downloads (default: 8 MB).
+            max_concurrency (int): Maximum number of concurrent ranged GETs used by
+                                   parallel downloads (default: 8).
+            cache (S3DiskCache, optional): Local disk cache for downloaded objects. When
+                                           set, objects whose ETag and size match a cached
+                                           copy are read from disk instead of S3.
         """
         self.bucket_name = bucket_name
         self.region_name = region_name
         self.aws_access_key_id = aws_access_key_id
         self.aws_secret_access_key = aws_secret_access_key
+        self.max_concurrency = max_concurrency
+        self.cache = cache
         self.s3_client = self._initialize_s3_client()
+        self.downloader = S3RangedDownloader(self.s3_client, part_size=part_size,
+                                             max_concurrency=max_concurrency)
         logger.info(f"S3CSVReader initialized for bucket '{self.bucket_name}' in region '{self.region_name}'.")
 
     def _initialize_s3_client(self):
         """
         Initializes and returns an S3 client.
         Prioritizes explicit keys, then environment variables, then IAM roles/CLI config.
+        The connection pool is sized so parallel downloads do not queue on connections.
         """
+        client_config = Config(max_pool_connections=max(10, self.max_concurrency))
         if self.aws_access_key_id and self.aws_secret_access_key:
             logger.info("Initializing S3 client with explicit AWS access keys.")
             return boto3.client(
                 's3',
                 aws_access_key_id=self.aws_access_key_id,
                 aws_secret_access_key=self.aws_secret_access_key,
-                region_name=self.region_name
+                region_name=self.region_name,
+                config=client_config
             )
         else:
             logger.info("No explicit AWS keys provided. boto3 will attempt to find credentials "
                         "from environment variables, AWS config, or IAM roles.")
-            return boto3.client('s3', region_name=self.region_name)
+            return boto3.client('s3', region_name=self.region_name, config=client_config)
 
-    def read_csv(self, s3_key: str, encoding: str = 'utf-8', **kwargs) -> pd.DataFrame:
+    def read_csv(self, s3_key: str, encoding: str = 'utf-8', chunksize: Optional[int] = None,
+                 parallel: bool = False, **kwargs) -> Union[pd.DataFrame, CSVChunks]:
         """
         Reads a CSV file from the specified S3 key directly into a pandas DataFrame.
 
+        The S3 StreamingBody is handed to the pandas parser as a file handle, so the
+        object is decoded and parsed incrementally instead of being read into memory
+        as raw bytes and a decoded string first. When `chunksize` is given, an iterator
+        of DataFrames (`CSVChunks`) is returned and peak memory is bounded by the chunk
+        size rather than by the size of the object; close it (or use it in a `with`
+        block) when it is not read to the end. With `parallel=True` the object is instead
+        fetched as concurrent ranged GETs into a single preallocated buffer, which is
+        then parsed in place. If the reader has a cache, the object is served from
+        (and downloaded into) the local cache directory instead.
+
         Args:
             s3_key (str): The full path to the CSV file within the S3 bucket
                           (e.g., 'data/my_file.csv').
             encoding (str): The encoding of the CSV file (default: 'utf-8').
                             Change this if you encounter UnicodeDecodeError.
-            **kwargs: Additional keyword arguments to pass to pandas.read_csv().
+            chunksize (int, optional): Number of rows per DataFrame chunk. If None
+                                       (default), the whole file is returned as a
+                                       single DataFrame.
+            parallel (bool): Download the object with concurrent ranged GETs before
+                             parsing (default: False). Faster for large objects, but
+                             holds the raw bytes in memory while parsing.
+            **kwargs: Additional keyword arguments to pass to pandas.read_csv(). Unless
+                      `dtype` is given, columns are read into the compact dtypes in
+                      RAW_HOUSE_DTYPES (pass dtype=None to let pandas infer them).
+                      Integer columns are parsed as Int64 and then narrowed, so values
+                      that do not fit their dtype raise instead of wrapping around.
 
         Returns:
-            pd.DataFrame: A pandas DataFrame containing the CSV data.
+            pd.DataFrame: A pandas DataFrame containing the CSV data, or a `CSVChunks`
+                          iterator of DataFrames with at most `chunksize` rows each
+                          when `chunksize` is set.
 
         Raises:
             FileNotFoundError: If the S3 object is not found.
             PermissionError: If there are insufficient permissions to access the S3 object.
             UnicodeDecodeError: If the specified encoding is incorrect for the file content.
             pd.errors.EmptyDataError: If the CSV file is empty.
-            Exception: For other unexpected errors.
+            Exception: For other unexpected errors, including integer values out of the
+                       range of their dtype.
         """
         logger.info(f"Attempting to read '{s3_key}' from bucket '{self.bucket_name}' with encoding '{encoding}'.")
+        dtype = kwargs.pop('dtype', RAW_HOUSE_DTYPES)
         try:
-            logger.debug(f"Calling get_object for Bucket='{self.bucket_name}', Key='{s3_key}'.")
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            if self.cache is not None:
+                body = open(self.cache.fetch(self.downloader, self.bucket_name, s3_key), 'rb')
+            elif parallel:
+                body = MemoryViewReader(self.downloader.download(self.bucket_name, s3_key))
+            else:
+                logger.debug(f"Calling get_object for Bucket='{self.bucket_name}', Key='{s3_key}'.")
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+                body = response['Body']
             logger.info(f"Successfully fetched object '{s3_key}'.")
 
-            body = response['Body']
-            csv_string = body.read().decode(encoding)
-            logger.debug("CSV content decoded from S3 object.")
+            if chunksize:
+                logger.info(f"Streaming '{s3_key}' in chunks of {chunksize} rows.")
+                return CSVChunks(self._iter_csv_chunks(body, s3_key, encoding, chunksize, dtype, **kwargs), body)
 
-            df = pd.read_csv(io.StringIO(csv_string), **kwargs)
+            try:
+                df = narrow_integers(pd.read_csv(body, encoding=encoding, dtype=parse_dtypes(dtype), **kwargs),
+                                     dtype)
+            finally:
+                body.close()
             logger.info(f"Successfully loaded '{s3_key}' into DataFrame. Shape: {df.shape}")
             return df
 
@@ -97,7 +203,11 @@ class S3CSVReader:
         
         except self.s3_client.exceptions.ClientError as e:
             error_code = e.response.get("Error", {}).get("Code")
-            if error_code == 'AccessDenied':
+            if error_code in ('404', 'NoSuchKey'):
+                # HEAD requests (used by parallel downloads) report a missing key as a bare 404.
+                logger.error(f"S3 object '{s3_key}' not found in bucket '{self.bucket_name}'.")
+                raise FileNotFoundError(f"S3 object '{s3_key}' not found in bucket '{self.bucket_name}'.")
+            elif error_code in ('AccessDenied', '403'):
                 logger.critical(f"Access denied to S3 object '{s3_key}' in bucket '{self.bucket_name}'. "
                                 f"Check your IAM permissions. Error details: {e}")
                 raise PermissionError(f"Access denied to S3 object '{s3_key}' in bucket '{self.bucket_name}'. "
@@ -118,4 +228,87 @@ class S3CSVReader:
         
         except Exception as e:
             logger.exception(f"An unexpected error occurred while processing '{s3_key}'.") # exception logs traceback
-            raise Exception(f"An unexpected error occurred while processing '{s3_key}': {e}")
\ No newline at end of file
+            raise Exception(f"An unexpected error occurred while processing '{s3_key}': {e}")
+
+    def read_snapshot(self, s3_key: str, columns: Optional[List[str]] = None,
+                      schema: Optional[pa.Schema] = RAW_HOUSE_SCHEMA, encoding: str = 'utf-8',
+                      **kwargs) -> pd.DataFrame:
+        """
+        Reads an S3 CSV through a typed Parquet snapshot kept next to its cached copy.
+
+        The first read of an object version parses the CSV once and writes a Parquet
+        snapshot next to the cached CSV. The snapshot is keyed on the CSV's content (its
+        ETag), the schema, the encoding and the read_csv arguments, so changing any of
+        them builds a new one. Later reads with the same key load the snapshot
+        memory-mapped, decoding only the requested columns. Snapshots share the cache's
+        LRU order and size bound, and are evicted together with their CSV.
+
+        Args:
+            s3_key (str): The full path to the CSV file within the S3 bucket.
+            columns (List[str], optional): Columns to load. Loads all columns if None.
+            schema (pa.Schema, optional): Typed schema of the snapshot
+                                          (default: RAW_HOUSE_SCHEMA).
+            encoding (str): The encoding of the CSV file (default: 'utf-8').
+            **kwargs: Additional keyword arguments to pass to pandas.read_csv() when
+                      the snapshot is first built. Defaults to dtype=RAW_HOUSE_DTYPES.
+
+        Returns:
+            pd.DataFrame: A pandas DataFrame containing the requested columns.
+
+        Raises:
+            ValueError: If the reader was created without a cache.
+        """
+        if self.cache is None:
+            raise ValueError("read_snapshot requires an S3CSVReader created with a cache.")
+        csv_path = self.cache.fetch(self.downloader, self.bucket_name, s3_key)
+        kwargs.setdefault('dtype', RAW_HOUSE_DTYPES)
+        key = snapshot_key(schema, encoding, kwargs)
+        snapshot_path = self.cache.lookup_derived(csv_path, key)
+        if snapshot_path is None:
+            logger.info(f"No Parquet snapshot for '{s3_key}' with these read options yet. "
+                        f"Building it from the cached CSV.")
+            snapshot_path = self.cache.derived_path(csv_path, key)
+            df = pd.read_csv(csv_path, encoding=encoding, **dict(kwargs, dtype=parse_dtypes(kwargs['dtype'])))
+            narrow_integers(df, kwargs['dtype'])
+            write_parquet_snapshot(df, snapshot_path, schema=schema)
+            del df
+            self.cache.evict(keep=csv_path)
+        return read_parquet_snapshot(snapshot_path, columns=columns)
+
+    def _iter_csv_chunks(self, body, s3_key: str, encoding: str, chunksize: int,
+                         dtype: Optional[dict] = None, **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Yields DataFrame chunks parsed from an S3 StreamingBody.
+
+        Only one chunk (plus the parser's read buffer) is held in memory at a time.
+        The body is closed once the iterator is exhausted or discarded.
+
+        Args:
+            body: The StreamingBody returned by get_object, a reader over a
+                  downloaded buffer, or a file handle on a cached copy.
+            s3_key (str): The S3 key being read, used for logging.
+            encoding (str): The encoding of the CSV file.
+            chunksize (int): Number of rows per DataFrame chunk.
+            dtype (dict, optional): Target dtypes; integer columns are parsed wide and
+                                    narrowed with a range check.
+            **kwargs: Additional keyword arguments to pass to pandas.read_csv().
+
+        Yields:
+            pd.DataFrame: The next chunk of at most `chunksize` rows.
+        """
+        rows = 0
+        try:
+            with pd.read_csv(body, encoding=encoding, chunksize=chunksize, dtype=parse_dtypes(dtype),
+                             **kwargs) as reader:
+                for chunk in reader:
+                    rows += len(chunk)
+                    yield narrow_integers(chunk, dtype)
+            logger.info(f"Finished streaming '{s3_key}'. Total rows: {rows}")
+        except UnicodeDecodeError as e:
+            logger.error(f"Failed to decode CSV chunk from '{s3_key}' with encoding '{encoding}' "
+                         f"after {rows} rows. Error: {e}. Try a different encoding (e.g., 'latin-1', 'cp1252').")
+            raise
+        except pd.errors.EmptyDataError:
+            logger.warning(f"CSV file '{s3_key}' is empty.")
+        finally:
+            body.close()
@@ -0,0 +1,329 @@
+import gzip
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class S3RangedDownloader:
+    """
+    Downloads large S3 objects as concurrent ranged GET requests.
+
+    The object is split into fixed-size byte ranges that are fetched on a bounded
+    thread pool. Each worker writes its range straight into its slice of a single
+    preallocated buffer, so the parts never have to be joined or copied again
+    once they arrive.
+    """
+
+    def __init__(self, s3_client, part_size: int = 8 * MB, max_concurrency: int = 8,
+                 read_size: int = 256 * 1024):
+        """
+        Args:
+            s3_client: A boto3 S3 client (or any client exposing head_object/get_object,
+                       such as a moto-backed client in tests).
+            part_size (int): Size in bytes of each ranged GET (default: 8 MB).
+            max_concurrency (int): Maximum number of ranges fetched at once (default: 8).
+            read_size (int): Size in bytes of each socket read within a range (default: 256 KB).
+        """
+        if part_size <= 0:
+            raise ValueError(f"part_size must be positive, got {part_size}.")
+        if max_concurrency <= 0:
+            raise ValueError(f"max_concurrency must be positive, got {max_concurrency}.")
+        self.s3_client = s3_client
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.read_size = read_size
+
+    def byte_ranges(self, size: int) -> List[Tuple[int, int]]:
+        """
+        Splits an object of `size` bytes into inclusive (start, end) byte ranges.
+
+        Args:
+            size (int): Size of the object in bytes.
+
+        Returns:
+            List[Tuple[int, int]]: Inclusive byte ranges covering the whole object, in order.
+        """
+        return [(start, min(start + self.part_size, size) - 1)
+                for start in range(0, size, self.part_size)]
+
+    def head(self, bucket_name: str, s3_key: str) -> Tuple[int, str]:
+        """
+        Fetches the size and ETag of an S3 object with a HEAD request.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            s3_key (str): The key of the object.
+
+        Returns:
+            Tuple[int, str]: The object size in bytes and its ETag.
+        """
+        head = self.s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+        return head['ContentLength'], head.get('ETag')
+
+    def download(self, bucket_name: str, s3_key: str) -> memoryview:
+        """
+        Downloads an S3 object into memory using concurrent ranged GETs.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            s3_key (str): The key of the object to download.
+
+        Returns:
+            memoryview: A view over the preallocated buffer holding the object bytes.
+
+        Raises:
+            botocore.exceptions.ClientError: If a HEAD or ranged GET request fails,
+                                             including when the object changes while
+                                             it is being downloaded.
+            IOError: If S3 returns fewer bytes than requested for a range.
+        """
+        size, etag = self.head(bucket_name, s3_key)
+        buffer = memoryview(bytearray(size))
+
+        def fetch(byte_range: Tuple[int, int]) -> None:
+            offset = byte_range[0]
+            for chunk in self._read_range(bucket_name, s3_key, etag, byte_range):
+                buffer[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+
+        self._fetch_ranges(s3_key, size, fetch)
+        return buffer
+
+    def download_to_file(self, bucket_name: str, s3_key: str, path: str,
+                         size: int = None, etag: str = None) -> None:
+        """
+        Downloads an S3 object into a local file using concurrent ranged GETs.
+
+        The file is preallocated to the object size and each range is written at its
+        own offset, so the object is never held in memory as a whole.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            s3_key (str): The key of the object to download.
+            path (str): Local file path to write to. Any existing file is overwritten.
+            size (int, optional): Object size, if already known from a HEAD request.
+            etag (str, optional): Object ETag, if already known from a HEAD request.
+
+        Raises:
+            botocore.exceptions.ClientError: If a HEAD or ranged GET request fails.
+            IOError: If S3 returns fewer bytes than requested for a range.
+        """
+        if size is None:
+            size, etag = self.head(bucket_name, s3_key)
+        with open(path, 'wb') as f:
+            f.truncate(size)
+
+        def fetch(byte_range: Tuple[int, int]) -> None:
+            with open(path, 'r+b') as f:
+                f.seek(byte_range[0])
+                for chunk in self._read_range(bucket_name, s3_key, etag, byte_range):
+                    f.write(chunk)
+
+        self._fetch_ranges(s3_key, size, fetch)
+
+    def _fetch_ranges(self, s3_key: str, size: int, fetch: Callable[[Tuple[int, int]], None]) -> None:
+        """
+        Runs `fetch` for every byte range of the object on the bounded thread pool.
+
+        The first failing range cancels the ranges that have not started yet and its
+        exception is re-raised.
+        """
+        ranges = self.byte_ranges(size)
+        logger.info(f"Downloading '{s3_key}' ({size} bytes) as {len(ranges)} ranged GETs "
+                    f"with up to {self.max_concurrency} concurrent requests.")
+        if not ranges:
+            return
+        if len(ranges) == 1:
+            fetch(ranges[0])
+            return
+
+        workers = min(self.max_concurrency, len(ranges))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-range") as pool:
+            futures = [pool.submit(fetch, byte_range) for byte_range in ranges]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    for pending in futures:
+                        pending.cancel()
+                    raise future.exception()
+        logger.info(f"Finished downloading '{s3_key}'.")
+
+    def _read_range(self, bucket_name: str, s3_key: str, etag: str,
+                    byte_range: Tuple[int, int]) -> Iterator[bytes]:
+        """
+        Yields the bytes of one range as they arrive from S3.
+
+        The request is pinned to the ETag seen by the HEAD request, so a concurrent
+        overwrite of the object fails the download instead of mixing versions.
+        """
+        start, end = byte_range
+        expected = end - start + 1
+        request = {'Bucket': bucket_name, 'Key': s3_key, 'Range': f"bytes={start}-{end}"}
+        if etag:
+            request['IfMatch'] = etag
+        body = self.s3_client.get_object(**request)['Body']
+        received = 0
+        try:
+            while received < expected:
+                chunk = body.read(min(self.read_size, expected - received))
+                if not chunk:
+                    raise IOError(f"Incomplete read for '{s3_key}' range {start}-{end}: "
+                                  f"got {received} of {expected} bytes.")
+                received += len(chunk)
+                yield chunk
+        finally:
+            body.close()
+        logger.debug(f"Fetched range {start}-{end} of '{s3_key}'.")
+
+
+class MemoryViewReader(io.RawIOBase):
+    """
+    Read-only file object over a memoryview.
+
+    Lets parsers such as pandas.read_csv consume a downloaded buffer directly,
+    without first copying it into a bytes object or an io.BytesIO.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        size = min(len(b), len(self._view) - self._position)
+        b[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+
+class S3MultipartCSVWriter:
+    """
+    Streams a DataFrame to S3 as a CSV multipart upload.
+
+    The frame is serialized a block of rows at a time and each block is compressed
+    on its own (gzip members and zstd frames can be concatenated into one valid
+    stream). Compressed blocks are gathered into parts of at least `part_size`
+    bytes, which are uploaded on a small thread pool. At most `max_concurrency`
+    parts are in flight, so memory stays bounded by roughly
+    (max_concurrency + 1) * part_size regardless of the size of the upload. If
+    anything fails, the multipart upload is aborted so no orphaned parts remain.
+    """
+
+    COMPRESSIONS = (None, 'gzip', 'zstd')
+
+    def __init__(self, s3_client, part_size: int = 8 * MB, max_concurrency: int = 4,
+                 chunk_rows: int = 100_000, compression: Optional[str] = None,
+                 compression_level: Optional[int] = None):
+        """
+        Args:
+            s3_client: A boto3 S3 client.
+            part_size (int): Minimum size in bytes of each uploaded part (default: 8 MB).
+                             S3 requires at least 5 MB for every part but the last.
+            max_concurrency (int): Maximum number of parts uploaded at once (default: 4).
+            chunk_rows (int): Number of rows serialized per block (default: 100,000).
+            compression (str, optional): None, 'gzip' or 'zstd' (default: None).
+            compression_level (int, optional): Codec compression level. Uses the codec
+                                               default if None.
+        """
+        if part_size < 5 * MB:
+            raise ValueError(f"part_size must be at least 5 MB for S3 multipart uploads, got {part_size}.")
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"Unsupported compression '{compression}'. Choose one of {self.COMPRESSIONS}.")
+        self.s3_client = s3_client
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.compression_level = compression_level
+
+    def write(self, df: pd.DataFrame, bucket_name: str, s3_key: str, encoding: str = 'utf-8',
+              **kwargs) -> None:
+        """
+        Uploads `df` as a (optionally compressed) CSV object.
+
+        Args:
+            df (pd.DataFrame): Data frame to upload.
+            bucket_name (str): The name of the S3 bucket.
+            s3_key (str): The key of the object to create.
+            encoding (str): Text encoding of the CSV (default: 'utf-8').
+            **kwargs: Additional keyword arguments to pass to DataFrame.to_csv().
+
+        Raises:
+            botocore.exceptions.ClientError: If an S3 request fails. The multipart
+                                             upload is aborted before re-raising.
+        """
+        compress = self._compressor()
+        upload_id = self.s3_client.create_multipart_upload(Bucket=bucket_name, Key=s3_key)['UploadId']
+        logger.info(f"Started multipart upload of {len(df)} rows to '{s3_key}' "
+                    f"(compression={self.compression}).")
+        try:
+            futures = []
+            slots = threading.BoundedSemaphore(self.max_concurrency)
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part") as pool:
+
+                def submit(part: bytearray) -> None:
+                    slots.acquire()
+                    future = pool.submit(self._upload_part, bucket_name, s3_key, upload_id,
+                                         len(futures) + 1, part)
+                    future.add_done_callback(lambda _: slots.release())
+                    futures.append(future)
+
+                part = bytearray()
+                for start in range(0, max(len(df), 1), self.chunk_rows):
+                    block = df.iloc[start:start + self.chunk_rows].to_csv(
+                        index=False, header=(start == 0), **kwargs).encode(encoding)
+                    part += compress(block)
+                    if len(part) >= self.part_size:
+                        submit(part)
+                        part = bytearray()
+                    self._raise_failed(futures)
+                if part or not futures:
+                    submit(part)
+                parts = [future.result() for future in futures]
+
+            self.s3_client.complete_multipart_upload(
+                Bucket=bucket_name, Key=s3_key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts})
+            logger.info(f"Completed multipart upload of '{s3_key}' in {len(parts)} parts.")
+        except Exception as e:
+            logger.error(f"Multipart upload of '{s3_key}' failed, aborting: {e}")
+            self.s3_client.abort_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id)
+            raise
+
+    def _compressor(self) -> Callable[[bytes], bytes]:
+        """Returns a function compressing one block into a self-contained member/frame."""
+        if self.compression == 'gzip':
+            level = 6 if self.compression_level is None else self.compression_level
+            return lambda block: gzip.compress(block, compresslevel=level)
+        if self.compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError("zstd compression requires the 'zstandard' package.") from e
+            level = 3 if self.compression_level is None else self.compression_level
+            return zstandard.ZstdCompressor(level=level).compress
+        return lambda block: block
+
+    def _upload_part(self, bucket_name: str, s3_key: str, upload_id: str, part_number: int,
+                     body: bytearray) -> dict:
+        response = self.s3_client.upload_part(Bucket=bucket_name, Key=s3_key, UploadId=upload_id,
+                                              PartNumber=part_number, Body=body)
+        logger.debug(f"Uploaded part {part_number} of '{s3_key}' ({len(body)} bytes).")
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    @staticmethod
+    def _raise_failed(futures: list) -> None:
+        """Re-raises the error of the first part upload that has already failed."""
+        for future in futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
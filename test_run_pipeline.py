@@ -1,8 +1,10 @@
 from steps.s3_ingest_data import *
+from steps.s3_cache import S3DiskCache
 from steps.clean_data import *
 from steps.model_training import train_model
 from steps.config import ModelNameConfig
 from config.access_keys import *
+from config.config import S3_CACHE_DIR, S3_CACHE_MAX_BYTES, S3_CACHE_REVALIDATE
 import boto3
 import pandas as pd
 import io
@@ -12,7 +14,9 @@ import mlflow
 if __name__ == "__main__":
     logging.info("Starting S3CSVReader...")
     reader = S3CSVReader(bucket_name=S3_BUCKET_NAME, region_name=AWS_REGION, 
-                         aws_access_key_id=S3_AWS_ACCESS_KEY_ID, aws_secret_access_key=S3_AWS_SECRET_ACCESS_KEY)
+                         aws_access_key_id=S3_AWS_ACCESS_KEY_ID, aws_secret_access_key=S3_AWS_SECRET_ACCESS_KEY,
+                         cache=S3DiskCache(S3_CACHE_DIR, max_bytes=S3_CACHE_MAX_BYTES,
+                                           revalidate=S3_CACHE_REVALIDATE))
     # Read the CSV file from S3
     df = reader.read_csv(s3_key=S3_KEY, encoding='utf-8')
     
@@ -21,7 +25,8 @@ if __name__ == "__main__":
     X_train, X_val, y_train, y_val = split_data(processed_df)
     
     # Load the processed data back to S3
-    load_processed_data_to_s3(processed_df, bucket_name=S3_BUCKET_NAME, csvfilename='processed_house_prices.csv')
+    load_processed_data_to_s3(processed_df, bucket_name=S3_BUCKET_NAME, csvfilename='processed_house_prices.csv.gz',
+                              compression='gzip')
     
     
     # Train Model
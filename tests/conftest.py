@@ -0,0 +1,48 @@
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+BUCKET = "house-prediction-test"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """A moto-backed S3 client with an empty test bucket."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def make_houses(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Raw houses with the columns and value ranges of the house price CSV."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Id": np.arange(1, rows + 1),
+        "Area": rng.integers(500, 5000, rows),
+        "Bedrooms": rng.integers(1, 6, rows),
+        "Bathrooms": rng.integers(1, 5, rows),
+        "Floors": rng.integers(1, 4, rows),
+        "YearBuilt": rng.integers(1900, 2024, rows),
+        "Location": rng.choice(["Downtown", "Suburban", "Urban", "Rural"], rows).astype(object),
+        "Condition": rng.choice(["Excellent", "Good", "Fair", "Poor"], rows).astype(object),
+        "Garage": rng.choice(["Yes", "No"], rows).astype(object),
+        "Price": rng.integers(50_000, 1_000_000, rows).astype(np.float64),
+    })
+
+
+@pytest.fixture
+def mlflow_tracking(tmp_path, monkeypatch):
+    """Point MLflow at a file store in the test's temporary directory."""
+    import mlflow
+
+    uri = (tmp_path / "mlruns").as_uri()
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", uri)
+    mlflow.set_tracking_uri(uri)
+    yield uri
+    mlflow.set_tracking_uri(None)
@@ -0,0 +1,114 @@
+import os
+
+import mlflow.sklearn
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+
+from src.data_cleaning import HousePreProcessor
+from steps.batch_scoring import SUCCESS, _part_path, score_file
+from tests.conftest import make_houses
+
+CHUNK_ROWS = 100
+
+
+def save_pipeline(df: pd.DataFrame, path: str) -> str:
+    pipeline = Pipeline([("preprocessor", HousePreProcessor()), ("model", LinearRegression())])
+    pipeline.fit(df.drop(columns="Price"), df["Price"])
+    mlflow.sklearn.save_model(pipeline, path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def model_uri(tmp_path_factory):
+    return save_pipeline(make_houses(500, seed=1), str(tmp_path_factory.mktemp("model") / "pipeline"))
+
+
+@pytest.fixture(params=["csv", "parquet"])
+def input_path(request, tmp_path):
+    df = make_houses(1000)
+    path = str(tmp_path / f"houses.{request.param}")
+    if request.param == "csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_parquet(path, row_group_size=CHUNK_ROWS)
+    return path
+
+
+def read_predictions(output_dir: str) -> pd.DataFrame:
+    return pd.read_parquet(output_dir).sort_values("Id", ignore_index=True)
+
+
+def score(input_path, output_dir, model_uri, **kwargs) -> dict:
+    return score_file(input_path, output_dir, model_uri, chunk_rows=CHUNK_ROWS, n_jobs=2, **kwargs)
+
+
+def test_scores_every_row(input_path, model_uri, tmp_path):
+    output_dir = str(tmp_path / "out")
+    assert score(input_path, output_dir, model_uri) == {"chunks": 10, "rows": 1000, "skipped": 0}
+
+    predictions = read_predictions(output_dir)
+    houses = make_houses(1000)
+    expected = mlflow.sklearn.load_model(model_uri).predict(houses.drop(columns="Price"))
+    assert predictions["Id"].tolist() == houses["Id"].tolist()
+    pd.testing.assert_series_equal(predictions["prediction"], pd.Series(expected, name="prediction"))
+
+
+def test_failed_run_resumes_with_missing_chunks_only(input_path, model_uri, tmp_path):
+    output_dir = str(tmp_path / "out")
+    score(input_path, output_dir, model_uri)
+    expected = read_predictions(output_dir)
+    # A run that died before finishing: no _SUCCESS, two chunks never written.
+    for index in (0, 7):
+        os.remove(_part_path(output_dir, index))
+    os.remove(os.path.join(output_dir, SUCCESS))
+
+    assert score(input_path, output_dir, model_uri) == {"chunks": 2, "rows": 200, "skipped": 8}
+    pd.testing.assert_frame_equal(read_predictions(output_dir), expected)
+
+
+def test_complete_output_with_deleted_parts_is_rescored(input_path, model_uri, tmp_path):
+    output_dir = str(tmp_path / "out")
+    score(input_path, output_dir, model_uri)
+    expected = read_predictions(output_dir)
+    os.remove(_part_path(output_dir, 9))
+
+    assert score(input_path, output_dir, model_uri) == {"chunks": 1, "rows": 100, "skipped": 9}
+    assert score(input_path, output_dir, model_uri) == {"chunks": 0, "rows": 0, "skipped": 10}
+    pd.testing.assert_frame_equal(read_predictions(output_dir), expected)
+
+
+def test_refuses_to_mix_chunkings(input_path, model_uri, tmp_path):
+    output_dir = str(tmp_path / "out")
+    score(input_path, output_dir, model_uri)
+
+    with pytest.raises(ValueError):
+        score_file(input_path, output_dir, model_uri, chunk_rows=250, n_jobs=2)
+    assert score_file(input_path, output_dir, model_uri, chunk_rows=250, n_jobs=2,
+                      restart=True) == {"chunks": 4, "rows": 1000, "skipped": 0}
+
+
+@pytest.mark.parametrize("suffix", ["csv", "parquet"])
+def test_rows_without_id_are_numbered_by_file_position(suffix, tmp_path):
+    model_uri = save_pipeline(make_houses(500, seed=1).drop(columns="Id"), str(tmp_path / "pipeline"))
+    houses = make_houses(1000).drop(columns="Id")
+    path = str(tmp_path / f"houses.{suffix}")
+    if suffix == "csv":
+        houses.to_csv(path, index=False)
+    else:
+        # Uneven row groups: chunk starts are not multiples of the chunk size
+        houses.to_parquet(path, row_group_size=70)
+    output_dir = str(tmp_path / "out")
+    score(path, output_dir, model_uri)
+    expected = read_predictions(output_dir)
+    os.remove(_part_path(output_dir, 0))
+    os.remove(_part_path(output_dir, 3))
+    os.remove(os.path.join(output_dir, SUCCESS))
+    score(path, output_dir, model_uri)
+
+    predictions = read_predictions(output_dir)
+    assert predictions["Id"].tolist() == list(range(1000))
+    pd.testing.assert_frame_equal(predictions, expected)
+    model = mlflow.sklearn.load_model(model_uri)
+    pd.testing.assert_series_equal(predictions["prediction"], pd.Series(model.predict(houses.drop(columns="Price")), name="prediction"))
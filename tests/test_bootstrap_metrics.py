@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_absolute_error, r2_score, root_mean_squared_error
+
+from src.bootstrap_metrics import _POISSON_TABLE, BootstrapMetrics, slice_scores
+from src.evaluate_scores import FusedMetrics
+
+
+def predictions(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = 1_000_000 + rng.normal(0, 50_000, rows)
+    return y_true, y_true + rng.normal(0, 20_000, rows)
+
+
+@pytest.mark.parametrize("method", ["poisson", "multinomial"])
+def test_intervals_contain_the_point_estimate(method):
+    y_true, y_pred = predictions()
+    scores = BootstrapMetrics(n_replicates=200, method=method).calculate_scores(y_true, y_pred)
+
+    assert scores["r2"] == pytest.approx(r2_score(y_true, y_pred))
+    assert scores["rmse"] == pytest.approx(root_mean_squared_error(y_true, y_pred))
+    assert scores["r2_lower"] < scores["r2"] < scores["r2_upper"]
+    assert scores["rmse_lower"] < scores["rmse"] < scores["rmse_upper"]
+
+
+def test_replicates_do_not_depend_on_the_thread_count():
+    y_true, y_pred = predictions()
+    single = BootstrapMetrics(n_replicates=64, n_jobs=1, batch_elements=16 * len(y_true))
+    threaded = BootstrapMetrics(n_replicates=64, n_jobs=4, batch_elements=16 * len(y_true))
+
+    for left, right in zip(single.replicates(y_true, y_pred), threaded.replicates(y_true, y_pred)):
+        np.testing.assert_array_equal(left, right)
+
+
+def test_block_sums_accumulate_in_float64():
+    rng = np.random.default_rng(1)
+    values = rng.normal(1e6, 1e5, size=(1_000_000, 3)).astype(np.float32)
+    seed = np.random.SeedSequence(3)
+    sums = BootstrapMetrics(method="poisson")._block_sums(values, 4, seed)
+
+    bits = np.random.default_rng(seed).integers(0, 65536, size=(4, len(values)), dtype=np.uint16)
+    weights = _POISSON_TABLE.take(bits).astype(np.float64)
+    expected = np.column_stack([weights.sum(axis=1), weights @ values.astype(np.float64)])
+    np.testing.assert_allclose(sums, expected, rtol=1e-7)
+
+
+def test_constant_target_r2_matches_fused_metrics():
+    y_true = np.full(50, 7.0)
+    for y_pred in (y_true, y_true + 1):
+        scores = BootstrapMetrics(n_replicates=20).calculate_scores(y_true, y_pred)
+        assert scores["r2"] == FusedMetrics().calculate_scores(y_true, y_pred)["r2"] == r2_score(y_true, y_pred)
+        assert scores["r2_lower"] == scores["r2_upper"] == scores["r2"]
+
+
+def test_empty_validation_set_raises():
+    with pytest.raises(ValueError):
+        BootstrapMetrics().replicates(np.array([]), np.array([]))
+
+
+def test_slice_scores_match_a_pandas_groupby():
+    y_true, y_pred = predictions(rows=600)
+    rng = np.random.default_rng(2)
+    slices = pd.DataFrame({"location": rng.integers(0, 5, 600), "condition": rng.choice(["new", "used"], 600)})
+    scores = slice_scores(y_true, y_pred, slices)
+
+    frame = slices.assign(y_true=y_true, y_pred=y_pred)
+    for column in slices.columns:
+        expected = frame.groupby(column).apply(lambda group: pd.Series({
+            "count": len(group),
+            "r2": r2_score(group.y_true, group.y_pred),
+            "rmse": root_mean_squared_error(group.y_true, group.y_pred),
+            "mae": mean_absolute_error(group.y_true, group.y_pred),
+            "mean_residual": (group.y_true - group.y_pred).mean(),
+        }), include_groups=False)
+        actual = scores[scores["column"] == column].set_index("value")
+        assert list(actual.index) == list(expected.index)
+        for metric in expected.columns:
+            np.testing.assert_allclose(actual[metric].to_numpy(dtype=np.float64), expected[metric], rtol=1e-7)
+
+
+def test_constant_slice_r2_follows_sklearn():
+    y_true = np.array([1.0, 1.0, 2.0, 5.0])
+    y_pred = np.array([1.0, 1.0, 2.5, 5.0])
+    scores = slice_scores(y_true, y_pred, pd.DataFrame({"group": ["a", "a", "b", "b"]}))
+    assert scores["r2"].tolist() == [1.0, r2_score(y_true[2:], y_pred[2:])]
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.columnar_requests import (REQUEST_SCHEMA, decode_houses, decode_predictions, encode_houses,
+                                   encode_predictions)
+from tests.conftest import make_houses
+
+
+def stream(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def test_houses_round_trip():
+    houses = make_houses(50)
+    decoded = decode_houses(encode_houses(houses))
+
+    assert list(decoded.columns) == REQUEST_SCHEMA.names
+    assert decoded["Area"].dtype == np.float32
+    assert decoded["Bedrooms"].dtype == np.int8
+    assert isinstance(decoded["Location"].dtype, pd.CategoricalDtype)
+    for column in REQUEST_SCHEMA.names:
+        np.testing.assert_array_equal(decoded[column].to_numpy(dtype=object),
+                                      houses[column].astype(decoded[column].dtype).to_numpy(dtype=object))
+
+
+def test_missing_column_raises():
+    table = pa.Table.from_pandas(make_houses(5).drop(columns=["Garage", "Floors"]), preserve_index=False)
+    with pytest.raises(ValueError, match="Garage"):
+        decode_houses(stream(table))
+
+
+def test_mismatched_types_are_cast_to_the_schema():
+    houses = make_houses(20)
+    # Plain int64 / float64 / string columns, as a client without the schema would send them
+    body = stream(pa.Table.from_pandas(houses, preserve_index=False))
+    decoded = decode_houses(body)
+
+    assert pa.Schema.from_pandas(decoded, preserve_index=False).equals(REQUEST_SCHEMA)
+    np.testing.assert_array_equal(decoded["Area"], houses["Area"].astype(np.float32))
+    np.testing.assert_array_equal(decoded["YearBuilt"], houses["YearBuilt"])
+    assert decoded["Condition"].astype(str).tolist() == houses["Condition"].tolist()
+
+
+def test_uncastable_column_raises():
+    table = pa.Table.from_pandas(make_houses(5).assign(Bedrooms="many"), preserve_index=False)
+    with pytest.raises(pa.ArrowInvalid):
+        decode_houses(stream(table))
+
+
+def test_predictions_round_trip():
+    predictions = np.random.default_rng(0).normal(size=17)
+    np.testing.assert_array_equal(decode_predictions(encode_predictions(predictions)), predictions)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from src.compact_forest import choose_pruning, export_compact_forest, load_compact_forest, prune_forest
+from src.compiled_forest import CompiledForest
+from src.data_cleaning import HousePreProcessor
+from tests.conftest import make_houses
+
+
+@pytest.fixture(scope="module")
+def data():
+    df = make_houses(3000)
+    # A learnable target, so pruning has accuracy to trade.
+    df["Price"] = df["Area"] * 150 + df["Bedrooms"] * 10_000 + np.random.default_rng(1).normal(0, 20_000, len(df))
+    processed = HousePreProcessor().fit_transform(df)
+    X, y = processed.drop(columns="Price"), processed["Price"]
+    return X.iloc[:2000], y.iloc[:2000], X.iloc[2000:], y.iloc[2000:]
+
+
+@pytest.fixture(scope="module")
+def forest(data):
+    X, y, _, _ = data
+    return RandomForestRegressor(n_estimators=30, random_state=0).fit(X, y)
+
+
+def test_float32_export_keeps_every_decision(forest, data, tmp_path):
+    _, _, X_val, y_val = data
+    path = str(tmp_path / "compact.bin")
+    report = export_compact_forest(forest, path, X_val, y_val)
+
+    loaded = load_compact_forest(path)
+    compiled = CompiledForest.from_forest(forest)
+    np.testing.assert_array_equal(loaded.arrays["threshold"], compiled.arrays["threshold"])
+    np.testing.assert_array_equal(loaded.arrays["children"], compiled.arrays["children"])
+    # Only the float32 rounding of the leaf values changes predictions.
+    assert report["prediction_delta"]["max_relative"] < 1e-6
+    np.testing.assert_allclose(loaded.predict(X_val), forest.predict(X_val), rtol=1e-6)
+
+
+def test_float16_report_matches_observed_error(forest, data, tmp_path):
+    _, _, X_val, y_val = data
+    path = str(tmp_path / "compact.bin")
+    report = export_compact_forest(forest, path, X_val, y_val, threshold_dtype="float16", value_dtype="float16")
+
+    delta = np.abs(load_compact_forest(path).predict(X_val) - forest.predict(X_val))
+    assert report["prediction_delta"]["max_abs"] == pytest.approx(delta.max())
+    assert report["file_bytes"] < export_compact_forest(forest, str(tmp_path / "f32.bin"), X_val)["file_bytes"]
+
+
+@pytest.mark.parametrize("tolerance", [0.0, 0.01, 0.05])
+def test_pruning_stays_within_tolerance(forest, data, tmp_path, tolerance):
+    _, _, X_val, y_val = data
+    report = export_compact_forest(forest, str(tmp_path / "compact.bin"), X_val, y_val, prune_tolerance=tolerance)
+
+    original_rmse, compact_rmse = report["rmse"]
+    assert compact_rmse <= original_rmse * (1 + tolerance) * (1 + 1e-6)
+    assert report["n_nodes"][1] <= report["n_nodes"][0]
+
+
+def test_dropping_trees_keeps_a_prefix_of_the_forest(forest, data):
+    _, _, X_val, _ = data
+    compiled = CompiledForest.from_forest(forest)
+    X = X_val.to_numpy(np.float32)
+    expected = np.mean([tree.predict(X) for tree in forest.estimators_[:12]], axis=0)
+
+    np.testing.assert_allclose(prune_forest(compiled, n_trees=12).predict(X), expected, rtol=1e-12)
+    np.testing.assert_allclose(prune_forest(compiled, max_depth=compiled.max_depth).predict(X),
+                               forest.predict(X_val), rtol=1e-12)
+
+
+def test_choose_pruning_returns_smallest_forest_within_budget(forest, data):
+    _, _, X_val, y_val = data
+    compiled = CompiledForest.from_forest(forest)
+    X, y = X_val.to_numpy(np.float32), y_val.to_numpy()
+    max_depth, n_trees = choose_pruning(compiled, X, y, 0.05)
+
+    rmse = lambda model: np.sqrt(np.mean((model.predict(X) - y) ** 2))
+    budget = rmse(compiled) * 1.05
+    assert rmse(prune_forest(compiled, n_trees=n_trees, max_depth=max_depth)) <= budget
+    if n_trees > 1:
+        assert rmse(prune_forest(compiled, n_trees=n_trees - 1, max_depth=max_depth)) > budget
+
+
+def test_load_rejects_foreign_file(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a forest")
+    with pytest.raises(ValueError):
+        load_compact_forest(str(path))
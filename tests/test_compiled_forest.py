@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from src.compiled_forest import CompiledForest
+from src.data_cleaning import HousePreProcessor
+from tests.conftest import make_houses
+
+
+@pytest.fixture(scope="module")
+def data():
+    processed = HousePreProcessor().fit_transform(make_houses(2000))
+    X, y = processed.drop(columns="Price"), processed["Price"]
+    return X.iloc[:1500], y.iloc[:1500], X.iloc[1500:]
+
+
+@pytest.fixture(scope="module")
+def forest(data):
+    X, y, _ = data
+    return RandomForestRegressor(n_estimators=25, max_depth=12, random_state=0).fit(X, y)
+
+
+def test_predictions_match_forest(forest, data):
+    _, _, X_test = data
+    compiled = CompiledForest.from_forest(forest)
+
+    np.testing.assert_allclose(compiled.predict(X_test), forest.predict(X_test), rtol=1e-12)
+    # Columns are matched by name and batches of any size give the same result.
+    compiled.batch_elements = 64
+    np.testing.assert_allclose(compiled.predict(X_test[X_test.columns[::-1]]), forest.predict(X_test), rtol=1e-12)
+
+
+def test_predictions_match_forest_with_missing_values(data):
+    X, y, X_test = data
+    X, X_test = X.copy(), X_test.copy()
+    X.loc[X.index[::5], "Area"] = np.nan
+    X_test.loc[X_test.index[::3], ["Area", "YearBuilt"]] = np.nan
+    forest = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+
+    np.testing.assert_allclose(CompiledForest.from_forest(forest).predict(X_test), forest.predict(X_test), rtol=1e-12)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_load_round_trip(forest, data, tmp_path, mmap):
+    _, _, X_test = data
+    path = str(tmp_path / "forest.bin")
+    CompiledForest.from_forest(forest).save(path)
+    loaded = CompiledForest.load(path, mmap=mmap)
+
+    assert isinstance(loaded.arrays["value"].base, np.memmap) == mmap
+    np.testing.assert_allclose(loaded.predict(X_test), forest.predict(X_test), rtol=1e-12)
+
+
+def test_predict_rejects_wrong_feature_count(forest, data):
+    _, _, X_test = data
+    with pytest.raises(ValueError):
+        CompiledForest.from_forest(forest).predict(X_test.to_numpy()[:, :-1])
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_cleaning import FeatureMatrix, HousePreProcessor, IndexSplitStrategy
+from src.schema import RAW_HOUSE_DTYPES
+from tests.conftest import make_houses
+
+
+def houses_with_missing(rows: int = 200) -> pd.DataFrame:
+    df = make_houses(rows)
+    df["Area"] = df["Area"].astype(np.float64)
+    df.loc[::7, ["Area", "Bedrooms", "Floors"]] = np.nan
+    df.loc[::11, "Location"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("dtypes", [None, RAW_HOUSE_DTYPES], ids=["inferred", "compact"])
+def test_transform_does_not_modify_input(dtypes):
+    df = houses_with_missing()
+    if dtypes is not None:
+        df = df.astype(dtypes)
+    original = df.copy()
+    preprocessor = HousePreProcessor().fit(df)
+
+    processed = preprocessor.transform(df)
+    pd.testing.assert_frame_equal(df, original)
+    assert not processed[["Area", "Bedrooms", "Floors"]].isna().any().any()
+
+
+def test_transform_under_copy_on_write():
+    with pd.option_context("mode.copy_on_write", True):
+        df = houses_with_missing()
+        original = df.copy()
+        processed = HousePreProcessor().fit(df).transform(df)
+    pd.testing.assert_frame_equal(df, original)
+    assert processed["Area"].notna().all()
+
+
+@pytest.mark.parametrize("dtypes", [None, RAW_HOUSE_DTYPES], ids=["inferred", "compact"])
+def test_transform_matches_fit_transform(dtypes):
+    df = houses_with_missing()
+    if dtypes is not None:
+        df = df.astype(dtypes)
+    preprocessor = HousePreProcessor()
+
+    pd.testing.assert_frame_equal(preprocessor.fit_transform(df), preprocessor.transform(df))
+
+
+def test_transform_encodes_unseen_and_missing_categories_as_minus_one():
+    preprocessor = HousePreProcessor().fit(make_houses(100))
+    new = make_houses(3)
+    new["Location"] = ["Downtown", "Lakeside", np.nan]
+
+    codes = preprocessor.transform(new)["Location_Label_Encoded"].tolist()
+    assert codes == [list(preprocessor.categories_["Location"]).index("Downtown"), -1, -1]
+
+
+def processed_houses(rows: int = 300) -> pd.DataFrame:
+    df = make_houses(rows)
+    # Few distinct years, so naive row cuts would land inside a year.
+    df["YearBuilt"] = 1990 + df["Id"] % 7
+    return HousePreProcessor().fit_transform(df)
+
+
+@pytest.mark.parametrize("n_splits", [1, 3, 5])
+def test_time_folds_never_split_a_year(n_splits):
+    matrix = FeatureMatrix(processed_houses())
+    years = matrix.column("YearBuilt")
+    folds = list(IndexSplitStrategy(mode="time", n_splits=n_splits).split(matrix))
+
+    assert len(folds) == n_splits
+    for train, val in folds:
+        assert years[train].max() < years[val].min()
+    # Consecutive validation folds tile the newest rows without overlap.
+    assert sum(len(val) for _, val in folds) == len(np.unique(np.concatenate([val for _, val in folds])))
+
+
+def test_time_folds_need_enough_distinct_years():
+    matrix = FeatureMatrix(processed_houses())
+    with pytest.raises(ValueError):
+        list(IndexSplitStrategy(mode="time", n_splits=7).split(matrix))
+
+
+def test_kfold_validation_covers_every_row_once():
+    matrix = FeatureMatrix(processed_houses())
+    folds = list(IndexSplitStrategy(mode="kfold", n_splits=4).split(matrix))
+
+    assert np.array_equal(np.sort(np.concatenate([val for _, val in folds])), np.arange(len(matrix)))
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from sklearn.metrics import (mean_absolute_error, mean_absolute_percentage_error, mean_squared_error, r2_score,
+                             root_mean_squared_error)
+
+from src.evaluate_scores import FusedMetrics, MetricsAccumulator
+
+
+def predictions(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    # Prices: a large offset with a comparatively small spread
+    y_true = 1_000_000 + rng.normal(0, 50_000, rows)
+    return y_true, y_true + rng.normal(0, 20_000, rows)
+
+
+def sklearn_scores(y_true, y_pred):
+    return {
+        "mse": mean_squared_error(y_true, y_pred),
+        "rmse": root_mean_squared_error(y_true, y_pred),
+        "mae": mean_absolute_error(y_true, y_pred),
+        "r2": r2_score(y_true, y_pred),
+        "mape": mean_absolute_percentage_error(y_true, y_pred),
+    }
+
+
+def test_fused_metrics_match_sklearn():
+    y_true, y_pred = predictions()
+    scores = FusedMetrics().calculate_scores(y_true, y_pred)
+
+    for name, expected in sklearn_scores(y_true, y_pred).items():
+        assert scores[name] == pytest.approx(expected, rel=1e-9), name
+    residual = y_true - y_pred
+    for q in MetricsAccumulator.QUANTILES:
+        assert scores[f"residual_q{round(q * 100):02d}"] == np.quantile(residual, q, method="inverted_cdf")
+
+
+def test_merged_chunks_equal_the_whole_set():
+    y_true, y_pred = predictions()
+    whole = MetricsAccumulator(k=None).update(y_true, y_pred).result()
+
+    parts = [MetricsAccumulator(k=None).update(y_true[start:start + 700], y_pred[start:start + 700])
+             for start in range(0, len(y_true), 700)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    assert merged.count == len(y_true)
+    assert merged.result() == pytest.approx(whole, rel=1e-9)
+
+
+def test_chunked_sketch_keeps_exact_moments():
+    y_true, y_pred = predictions()
+    chunks = [(y_true[start:start + 1000], y_pred[start:start + 1000]) for start in range(0, len(y_true), 1000)]
+    scores = FusedMetrics().calculate_scores_chunked(chunks, k=256)
+
+    for name, expected in sklearn_scores(y_true, y_pred).items():
+        assert scores[name] == pytest.approx(expected, rel=1e-9), name
+    assert scores["residual_q50"] == pytest.approx(np.median(y_true - y_pred), abs=0.05 * np.std(y_true - y_pred))
+
+
+def test_constant_target_r2_follows_sklearn():
+    y_true = np.full(10, 3.0)
+    assert FusedMetrics().calculate_scores(y_true, y_true)["r2"] == r2_score(y_true, y_true) == 1.0
+    assert FusedMetrics().calculate_scores(y_true, y_true + 1)["r2"] == r2_score(y_true, y_true + 1) == 0.0
+
+
+def test_empty_accumulator_raises():
+    with pytest.raises(ValueError):
+        MetricsAccumulator().result()
+    with pytest.raises(ValueError):
+        MetricsAccumulator().update(np.zeros(3), np.zeros(2))
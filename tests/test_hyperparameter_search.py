@@ -0,0 +1,37 @@
+from hyperopt import hp, space_eval
+
+from src.hyperparameter_search import SuccessiveHalvingSearch
+from tests.test_model_training import split_folds
+
+SPACE = {
+    "n_estimators": hp.choice("n_estimators", range(10, 40)),
+    "max_depth": hp.choice("max_depth", range(2, 8)),
+    "min_samples_leaf": hp.choice("min_samples_leaf", range(1, 5)),
+}
+
+
+def halving_data():
+    matrix, folds = split_folds("kfold", 2)
+    train, val = folds[0]
+    return (*matrix.take(train), *matrix.take(val))
+
+
+def test_successive_halving_trains_fewer_trees_than_full_search():
+    results = []
+    search = SuccessiveHalvingSearch(SPACE, n_configs=9, eta=3, min_budget=1 / 9, n_jobs=1,
+                                     on_result=lambda params, result: results.append((params, result)))
+    vals, params, score = search.run(*halving_data())
+
+    assert 0 < search.trees_trained < 9 * 39
+    assert search.trees_trained < sum(params["n_estimators"] for params, result in results if result["rung"] == 0)
+    assert space_eval(SPACE, vals) == params
+    assert (params, {"r2": score, "rung": 2, "n_estimators": params["n_estimators"]}) in results
+
+
+def test_hyperband_returns_a_point_of_the_space():
+    search = SuccessiveHalvingSearch(SPACE, eta=3, min_budget=1 / 3, hyperband=True, n_jobs=1)
+    vals, params, score = search.run(*halving_data())
+
+    assert set(vals) == set(SPACE)
+    assert space_eval(SPACE, vals) == params
+    assert score <= 1
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.micro_batching import DeadlineExceeded, MicroBatcher, ServerOverloaded
+
+
+class RecordingModel:
+    """Predicts the house Area, recording the size of every batch."""
+
+    def __init__(self, delay: float = 0.0, release: threading.Event = None):
+        self.batches = []
+        self.delay = delay
+        self.release = release
+        self.started = threading.Event()
+
+    def __call__(self, frame: pd.DataFrame) -> np.ndarray:
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.delay)
+        self.batches.append(len(frame))
+        return frame["Area"].to_numpy(dtype=np.float64)
+
+
+async def started(batcher: MicroBatcher) -> MicroBatcher:
+    await batcher.start()
+    return batcher
+
+
+async def wait_for_predict(model: RecordingModel) -> None:
+    while not model.started.is_set():
+        await asyncio.sleep(0.001)
+
+
+def test_concurrent_requests_share_batches():
+    model = RecordingModel(delay=0.02)
+
+    async def scenario():
+        batcher = await started(MicroBatcher(model, max_batch_size=16, max_wait_ms=20))
+        frame = pd.DataFrame({"Area": [100.0, 200.0]})
+        results = await asyncio.gather(*[batcher.submit({"Area": i}) for i in range(40)], batcher.submit(frame))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert [float(result[0]) for result in results[:40]] == list(range(40))
+    assert results[40].tolist() == [100.0, 200.0]
+    assert sum(model.batches) == 42 and len(model.batches) < 42 and max(model.batches) <= 16
+
+
+def test_full_queue_rejects_requests():
+    release = threading.Event()
+    model = RecordingModel(release=release)
+
+    async def scenario():
+        batcher = await started(MicroBatcher(model, max_batch_size=1, max_queue=2))
+        first = asyncio.ensure_future(batcher.submit({"Area": 1}))
+        await wait_for_predict(model)
+        queued = [asyncio.ensure_future(batcher.submit({"Area": i})) for i in (2, 3)]
+        await asyncio.sleep(0)
+        with pytest.raises(ServerOverloaded):
+            await batcher.submit({"Area": 4})
+        release.set()
+        results = await asyncio.gather(first, *queued)
+        await batcher.stop()
+        return results, batcher.stats
+
+    results, stats = asyncio.run(scenario())
+    assert [float(result[0]) for result in results] == [1, 2, 3]
+    assert stats["rejected"] == 1
+
+
+def test_deadline_expires_and_queued_requests_are_dropped():
+    model = RecordingModel(delay=0.2)
+
+    async def scenario():
+        batcher = await started(MicroBatcher(model, max_batch_size=1))
+        slow = asyncio.ensure_future(batcher.submit({"Area": 1}, timeout_ms=1000))
+        await wait_for_predict(model)
+        with pytest.raises(DeadlineExceeded):
+            await batcher.submit({"Area": 2}, timeout_ms=50)
+        await slow
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return batcher.stats
+
+    stats = asyncio.run(scenario())
+    # The expired request is never scored.
+    assert model.batches == [1]
+    assert stats["expired"] == 1
+
+
+def test_stop_fails_in_flight_batch():
+    release = threading.Event()
+    model = RecordingModel(release=release)
+
+    async def scenario():
+        batcher = await started(MicroBatcher(model, max_batch_size=1))
+        in_flight = asyncio.ensure_future(batcher.submit({"Area": 1}, timeout_ms=5000))
+        queued = asyncio.ensure_future(batcher.submit({"Area": 2}, timeout_ms=5000))
+        await wait_for_predict(model)
+        # The model finishes its batch only after the batcher was told to stop.
+        threading.Timer(0.1, release.set).start()
+        start = time.monotonic()
+        await batcher.stop()
+        results = await asyncio.gather(in_flight, queued, return_exceptions=True)
+        return results, time.monotonic() - start
+
+    results, elapsed = asyncio.run(scenario())
+    assert all(isinstance(result, ServerOverloaded) for result in results)
+    assert elapsed < 1
@@ -0,0 +1,165 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model_cache import ModelCache, estimate_nbytes
+
+NAME = "house-model"
+MODEL_BYTES = 1 << 20
+
+
+class StubModel:
+    """A model of about MODEL_BYTES predicting its version for every row."""
+
+    def __init__(self, version, release: threading.Event = None):
+        self.version = version
+        self.weights = np.zeros(MODEL_BYTES, dtype=np.uint8)
+        self.release = release
+        self.started = threading.Event()
+
+    def __getstate__(self):
+        # Measured by pickling (estimate_nbytes); the events are not part of the model.
+        return {"version": self.version, "weights": self.weights}
+
+    def predict(self, X):
+        self.started.set()
+        if self.release is not None:
+            assert self.release.wait(5)
+        return np.full(len(X), float(self.version))
+
+
+class StubLoader:
+    """Loads `StubModel`s, counting loads; `gate` holds loads back and `fail` makes versions fail."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = set()
+        self.release = {}
+
+    def __call__(self, name, version):
+        self.calls.append((name, version))
+        assert self.gate.wait(5)
+        if version in self.fail:
+            raise OSError(f"cannot load version {version}")
+        return StubModel(version, self.release.get(version))
+
+
+@pytest.fixture
+def loader():
+    return StubLoader()
+
+
+def cache_of(loader, models: float) -> ModelCache:
+    return ModelCache(loader, max_bytes=int(models * estimate_nbytes(StubModel(0))))
+
+
+def test_estimate_counts_array_buffers():
+    assert MODEL_BYTES <= estimate_nbytes(StubModel(0)) < MODEL_BYTES + 4096
+
+
+def test_lru_eviction_stays_within_the_budget(loader):
+    cache = cache_of(loader, 2.5)
+    for version in (1, 2):
+        cache.get(NAME, version)
+    cache.get(NAME, 1)  # 2 is now the least recently used
+    cache.get(NAME, 3)
+
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.stats["evictions"] == 1
+    cache.get(NAME, 1)
+    cache.get(NAME, 2)
+    assert loader.calls == [(NAME, 1), (NAME, 2), (NAME, 3), (NAME, 2)]
+    cache.close()
+
+
+def test_concurrent_preloads_share_one_load(loader):
+    cache = cache_of(loader, 4)
+    loader.gate.clear()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = list(pool.map(lambda _: cache.preload(NAME, 1), range(8)))
+    assert len({id(future) for future in futures}) == 1
+    loader.gate.set()
+
+    models = {id(future.result(5)) for future in futures}
+    assert len(models) == 1 and loader.calls == [(NAME, 1)]
+    assert cache.stats["loads"] == 1 and cache.stats["misses"] == 1
+    cache.close()
+
+
+def test_promote_swaps_the_live_version_atomically(loader):
+    cache = cache_of(loader, 4)
+    cache.promote(NAME, 1)
+    stop = threading.Event()
+    torn = []
+
+    def read():
+        while not stop.is_set():
+            version, model = cache.live(NAME)
+            if model.version != version:
+                torn.append((version, model.version))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for version in range(2, 8):
+        assert cache.promote(NAME, version).result().version == version
+    stop.set()
+    reader.join()
+
+    assert not torn
+    assert cache.live(NAME)[0] == 7
+    assert cache.stats["swaps"] == 7
+    cache.close()
+
+
+def test_live_versions_are_never_evicted(loader):
+    cache = cache_of(loader, 0.5)
+    cache.promote(NAME, 1)
+    cache.promote("other-model", 1)
+    for version in (2, 3):
+        cache.get(NAME, version)
+
+    assert cache.live(NAME)[1].version == 1
+    assert cache.live("other-model")[1].version == 1
+    assert {(NAME, 1), ("other-model", 1)} <= set(cache._models)
+    assert len(loader.calls) == 4
+    cache.close()
+
+
+def test_failed_load_keeps_the_old_version_live(loader):
+    cache = cache_of(loader, 4)
+    cache.promote(NAME, 1)
+    loader.fail.add(2)
+
+    with pytest.raises(OSError):
+        cache.promote(NAME, 2)
+    version, model = cache.live(NAME)
+    assert (version, model.version) == (1, 1)
+    assert cache.predict(NAME, pd.DataFrame({"Area": [1.0, 2.0]})).tolist() == [1.0, 1.0]
+    assert cache.stats["swaps"] == 1
+    with pytest.raises(LookupError):
+        cache.live("unknown-model")
+    cache.close()
+
+
+def test_predict_started_before_a_swap_finishes_on_the_old_model(loader):
+    cache = cache_of(loader, 4)
+    release = threading.Event()
+    loader.release[1] = release
+    cache.promote(NAME, 1)
+    old = cache.live(NAME)[1]
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        running = pool.submit(cache.predict, NAME, pd.DataFrame({"Area": [1.0, 2.0, 3.0]}))
+        assert old.started.wait(5)
+        cache.promote(NAME, 2)
+        assert cache.live(NAME)[0] == 2
+        release.set()
+        assert running.result(5).tolist() == [1.0, 1.0, 1.0]
+
+    assert cache.predict(NAME, pd.DataFrame({"Area": [1.0]})).tolist() == [2.0]
+    cache.close()
@@ -0,0 +1,36 @@
+import pytest
+from mlflow import MlflowClient
+from sklearn.linear_model import LinearRegression
+
+from steps.model_registry import PRODUCTION_ALIAS, aliased_version, promote_version, register_version
+
+NAME = "house-model-test"
+
+
+def fitted(slope: float) -> LinearRegression:
+    return LinearRegression().fit([[0.0], [1.0]], [0.0, slope])
+
+
+def test_promotes_the_registered_version_not_the_newest(mlflow_tracking):
+    accepted = register_version(fitted(1.0), NAME)
+    newer = register_version(fitted(2.0), NAME)
+
+    assert promote_version(NAME, accepted) == accepted
+    assert accepted != newer
+    assert aliased_version(NAME) == accepted
+    assert str(MlflowClient().get_model_version_by_alias(NAME, PRODUCTION_ALIAS).version) == accepted
+
+
+def test_promote_requires_a_version(mlflow_tracking):
+    register_version(fitted(1.0), NAME)
+    with pytest.raises(TypeError):
+        promote_version(NAME)
+    assert aliased_version(NAME) is None
+
+
+def test_register_version_tags_its_run(mlflow_tracking):
+    version = register_version(fitted(1.0), NAME, tags={"train_rows": "2"})
+
+    client = MlflowClient()
+    run_id = client.get_model_version(NAME, version).run_id
+    assert client.get_run(run_id).data.tags["train_rows"] == "2"
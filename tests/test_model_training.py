@@ -0,0 +1,80 @@
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score
+
+from src.data_cleaning import DataCleaning, IndexSplitStrategy
+from src.model_engines import MODEL_ENGINES, engine_cv_objective, fold_arrays, get_engine
+from steps.config import ModelNameConfig
+from src.trial_store import TrialStore, dataset_fingerprint
+from steps.model_training import tune_model, tune_model_cv
+from tests.test_data_cleaning import processed_houses
+
+
+def split_folds(mode: str, n_splits: int):
+    # Same as steps.clean_data.split_data_folds, which needs the S3 access keys to import.
+    return DataCleaning(processed_houses(), IndexSplitStrategy(mode=mode, n_splits=n_splits)).handle_data()
+
+
+def test_cross_validate_averages_fold_scores():
+    matrix, folds = split_folds("kfold", 3)
+    params = {"alpha": 1.0}
+    expected = []
+    for train, val in folds:
+        X, y = matrix.frame(train)
+        X_val, y_val = matrix.frame(val)
+        expected.append(r2_score(y_val, get_engine("Ridge").build(params).fit(X.to_numpy(), y).predict(X_val.to_numpy())))
+
+    result = engine_cv_objective("Ridge", params, fold_arrays(matrix.X, matrix.y, folds))
+    assert np.allclose(result["fold_r2"], expected)
+    assert np.isclose(result["r2"], np.mean(expected))
+
+
+def test_tune_model_cv_runs_on_shared_folds(mlflow_tracking):
+    matrix, folds = split_folds("time", 3)
+    best = tune_model_cv(matrix, folds, ModelNameConfig(model_name="Ridge"), max_evals=3)
+
+    assert set(best) == set(get_engine("Ridge").search_space())
+
+
+def test_parallel_tune_model_cv_records_every_trial(mlflow_tracking, tmp_path):
+    matrix, folds = split_folds("kfold", 2)
+    store = TrialStore(str(tmp_path / "trials.sqlite"))
+    best = tune_model_cv(matrix, folds, ModelNameConfig(model_name="Ridge"), max_evals=4,
+                         n_workers=2, trial_store=store, n_jobs=2)
+
+    space = get_engine("Ridge").search_space()
+    trials = store.trials(space, dataset_fingerprint(*fold_arrays(matrix.X, matrix.y, folds).values()), scope="Ridge")
+    assert len(trials.trials) == 4
+    assert set(best) == set(space)
+    assert best in [{label: values[0] for label, values in trial["misc"]["vals"].items()} for trial in trials.trials]
+
+
+def test_parallel_tune_model_returns_a_point_of_the_space(mlflow_tracking, tmp_path):
+    matrix, folds = split_folds("kfold", 2)
+    train, val = folds[0]
+    X_train, y_train = matrix.frame(train)
+    X_val, y_val = matrix.frame(val)
+    store = TrialStore(str(tmp_path / "trials.sqlite"))
+    best = tune_model(X_train, y_train, X_val, y_val, ModelNameConfig(model_name="Ridge"), max_evals=4,
+                      n_workers=2, trial_store=store, n_jobs=2)
+
+    space = get_engine("Ridge").search_space()
+    trials = store.trials(space, dataset_fingerprint(X_train, y_train, X_val, y_val), scope="Ridge")
+    assert len(trials.trials) == 4
+    assert set(best) == set(space)
+
+
+def test_incremental_engines_implement_extend():
+    assert {name for name, engine in MODEL_ENGINES.items() if engine.supports_incremental} == {
+        "RandomForestRegressor", "HistGradientBoostingRegressor"}
+    for engine in MODEL_ENGINES.values():
+        assert hasattr(engine, "extend") == engine.supports_incremental
+
+
+def test_forest_extend_adds_trees_for_new_rows():
+    matrix = split_folds("kfold", 2)[0]
+    engine = get_engine("RandomForestRegressor", n_jobs=1)
+    model = engine.build({"n_estimators": 20}).fit(matrix.X[:200], matrix.y[:200])
+
+    engine.extend(model, matrix.X[200:], matrix.y[200:], n_seen=200)
+    assert len(model.estimators_) == 30
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+
+from src.data_cleaning import HousePreProcessor
+from src.prediction_cache import PredictionCache
+from tests.conftest import make_houses
+
+
+class CountingRegression(LinearRegression):
+    """LinearRegression recording how many rows each `predict` call scores."""
+
+    def predict(self, X):
+        self.calls = getattr(self, "calls", []) + [len(X)]
+        return super().predict(X)
+
+
+def features() -> pd.DataFrame:
+    return pd.DataFrame({"Area": [1200.0, 0.0, np.nan], "Bedrooms": [3, 2, 1], "Garage": [1, 0, 1]})
+
+
+def test_keys_ignore_column_order_and_integer_types():
+    df = features()
+    reordered = df[["Garage", "Area", "Bedrooms"]].astype({"Bedrooms": np.float32, "Garage": np.int8})
+
+    assert PredictionCache.keys(df, "1") == PredictionCache.keys(reordered, "1")
+
+
+def test_keys_canonicalize_negative_zero_and_nan():
+    df = features()
+    other = df.copy()
+    other.loc[1, "Area"] = -0.0
+    # A NaN with another payload than numpy's default.
+    area = other["Area"].to_numpy().copy()
+    area.view(np.int64)[2] = np.array([np.nan]).view(np.int64)[0] | 1
+    other["Area"] = area
+
+    assert np.isnan(other.loc[2, "Area"])
+    assert PredictionCache.keys(df, "1") == PredictionCache.keys(other, "1")
+    assert PredictionCache.keys(df.astype({"Area": "Float64"}), "1") == PredictionCache.keys(df, "1")
+
+
+def test_keys_depend_on_values_columns_and_version():
+    df = features()
+    keys = PredictionCache.keys(df, "1")
+
+    assert len(set(keys)) == 3
+    assert PredictionCache.keys(df, "2") != keys
+    assert PredictionCache.keys(df.rename(columns={"Garage": "Floors"}), "1") != keys
+    changed = df.copy()
+    changed.loc[0, "Area"] = 1201.0
+    assert PredictionCache.keys(changed, "1")[1:] == keys[1:]
+    assert PredictionCache.keys(changed, "1")[0] != keys[0]
+
+
+def fitted_pipeline() -> Pipeline:
+    df = make_houses(300)
+    return Pipeline([("preprocessor", HousePreProcessor()), ("model", CountingRegression())]).fit(
+        df.drop(columns="Price"), df["Price"])
+
+
+def test_predict_scores_only_distinct_misses():
+    model = fitted_pipeline()
+    houses = make_houses(20, seed=3).drop(columns="Price")
+    cache = PredictionCache()
+    expected = model.predict(houses)
+    model.named_steps["model"].calls = []
+
+    first = cache.predict(model, "1", pd.concat([houses.iloc[:10], houses.iloc[:10]], ignore_index=True))
+    second = cache.predict(model, "1", houses)
+    np.testing.assert_allclose(first, np.tile(expected[:10], 2))
+    np.testing.assert_allclose(second, expected)
+    # The duplicated rows are scored once, and the second call only scores the 10 new houses.
+    assert model.named_steps["model"].calls == [10, 10]
+    assert (cache.metrics()["hits"], cache.metrics()["misses"]) == (10, 30)
+
+
+def test_id_is_part_of_the_key():
+    model = fitted_pipeline()
+    house = make_houses(1, seed=3).drop(columns="Price")
+    relisted = house.assign(Id=house["Id"] + 1000)
+    cache = PredictionCache()
+
+    cache.predict(model, "1", house)
+    cache.predict(model, "1", relisted)
+    assert cache.metrics()["hits"] == 0
+
+
+def test_entries_expire_and_are_evicted():
+    model = fitted_pipeline()
+    houses = make_houses(5, seed=3).drop(columns="Price")
+    cache = PredictionCache(max_entries=3, ttl_s=0.0)
+
+    cache.predict(model, "1", houses)
+    assert len(cache) == 3
+    cache.predict(model, "1", houses.iloc[-1:])
+    assert cache.metrics()["expired"] == 1 and cache.metrics()["hits"] == 0
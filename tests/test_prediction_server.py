@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src.columnar_requests import ARROW_STREAM_CONTENT_TYPE, decode_predictions, encode_houses
+from src.micro_batching import DeadlineExceeded, ServerOverloaded
+from src.prediction_server import create_app
+from tests.conftest import make_houses
+
+
+class StubBatcher:
+    """Answers with the Area of each house, or raises `error`."""
+
+    def __init__(self):
+        self.error = None
+        self.timeouts = []
+        self.started = self.stopped = False
+        self.stats = {"requests": 0}
+
+    async def start(self):
+        self.started = True
+
+    async def stop(self):
+        self.stopped = True
+
+    async def submit(self, houses, timeout_ms=None):
+        self.timeouts.append(timeout_ms)
+        if self.error is not None:
+            raise self.error
+        frame = pd.DataFrame([houses]) if isinstance(houses, dict) else houses
+        self.stats["requests"] += 1
+        return frame["Area"].to_numpy(dtype=np.float64)
+
+
+@pytest.fixture
+def batcher():
+    return StubBatcher()
+
+
+@pytest.fixture
+def client(batcher):
+    with TestClient(create_app(batcher)) as client:
+        yield client
+    assert batcher.started and batcher.stopped
+
+
+def test_json_predictions(client, batcher):
+    houses = make_houses(3).drop(columns="Price")
+    response = client.post("/predict", json=houses.to_dict(orient="records"), headers={"X-Timeout-Ms": "250"})
+
+    assert response.status_code == 200
+    assert response.json() == {"predictions": houses["Area"].astype(float).tolist()}
+    assert batcher.timeouts == [250.0]
+    assert client.post("/predict", json={"Area": 1200}).json() == {"predictions": [1200.0]}
+    assert batcher.timeouts[-1] is None
+
+
+def test_arrow_predictions(client):
+    houses = make_houses(4)
+    response = client.post("/predict/arrow", content=encode_houses(houses),
+                           headers={"Content-Type": ARROW_STREAM_CONTENT_TYPE})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW_STREAM_CONTENT_TYPE
+    np.testing.assert_array_equal(decode_predictions(response.content), houses["Area"].astype(np.float32))
+
+
+def test_overload_answers_503_with_retry_after(client, batcher):
+    batcher.error = ServerOverloaded("queue full")
+    response = client.post("/predict", json={"Area": 1200})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_missed_deadline_answers_504(client, batcher):
+    batcher.error = DeadlineExceeded("too late")
+    assert client.post("/predict", json={"Area": 1200}).status_code == 504
+
+
+@pytest.mark.parametrize("body", [[], [1, 2], "house"])
+def test_bad_json_body_answers_422(client, body):
+    assert client.post("/predict", json=body).status_code == 422
+
+
+def test_bad_houses_answer_422(client, batcher):
+    batcher.error = KeyError("Area")
+    assert client.post("/predict", json={"Rooms": 3}).status_code == 422
+    assert client.post("/predict/arrow", content=b"not arrow").status_code == 422
+
+
+def test_health_and_stats(client, batcher):
+    client.post("/predict", json={"Area": 1200})
+    assert client.get("/health").json() == {"status": "ok"}
+    assert client.get("/stats").json() == {"requests": 1}
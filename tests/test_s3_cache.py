@@ -0,0 +1,76 @@
+import os
+
+from steps.s3_cache import S3DiskCache
+from steps.s3_transfer import S3RangedDownloader
+from tests.conftest import BUCKET
+
+
+class CountingClient:
+    """S3 client proxy counting the requests made through it."""
+
+    def __init__(self, client):
+        self._client = client
+        self.calls = {"head_object": 0, "get_object": 0}
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def head_object(self, **kwargs):
+        self.calls["head_object"] += 1
+        return self._client.head_object(**kwargs)
+
+    def get_object(self, **kwargs):
+        self.calls["get_object"] += 1
+        return self._client.get_object(**kwargs)
+
+
+def test_revalidated_hit_makes_only_a_head_request(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=b"Id,Price\n1,100\n")
+    client = CountingClient(s3)
+    cache = S3DiskCache(str(tmp_path))
+    downloader = S3RangedDownloader(client)
+    path = cache.fetch(downloader, BUCKET, "houses.csv")
+    client.calls = {"head_object": 0, "get_object": 0}
+
+    assert cache.fetch(downloader, BUCKET, "houses.csv") == path
+    assert client.calls == {"head_object": 1, "get_object": 0}
+
+
+def test_unrevalidated_hit_makes_no_request(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=b"Id,Price\n1,100\n")
+    client = CountingClient(s3)
+    downloader = S3RangedDownloader(client)
+    path = S3DiskCache(str(tmp_path)).fetch(downloader, BUCKET, "houses.csv")
+    client.calls = {"head_object": 0, "get_object": 0}
+
+    assert S3DiskCache(str(tmp_path), revalidate=False).fetch(downloader, BUCKET, "houses.csv") == path
+    assert client.calls == {"head_object": 0, "get_object": 0}
+
+
+def test_unrevalidated_read_serves_stale_copy_until_revalidated(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=b"Id,Price\n1,100\n")
+    downloader = S3RangedDownloader(s3)
+    S3DiskCache(str(tmp_path)).fetch(downloader, BUCKET, "houses.csv")
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=b"Id,Price\n1,200\n")
+
+    stale = S3DiskCache(str(tmp_path), revalidate=False).fetch(downloader, BUCKET, "houses.csv")
+    fresh = S3DiskCache(str(tmp_path)).fetch(downloader, BUCKET, "houses.csv")
+    with open(stale, "rb") as f:
+        assert f.read().endswith(b"100\n")
+    with open(fresh, "rb") as f:
+        assert f.read().endswith(b"200\n")
+    # The revalidating read moved the reference, so later unrevalidated reads get the new copy.
+    assert S3DiskCache(str(tmp_path), revalidate=False).fetch(downloader, BUCKET, "houses.csv") == fresh
+
+
+def test_evict_keeps_cache_within_budget(s3, tmp_path):
+    downloader = S3RangedDownloader(s3)
+    cache = S3DiskCache(str(tmp_path), max_bytes=2500)
+    paths = []
+    for i in range(3):
+        s3.put_object(Bucket=BUCKET, Key=f"part-{i}.csv", Body=bytes([i]) * 1000)
+        paths.append(cache.fetch(downloader, BUCKET, f"part-{i}.csv"))
+
+    # The object just stored is never evicted; older ones go until the cache fits.
+    assert os.path.exists(paths[-1])
+    assert sum(os.path.exists(path) for path in paths) == 2
@@ -0,0 +1,54 @@
+import pytest
+
+from steps.s3_ingest_data import S3CSVReader
+from tests.conftest import BUCKET, make_houses
+
+
+class TrackingClient:
+    """S3 client proxy keeping the bodies it returned."""
+
+    def __init__(self, client):
+        self._client = client
+        self.bodies = []
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def get_object(self, **kwargs):
+        response = self._client.get_object(**kwargs)
+        self.bodies.append(response["Body"])
+        return response
+
+
+@pytest.fixture
+def reader(s3):
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=make_houses(50).to_csv(index=False).encode())
+    reader = S3CSVReader(bucket_name=BUCKET)
+    reader.s3_client = TrackingClient(s3)
+    return reader
+
+
+def body_closed(reader) -> bool:
+    [body] = reader.s3_client.bodies
+    return body._raw_stream.closed
+
+
+def test_chunks_cover_the_file(reader):
+    with reader.read_csv("houses.csv", chunksize=20) as chunks:
+        assert [len(chunk) for chunk in chunks] == [20, 20, 10]
+    assert body_closed(reader)
+
+
+def test_unread_chunks_close_the_body(reader):
+    chunks = reader.read_csv("houses.csv", chunksize=20)
+    assert not body_closed(reader)
+    chunks.close()
+    assert body_closed(reader)
+
+
+def test_abandoned_iteration_closes_the_body(reader):
+    with reader.read_csv("houses.csv", chunksize=20) as chunks:
+        next(chunks)
+    assert body_closed(reader)
+    with pytest.raises(StopIteration):
+        next(chunks)
@@ -0,0 +1,118 @@
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from botocore.exceptions import ClientError
+
+from steps.s3_transfer import MB, MemoryViewReader, S3MultipartCSVWriter, S3RangedDownloader
+from tests.conftest import BUCKET
+
+
+class FailingUploads:
+    """S3 client proxy whose `upload_part` fails from part `fail_from` on."""
+
+    def __init__(self, client, fail_from: int):
+        self._client = client
+        self.fail_from = fail_from
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def upload_part(self, **kwargs):
+        if kwargs["PartNumber"] >= self.fail_from:
+            raise ConnectionError(f"part {kwargs['PartNumber']} lost")
+        return self._client.upload_part(**kwargs)
+
+
+def house_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Id": np.arange(rows),
+        "Area": rng.integers(500, 5000, rows),
+        "Location": rng.choice(["Downtown", "Suburban", "Urban", "Rural"], rows),
+        "Price": rng.integers(50_000, 1_000_000, rows),
+    })
+
+
+def test_byte_ranges_cover_object_exactly():
+    downloader = S3RangedDownloader(s3_client=None, part_size=10)
+    assert downloader.byte_ranges(25) == [(0, 9), (10, 19), (20, 24)]
+    assert downloader.byte_ranges(20) == [(0, 9), (10, 19)]
+    assert downloader.byte_ranges(0) == []
+
+
+@pytest.mark.parametrize("size", [0, 1, 4096, 10_000])
+def test_ranged_download_matches_object(s3, size):
+    body = np.random.default_rng(size).integers(0, 256, size, dtype=np.uint8).tobytes()
+    s3.put_object(Bucket=BUCKET, Key="data.bin", Body=body)
+    downloader = S3RangedDownloader(s3, part_size=1000, max_concurrency=4, read_size=128)
+
+    assert bytes(downloader.download(BUCKET, "data.bin")) == body
+
+
+def test_ranged_download_to_file(s3, tmp_path):
+    body = b"".join(f"{i},{i * i}\n".encode() for i in range(2000))
+    s3.put_object(Bucket=BUCKET, Key="data.csv", Body=body)
+    path = tmp_path / "data.csv"
+    S3RangedDownloader(s3, part_size=777, max_concurrency=3).download_to_file(BUCKET, "data.csv", str(path))
+
+    assert path.read_bytes() == body
+
+
+def test_memoryview_reader_parses_downloaded_buffer(s3):
+    df = house_frame(500)
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=df.to_csv(index=False).encode())
+    view = S3RangedDownloader(s3, part_size=2048).download(BUCKET, "houses.csv")
+
+    pd.testing.assert_frame_equal(pd.read_csv(MemoryViewReader(view)), df)
+
+
+def test_ranged_download_is_pinned_to_etag(s3):
+    s3.put_object(Bucket=BUCKET, Key="data.bin", Body=b"a" * 5000)
+    downloader = S3RangedDownloader(s3, part_size=1000, max_concurrency=2)
+    size, etag = downloader.head(BUCKET, "data.bin")
+    # The object is overwritten between the HEAD request and the ranged GETs.
+    s3.put_object(Bucket=BUCKET, Key="data.bin", Body=b"b" * 5000)
+    downloader.head = lambda bucket_name, s3_key: (size, etag)
+
+    with pytest.raises(ClientError) as error:
+        downloader.download(BUCKET, "data.bin")
+    assert error.value.response["Error"]["Code"] in ("PreconditionFailed", "412")
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_multipart_upload_round_trip(s3, compression):
+    df = house_frame(300_000)
+    writer = S3MultipartCSVWriter(s3, part_size=5 * MB, max_concurrency=2, chunk_rows=50_000,
+                                  compression=compression)
+    writer.write(df, BUCKET, "processed.csv")
+
+    body = s3.get_object(Bucket=BUCKET, Key="processed.csv")["Body"].read()
+    if compression == "gzip":
+        body = gzip.decompress(body)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(body)), df)
+
+
+def test_multipart_upload_of_empty_frame(s3):
+    df = house_frame(0)
+    S3MultipartCSVWriter(s3).write(df, BUCKET, "empty.csv")
+
+    assert s3.get_object(Bucket=BUCKET, Key="empty.csv")["Body"].read() == df.to_csv(index=False).encode()
+
+
+def test_multipart_upload_aborts_on_failed_part(s3):
+    df = house_frame(300_000)
+    writer = S3MultipartCSVWriter(FailingUploads(s3, fail_from=2), part_size=5 * MB, max_concurrency=2,
+                                  chunk_rows=50_000)
+
+    with pytest.raises(ConnectionError):
+        writer.write(df, BUCKET, "processed.csv")
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    assert s3.list_objects_v2(Bucket=BUCKET).get("KeyCount") == 0
+
+
+def test_writer_rejects_parts_below_s3_minimum():
+    with pytest.raises(ValueError):
+        S3MultipartCSVWriter(s3_client=None, part_size=MB)
@@ -0,0 +1,50 @@
+import io
+
+import pandas as pd
+import pytest
+
+from src.schema import RAW_HOUSE_DTYPES, narrow_integers, parse_dtypes
+from steps.s3_ingest_data import S3CSVReader
+from tests.conftest import BUCKET, make_houses
+
+
+def read(csv: str) -> pd.DataFrame:
+    return narrow_integers(pd.read_csv(io.StringIO(csv), dtype=parse_dtypes(RAW_HOUSE_DTYPES)), RAW_HOUSE_DTYPES)
+
+
+def test_parse_dtypes_widens_only_integers():
+    dtypes = parse_dtypes(RAW_HOUSE_DTYPES)
+    assert dtypes["Bedrooms"] == dtypes["YearBuilt"] == "Int64"
+    assert dtypes["Area"] == "float32"
+    assert dtypes["Location"] == "category"
+    assert parse_dtypes(None) is None
+
+
+def test_in_range_values_are_narrowed_with_missing_values_kept():
+    df = read("Id,Bedrooms,YearBuilt,Location\n1,3,1999,Urban\n2,,2005,Rural\n")
+    assert df.dtypes.astype(str).to_dict() == {"Id": "Int64", "Bedrooms": "Int8", "YearBuilt": "Int16",
+                                              "Location": "category"}
+    assert df["Bedrooms"].isna().tolist() == [False, True]
+
+
+@pytest.mark.parametrize("column, value", [("Bedrooms", 300), ("Bedrooms", -129), ("YearBuilt", 40000)])
+def test_out_of_range_values_raise(column, value):
+    with pytest.raises(ValueError, match=column):
+        read(f"Id,{column}\n1,{value}\n2,3\n")
+
+
+def test_all_missing_column_is_narrowed():
+    assert read("Id,Floors\n1,\n2,\n")["Floors"].dtype == "Int8"
+
+
+def test_s3_reader_raises_instead_of_wrapping(s3):
+    df = make_houses(10)
+    df.loc[3, "Bedrooms"] = 300
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=df.to_csv(index=False).encode())
+    reader = S3CSVReader(bucket_name=BUCKET)
+
+    with pytest.raises(Exception, match="outside the range of Int8"):
+        reader.read_csv("houses.csv")
+    with pytest.raises(ValueError, match="outside the range of Int8"):
+        list(reader.read_csv("houses.csv", chunksize=4))
+    assert reader.read_csv("houses.csv", dtype=None)["Bedrooms"].max() == 300
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from src.data_cleaning import HousePreProcessor
+from src.sketches import HouseStatisticsSketch, QuantileSketch
+from tests.conftest import make_houses
+
+
+def rank_error(values: np.ndarray, estimate: float, q: float) -> float:
+    """Distance between the rank of `estimate` and the target rank, as a fraction of the values."""
+    values = np.sort(values)
+    low = np.searchsorted(values, estimate, side="left")
+    high = np.searchsorted(values, estimate, side="right")
+    target = q * len(values)
+    return max(0, low - target, target - high) / len(values)
+
+
+@pytest.mark.parametrize("q", [0.01, 0.25, 0.5, 0.9, 0.99])
+def test_quantile_within_rank_error_bound(q):
+    values = np.random.default_rng(1).lognormal(size=200_000)
+    sketch = QuantileSketch(k=256).update(values)
+
+    assert rank_error(values, sketch.quantile(q), q) < 2 / 256
+
+
+def test_small_input_is_exact():
+    values = np.random.default_rng(2).normal(size=1000)
+    sketch = QuantileSketch(k=2048).update(values)
+
+    assert sketch.quantile(0.5) == np.sort(values)[499]
+
+
+def test_merged_chunks_match_single_pass_within_bound():
+    values = np.random.default_rng(3).exponential(size=100_000)
+    merged = QuantileSketch(k=256, seed=0)
+    for chunk in np.array_split(values, 7):
+        merged.merge(QuantileSketch(k=256, seed=1).update(chunk))
+
+    assert merged.count == len(values)
+    assert rank_error(values, merged.quantile(0.5), 0.5) < 2 / 256
+
+
+def test_nans_are_ignored():
+    sketch = QuantileSketch().update(np.array([1.0, np.nan, 3.0, np.nan, 2.0]))
+    assert sketch.count == 3
+    assert sketch.quantile(0.5) == 2.0
+    assert np.isnan(QuantileSketch().quantile(0.5))
+
+
+def test_fit_chunks_matches_exact_fit():
+    df = make_houses(50_000)
+    df["Area"] = np.random.default_rng(4).normal(2000, 500, len(df))
+    df.loc[::13, ["Area", "Bedrooms"]] = np.nan
+    exact = HousePreProcessor().fit(df)
+    sketched = HousePreProcessor().fit_chunks((df.iloc[start:start + 7000] for start in range(0, len(df), 7000)),
+                                              k=1024)
+
+    for column in HousePreProcessor.INTEGER_COLUMNS:
+        assert sketched.medians_[column] == exact.medians_[column]
+    assert rank_error(df["Area"].dropna().to_numpy(), sketched.medians_["Area"], 0.5) < 2 / 1024
+    for column in HousePreProcessor.CATEGORICAL_COLUMNS:
+        assert list(sketched.categories_[column]) == list(exact.categories_[column])
+
+
+def test_statistics_sketch_merge():
+    df = make_houses(10_000)
+    left = HouseStatisticsSketch(["Area"], ["Location"]).update(df.iloc[:4000])
+    right = HouseStatisticsSketch(["Area"], ["Location"]).update(df.iloc[4000:])
+
+    merged = left.merge(right)
+    assert merged.rows == len(df)
+    assert list(merged.categories()["Location"]) == sorted(df["Location"].unique())
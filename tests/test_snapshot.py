@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.data_cleaning import HousePreProcessor
+from src.schema import PROCESSED_HOUSE_SCHEMA, RAW_HOUSE_DTYPES, RAW_HOUSE_SCHEMA
+from src.snapshot import read_parquet_snapshot, write_parquet_snapshot
+from steps.s3_cache import S3DiskCache
+from steps.s3_ingest_data import S3CSVReader
+from tests.conftest import BUCKET, make_houses
+
+
+@pytest.mark.parametrize("dtypes", [None, RAW_HOUSE_DTYPES], ids=["inferred", "compact"])
+def test_processed_snapshot_with_fractional_count_median(tmp_path, dtypes):
+    # Bedrooms [2, 2, 3, 3, NaN] has a median of 2.5.
+    df = make_houses(5)
+    df["Bedrooms"] = [2, 2, 3, 3, np.nan]
+    df["Bathrooms"] = [1, 2, np.nan, np.nan, 2]
+    if dtypes is not None:
+        df = df.astype(dtypes)
+
+    processed = HousePreProcessor().fit_transform(df)
+    path = write_parquet_snapshot(processed, str(tmp_path / "processed.parquet"), schema=PROCESSED_HOUSE_SCHEMA)
+
+    snapshot = read_parquet_snapshot(path)
+    assert snapshot["Bedrooms"].tolist() == [2, 2, 3, 3, 2]
+    assert snapshot["Bathrooms"].tolist() == [1, 2, 2, 2, 2]
+    assert pa.Schema.from_pandas(snapshot, preserve_index=False).field("Bedrooms").type == pa.int8()
+
+
+@pytest.fixture
+def reader(s3, tmp_path):
+    reader = S3CSVReader(bucket_name=BUCKET, cache=S3DiskCache(str(tmp_path / "cache")))
+    reader.s3_client = s3
+    reader.downloader.s3_client = s3
+    s3.put_object(Bucket=BUCKET, Key="houses.csv", Body=make_houses(100).to_csv(index=False).encode())
+    return reader
+
+
+def snapshots(cache: S3DiskCache) -> list:
+    return sorted(name for name in os.listdir(cache.objects_dir) if "." in name)
+
+
+def test_snapshot_is_reused_and_touched(reader):
+    first = reader.read_snapshot("houses.csv")
+    [name] = snapshots(reader.cache)
+    path = os.path.join(reader.cache.objects_dir, name)
+    os.utime(path, (0, 0))
+
+    pd.testing.assert_frame_equal(reader.read_snapshot("houses.csv"), first)
+    assert snapshots(reader.cache) == [name]
+    assert os.path.getmtime(path) > 0
+
+
+def test_snapshot_is_keyed_on_schema_and_read_options(reader):
+    reader.read_snapshot("houses.csv")
+    schema = RAW_HOUSE_SCHEMA.set(RAW_HOUSE_SCHEMA.get_field_index("Area"), pa.field("Area", pa.float64()))
+    df = reader.read_snapshot("houses.csv", schema=schema)
+    reader.read_snapshot("houses.csv", usecols=["Id", "Price"], schema=None)
+
+    assert df["Area"].dtype == np.float64
+    assert len(snapshots(reader.cache)) == 3
+
+
+def test_snapshot_is_evicted_with_its_csv(reader, s3):
+    reader.read_snapshot("houses.csv")
+    reader.cache.max_bytes = 1
+    s3.put_object(Bucket=BUCKET, Key="other.csv", Body=b"Id,Price\n1,100\n")
+    other = reader.cache.fetch(reader.downloader, BUCKET, "other.csv")
+
+    assert os.listdir(reader.cache.objects_dir) == [os.path.basename(other)]
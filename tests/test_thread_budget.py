@@ -0,0 +1,34 @@
+import numpy as np  # noqa: F401  (loads the BLAS pool)
+from threadpoolctl import threadpool_info, threadpool_limits
+
+from src.thread_budget import ThreadBudget, available_cores
+
+
+def pool_limits():
+    return [pool["num_threads"] for pool in threadpool_info()]
+
+
+def test_default_budget_is_every_core():
+    assert ThreadBudget().total == available_cores()
+    assert ThreadBudget(-1).total == available_cores()
+    assert ThreadBudget(-available_cores() - 5).total == 1
+
+
+def test_split_caps_workers_at_the_budget():
+    assert ThreadBudget(8).split(2) == (2, 4)
+    assert ThreadBudget(8).split(3) == (3, 2)
+    assert ThreadBudget(4).split(16) == (4, 1)
+    assert ThreadBudget(1).split(4) == (1, 1)
+    assert ThreadBudget(4).split(0) == (1, 4)
+
+
+def test_limit_restores_thread_pools_on_exit():
+    with threadpool_limits(limits=3):
+        with ThreadBudget(8).limit(1) as threads:
+            assert threads == 1
+            assert pool_limits() and all(limit == 1 for limit in pool_limits())
+        assert all(limit == 3 for limit in pool_limits())
+        with ThreadBudget(2).limit() as threads:
+            assert threads == 2
+            assert all(limit == 2 for limit in pool_limits())
+        assert all(limit == 3 for limit in pool_limits())
@@ -0,0 +1,49 @@
+from hyperopt import STATUS_OK, fmin, hp, tpe
+import numpy as np
+
+from src.trial_store import TrialStore, dataset_fingerprint
+
+SPACE = {"x": hp.uniform("x", -5, 5), "depth": hp.choice("depth", [2, 4, 8])}
+
+
+class CountingObjective:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, params):
+        self.calls += 1
+        loss = (params["x"] - 1) ** 2 + params["depth"]
+        return {"loss": loss, "status": STATUS_OK, "r2": -loss}
+
+
+def run(store, dataset, max_evals, objective):
+    trials = store.trials(SPACE, dataset, scope="test")
+    fmin(objective, SPACE, algo=tpe.suggest, max_evals=max_evals, trials=trials,
+         rstate=np.random.default_rng(0), show_progressbar=False)
+    return trials
+
+
+def test_study_resumes_from_store(tmp_path):
+    dataset = dataset_fingerprint(np.arange(10))
+    first = CountingObjective()
+    run(TrialStore(str(tmp_path / "trials.sqlite")), dataset, 5, first)
+
+    # A new process opening the same store resumes the study: stored trials count towards max_evals.
+    resumed = CountingObjective()
+    trials = run(TrialStore(str(tmp_path / "trials.sqlite")), dataset, 8, resumed)
+    assert (first.calls, resumed.calls) == (5, 3)
+    assert len(trials) == 8
+
+
+def test_stored_results_are_looked_up_by_params(tmp_path):
+    store = TrialStore(str(tmp_path / "trials.sqlite"))
+    dataset = dataset_fingerprint(np.arange(10))
+    trials = run(store, dataset, 3, CountingObjective())
+    best = trials.best_trial
+
+    params = {"x": best["misc"]["vals"]["x"][0], "depth": [2, 4, 8][best["misc"]["vals"]["depth"][0]]}
+    assert store.trials(SPACE, dataset, scope="test").cached_result(params)["loss"] == best["result"]["loss"]
+    # Other data starts a new study.
+    other = store.trials(SPACE, dataset_fingerprint(np.arange(11)), scope="test")
+    assert len(other) == 0
+    assert other.cached_result(params) is None